@@ -1,17 +1,36 @@
+from typing import Any, Dict, Optional
+
 from flask import Flask
 from flask_login import LoginManager
+from werkzeug.middleware.proxy_fix import ProxyFix
 
 from .blueprints.api import api_bp
 from .blueprints.auth import auth_bp
 from .blueprints.main import main_bp
+from .cli import register_cli
 from .config import Config
-from .services.auth_store import get_user_by_id, init_auth_db
+from .services.auth_store import init_auth_db, load_cached_user
+from .services.rate_limit import init_rate_limiter
+from .services.sponsorship import SPONSORSHIP_TIERS
+from .services.stripe import init_price_catalog, init_stripe_client
+from .services.uploads import UploadRequest, init_uploads
 from .extensions import db, migrate
 
 
-def create_app() -> Flask:
+def create_app(test_config: Optional[Dict[str, Any]] = None) -> Flask:
     app = Flask(__name__)
+    app.request_class = UploadRequest
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
+    proxy_hops = {
+        "x_for": app.config["PROXY_FIX_X_FOR"],
+        "x_proto": app.config["PROXY_FIX_X_PROTO"],
+        "x_host": app.config["PROXY_FIX_X_HOST"],
+    }
+    if any(proxy_hops.values()):
+        # The rate limiter keys on remote_addr, which is the proxy's address unless it is trusted here.
+        app.wsgi_app = ProxyFix(app.wsgi_app, **proxy_hops)
 
     login_manager = LoginManager()
     login_manager.init_app(app)
@@ -19,14 +38,19 @@ def create_app() -> Flask:
 
     @login_manager.user_loader
     def load_user(user_id: str):
-        return get_user_by_id(app, user_id)
+        return load_cached_user(app, user_id)
 
-    init_auth_db(app)
     db.init_app(app)
     migrate.init_app(app, db)
+    init_auth_db(app)
+    init_stripe_client(app)
+    init_price_catalog(app, SPONSORSHIP_TIERS)
+    init_rate_limiter(app)
+    init_uploads(app)
 
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(api_bp)
+    register_cli(app)
 
     return app
@@ -1,44 +1,25 @@
 import logging
 from json import JSONDecodeError
 
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import login_required
 from werkzeug.exceptions import BadRequest
 
-from ...services import email_service, pipeline_service, stripe_service, teams_service
-from ...extensions import db
-from ...models import FoodVendorApplication, SponsorshipApplication
+from ...services import (
+    email_service,
+    fanout_service,
+    pipeline_service,
+    stripe_service,
+    teams_service,
+    webhook_service,
+)
+from ...services.http import CircuitOpenError, get_circuit_breaker, provider_status
 
 logger = logging.getLogger(__name__)
 
 api_bp = Blueprint("api", __name__, url_prefix="/api")
 
 
-PAID_EVENT_TYPES = {
-    "checkout.session.completed",
-    "checkout.session.async_payment_succeeded",
-}
-
-
-def _mark_application_paid(application_type: str, application_id: int):
-    model_map = {
-        "sponsorship": SponsorshipApplication,
-        "sponsor": SponsorshipApplication,
-        "food_vendor": FoodVendorApplication,
-        "vendor": FoodVendorApplication,
-    }
-    model = model_map.get((application_type or "").lower())
-    if not model:
-        return None
-    application = model.query.get(application_id)
-    if not application:
-        return None
-    if application.payment_status != "paid":
-        application.payment_status = "paid"
-        application.status = "paid"
-        db.session.commit()
-    return application
-
-
 def _get_json_payload():
     if not request.data:
         raise ValueError("JSON body is required")
@@ -56,6 +37,12 @@ def _handle_service_error(error: Exception, status_code: int = 400):
     return jsonify({"error": str(error)}), status_code
 
 
+def _handle_circuit_open(error: CircuitOpenError):
+    response = jsonify({"error": str(error), "provider": error.provider})
+    response.headers["Retry-After"] = str(int(error.retry_after))
+    return response, 503
+
+
 @api_bp.post("/stripe/checkout-session")
 def create_checkout_session():
     try:
@@ -74,15 +61,15 @@ def stripe_webhook():
     try:
         payload = request.get_data(as_text=False)
         result = stripe_service.handle_webhook(payload, signature)
-        if result.get("type") in PAID_EVENT_TYPES:
-            session_data = (result.get("data") or {}).get("object", {})
-            metadata = session_data.get("metadata") or {}
-            payment_status = session_data.get("payment_status")
-            application_id = metadata.get("application_id")
-            application_type = metadata.get("application_type", "sponsorship")
-            if payment_status == "paid" and application_id:
-                _mark_application_paid(application_type, int(application_id))
-        return jsonify(result), 200
+        accepted = webhook_service.record_event(result.get("id"), result.get("type"), payload)
+        return jsonify(
+            {
+                "status": "received" if accepted else "duplicate",
+                "provider": "stripe",
+                "type": result.get("type"),
+                "id": result.get("id"),
+            }
+        ), 200
     except ValueError as exc:
         return _handle_service_error(exc, 400)
     except Exception as exc:  # pragma: no cover - safeguard for unexpected provider errors
@@ -94,9 +81,11 @@ def teams_notify():
     try:
         payload = _get_json_payload()
         result = teams_service.send_notification(payload)
-        return jsonify(result), 200
+        return jsonify(result), 202 if result["status"] == "queued" else 200
     except ValueError as exc:
         return _handle_service_error(exc, 400)
+    except CircuitOpenError as exc:
+        return _handle_circuit_open(exc)
     except Exception as exc:  # pragma: no cover - safeguard for unexpected provider errors
         return _handle_service_error(exc, 502)
 
@@ -113,6 +102,19 @@ def email_send():
         return _handle_service_error(exc, 502)
 
 
+@api_bp.post("/email/send-batch")
+@login_required
+def email_send_batch():
+    try:
+        payload = _get_json_payload()
+        result = email_service.send_batch(payload)
+        return jsonify(result), 502 if result["status"] == "failed" else 202
+    except ValueError as exc:
+        return _handle_service_error(exc, 400)
+    except Exception as exc:  # pragma: no cover - safeguard for unexpected provider errors
+        return _handle_service_error(exc, 502)
+
+
 @api_bp.post("/pipeline/run")
 def pipeline_run():
     try:
@@ -121,5 +123,51 @@ def pipeline_run():
         return jsonify(result), 202
     except ValueError as exc:
         return _handle_service_error(exc, 400)
+    except CircuitOpenError as exc:
+        return _handle_circuit_open(exc)
     except Exception as exc:  # pragma: no cover - safeguard for unexpected provider errors
         return _handle_service_error(exc, 502)
+
+
+@api_bp.get("/pipeline/runs/<string:run_id>")
+def pipeline_run_status(run_id: str):
+    try:
+        entry = pipeline_service.get_run_status(
+            run_id,
+            wait=request.args.get("wait", 0, type=float),
+            known_etags=request.if_none_match.as_set(),
+        )
+    except ValueError as exc:
+        return _handle_service_error(exc, 400)
+    except LookupError as exc:
+        return _handle_service_error(exc, 404)
+    except CircuitOpenError as exc:
+        return _handle_circuit_open(exc)
+    except Exception as exc:  # pragma: no cover - safeguard for unexpected provider errors
+        return _handle_service_error(exc, 502)
+    response = jsonify(entry["body"])
+    response.set_etag(entry["etag"])
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@api_bp.post("/dispatch")
+@login_required
+def dispatch():
+    try:
+        payload = _get_json_payload()
+        result = fanout_service.run_actions(payload)
+        return jsonify(result), 200 if result["status"] == "ok" else 207
+    except ValueError as exc:
+        return _handle_service_error(exc, 400)
+    except Exception as exc:  # pragma: no cover - safeguard for unexpected provider errors
+        return _handle_service_error(exc, 502)
+
+
+@api_bp.get("/providers/status")
+@login_required
+def providers_status():
+    app = current_app._get_current_object()
+    for provider in (teams_service.PROVIDER, "pipeline"):
+        get_circuit_breaker(app, provider)
+    return jsonify({"providers": provider_status(app)}), 200
@@ -4,6 +4,7 @@ from flask import Blueprint, current_app, jsonify, request
 from flask_login import login_user, logout_user
 
 from app.services.auth_store import authenticate_user, create_user
+from app.services.password_hashing import HashingPoolSaturated
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
 EMAIL_PATTERN = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
@@ -17,11 +18,14 @@ def login():
         if errors:
             return jsonify({"status": "error", "errors": errors}), 400
 
-        user = authenticate_user(
-            current_app,
-            payload["email"],
-            payload["password"],
-        )
+        try:
+            user = authenticate_user(
+                current_app,
+                payload["email"],
+                payload["password"],
+            )
+        except HashingPoolSaturated as exc:
+            return _busy_response(exc)
         if not user:
             return jsonify({"status": "error", "message": "Invalid credentials."}), 401
         login_user(user)
@@ -43,6 +47,8 @@ def register():
             payload["email"],
             payload["password"],
         )
+    except HashingPoolSaturated as exc:
+        return _busy_response(exc)
     except ValueError as exc:
         return jsonify({"status": "error", "message": str(exc)}), 409
     return jsonify({"status": "ok", "user": _user_response(user)}), 201
@@ -65,5 +71,12 @@ def _validate_credentials(payload: dict) -> list[str]:
     return errors
 
 
+def _busy_response(error: Exception):
+    response = jsonify({"status": "error", "message": str(error)})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
 def _user_response(user) -> dict:
     return {"id": user.id, "email": user.email}
@@ -1,4 +1,5 @@
 import os
+import uuid
 
 from flask import (
     Blueprint,
@@ -10,9 +11,14 @@ from flask import (
     render_template,
     request,
     send_from_directory,
+    session,
     url_for,
 )
 from flask_login import current_user, login_required, login_user, logout_user
+from sqlalchemy.exc import IntegrityError
+from stripe import StripeError
+from werkzeug.exceptions import RequestEntityTooLarge
+from werkzeug.utils import secure_filename
 
 from app.extensions import db
 from app.forms import (
@@ -21,56 +27,39 @@ from app.forms import (
     SponsorshipApplicationForm,
 )
 from app.models import FoodVendorApplication, LiabilityApplication, SponsorshipApplication
-from app.services.notifications import send_placeholder_email
-from app.services import stripe_service
-
-SPONSORSHIP_TIERS = {
-    "wish_granter": {
-        "name": "Wish Granter Sponsor",
-        "amount": 1000000,
-        "description": "Exclusive Presenting Sponsor. Grants one wish.",
-        "product": "sponsor_wish_granter",
-    },
-    "wonders_wishes": {
-        "name": "Wonders & Wishes Sponsor",
-        "amount": 500000,
-        "description": "Exclusive Family Fun Zone sponsor.",
-        "product": "sponsor_wonders_wishes",
-    },
-    "food_truck_champion": {
-        "name": "Food Truck Champion",
-        "amount": 350000,
-        "description": "Fueling the fun & flavor. Limited to 3.",
-        "product": "sponsor_food_truck_champion",
-    },
-    "dream_maker": {
-        "name": "Dream Maker Sponsor",
-        "amount": 250000,
-        "description": "Logo on ads and volunteer shirts.",
-        "product": "sponsor_dream_maker",
-    },
-    "wish_builder": {
-        "name": "Wish Builder Sponsor",
-        "amount": 100000,
-        "description": "Yard sign, table, and shirt logo.",
-        "product": "sponsor_wish_builder",
-    },
-    "hope_helper": {
-        "name": "Hope Helper Sponsor",
-        "amount": 50000,
-        "description": "Yard sign, table, social recognition.",
-        "product": "sponsor_hope_helper",
-    },
-    "joy_giver": {
-        "name": "Joy Giver Sponsor",
-        "amount": 25000,
-        "description": "Event table and social recognition.",
-        "product": "sponsor_joy_giver",
-    },
-    
+from app.services import outbox_service, stripe_service, teams_service, webhook_service
+from app.services.sponsorship import SPONSORSHIP_TIERS
+
+SPONSORSHIP_EDITABLE_FIELDS = (
+    "business_name",
+    "contact_name",
+    "cell_phone",
+    "email",
+    "address",
+    "facebook",
+    "instagram",
+    "linkedin",
+    "support_level",
+)
+
+UPLOAD_FORMS = {
+    "main.food_vendor_application": (FoodVendorApplicationForm, "food-vendor-application.html"),
+    "main.sponsorship_application": (SponsorshipApplicationForm, "sponsorship-application.html"),
 }
-from app.services.uploads import save_uploaded_file
-from app.services.auth_store import authenticate_user
+
+from app.services.derivatives import find_derivative, get_derivative_worker
+from app.services.uploads import (
+    UploadTooLarge,
+    discard_uploaded_file,
+    save_uploaded_file,
+    stream_upload_archive,
+    too_large_message,
+    upload_archive_entries,
+    upload_response,
+)
+from app.services.auth_store import authenticate_user, get_user_cache
+from app.services.password_hashing import HashingPoolSaturated
+from app.services.rate_limit import get_rate_limiter
 
 main_bp = Blueprint("main", __name__)
 
@@ -98,13 +87,21 @@ def donate():
         },
     }
     try:
-        session = stripe_service.create_checkout_session(payload)
-    except ValueError as exc:
+        session = stripe_service.get_or_create_checkout_session(payload, _donor_checkout_key())
+    except (ValueError, StripeError) as exc:
         flash(f"Stripe checkout could not be started: {exc}", "error")
         return redirect(url_for("main.home"))
     return redirect(session["url"])
 
 
+def _donor_checkout_key() -> str:
+    # A per-browser nonce, rotated once Stripe sends the donor back after paying.
+    nonce = session.get("donation_nonce")
+    if not nonce:
+        nonce = session["donation_nonce"] = uuid.uuid4().hex
+    return f"donor:{nonce}"
+
+
 @main_bp.get("/sponsor")
 def sponsor_page():
     return render_template("sponsor-page.html")
@@ -127,6 +124,17 @@ def food_vendor_page():
     return render_template("food-vendor.html")
 
 
+@main_bp.errorhandler(RequestEntityTooLarge)
+def upload_too_large(error: RequestEntityTooLarge):
+    # The global cap trips while the multipart body is parsed, before the view's own UploadTooLarge handling.
+    upload_form = UPLOAD_FORMS.get(request.endpoint)
+    if upload_form is None:
+        return error
+    form_class, template = upload_form
+    flash(too_large_message("uploaded", current_app.config.get("UPLOAD_MAX_FILE_BYTES", 0)), "error")
+    return render_template(template, form=form_class(formdata=None)), 413
+
+
 @main_bp.get("/health")
 def health_check():
     return jsonify({"status": "ok"}), 200
@@ -136,8 +144,15 @@ def health_check():
 def food_vendor_application():
     form = FoodVendorApplicationForm()
     if form.validate_on_submit():
-        logo_filename = save_uploaded_file(form.logo_file.data, "food-vendor")
-        insurance_filename = save_uploaded_file(form.insurance_file.data, "food-vendor")
+        logo_filename = None
+        try:
+            logo_filename = save_uploaded_file(form.logo_file.data, "food-vendor", "logo")
+            insurance_filename = save_uploaded_file(form.insurance_file.data, "food-vendor", "insurance")
+        except UploadTooLarge as exc:
+            db.session.rollback()
+            discard_uploaded_file("food-vendor", logo_filename)
+            flash(str(exc), "error")
+            return render_template("food-vendor-application.html", form=form), 413
         application = FoodVendorApplication(
             business_name=form.business_name.data,
             contact_name=form.contact_name.data,
@@ -181,8 +196,12 @@ def food_vendor_application():
             payment_status="pending",
         )
         db.session.add(application)
+        outbox_service.enqueue_submission_notifications(
+            "Food vendor application received",
+            form.email.data,
+            {"business_name": form.business_name.data, "contact_name": form.contact_name.data},
+        )
         db.session.commit()
-        send_placeholder_email("Food vendor application received", form.email.data)
         flash("Your food vendor application was submitted. Please complete the liability release.", "success")
         return redirect(url_for("main.liability_application"))
     return render_template("food-vendor-application.html", form=form)
@@ -199,21 +218,44 @@ def sponsorship_application():
         if tier is None:
             flash("Please select a valid sponsorship tier.", "error")
             return redirect(url_for("main.sponsorship_application"))
-        application = SponsorshipApplication(
-            business_name=form.business_name.data,
-            contact_name=form.contact_name.data,
-            cell_phone=form.cell_phone.data,
-            email=form.email.data,
-            address=form.address.data,
-            facebook=form.facebook.data,
-            instagram=form.instagram.data,
-            linkedin=form.linkedin.data,
-            support_level=support_level,
-            payment_status="pending",
-        )
-        db.session.add(application)
-        db.session.commit()
-        send_placeholder_email("Sponsorship application received", form.email.data)
+        submission_id = form.submission_id.data or None
+        application = _find_sponsorship_submission(submission_id)
+        if application is None:
+            application = SponsorshipApplication(
+                business_name=form.business_name.data,
+                contact_name=form.contact_name.data,
+                cell_phone=form.cell_phone.data,
+                email=form.email.data,
+                address=form.address.data,
+                facebook=form.facebook.data,
+                instagram=form.instagram.data,
+                linkedin=form.linkedin.data,
+                support_level=support_level,
+                payment_status="pending",
+                submission_id=submission_id,
+            )
+            db.session.add(application)
+            outbox_service.enqueue_submission_notifications(
+                "Sponsorship application received",
+                form.email.data,
+                {"business_name": form.business_name.data, "support_level": support_label},
+            )
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # A concurrent double submit of the same form won the insert.
+                db.session.rollback()
+                application = _find_sponsorship_submission(submission_id)
+                if application is None:
+                    raise
+        if application.payment_status == "paid":
+            flash("This sponsorship application has already been paid. Thank you!", "success")
+            return redirect(url_for("main.sponsorship_confirmation"))
+        if _apply_sponsorship_edits(application, form):
+            # Resubmitted after Back with edits; checkout is built from the stored row below.
+            db.session.commit()
+        tier = SPONSORSHIP_TIERS[application.support_level]
+        support_label = support_labels.get(application.support_level, application.support_level)
         payload = {
             "mode": "payment",
             "success_url": (
@@ -221,26 +263,46 @@ def sponsorship_application():
                 "?session_id={CHECKOUT_SESSION_ID}"
             ),
             "cancel_url": "https://www.wishuponafoodtruck.com/sponsorship-application",
-            "customer_email": form.email.data,
+            "customer_email": application.email,
             "product": tier["product"],
             "quantity": 1,
             "metadata": {
                 "application_type": "sponsorship",
-                "support_level": support_level,
+                "support_level": application.support_level,
                 "support_label": support_label,
                 "application_id": str(application.id),
             },
         }
         try:
-            session = stripe_service.create_checkout_session(payload)
-        except ValueError as exc:
+            session = stripe_service.get_or_create_checkout_session(
+                payload, f"sponsorship:{application.id}"
+            )
+        except (ValueError, StripeError) as exc:
             flash(f"Stripe checkout could not be started: {exc}", "error")
             return redirect(url_for("main.sponsorship_application"))
+        application.checkout_session_id = session["session_id"]
+        db.session.commit()
         flash("Thanks for applying! Redirecting you to Stripe to complete payment.", "success")
         return redirect(session["url"])
     return render_template("sponsorship-application.html", form=form)
 
 
+def _find_sponsorship_submission(submission_id: str | None):
+    if not submission_id:
+        return None
+    return SponsorshipApplication.query.filter_by(submission_id=submission_id).first()
+
+
+def _apply_sponsorship_edits(application: SponsorshipApplication, form: SponsorshipApplicationForm) -> bool:
+    changed = False
+    for field in SPONSORSHIP_EDITABLE_FIELDS:
+        value = getattr(form, field).data
+        if getattr(application, field) != value:
+            setattr(application, field, value)
+            changed = True
+    return changed
+
+
 @main_bp.get("/sponsorship-confirmation")
 def sponsorship_confirmation():
     return render_template("sponsorship-confirmation.html")
@@ -250,23 +312,31 @@ def sponsorship_confirmation():
 def stripe_confirmation():
     session_id = request.args.get("session_id", "").strip()
     if session_id:
+        session.pop("donation_nonce", None)
+        stripe_service.forget_checkout_session(session_id)
         try:
-            session_result = stripe_service.retrieve_checkout_session(session_id)
-            session = session_result.get("session") or {}
-            payment_status = session.get("payment_status")
-            metadata = session.get("metadata") or {}
-            application_id = metadata.get("application_id")
-            if payment_status == "paid" and application_id:
-                application = SponsorshipApplication.query.get(int(application_id))
-                if application:
-                    application.payment_status = "paid"
-                    application.status = "paid"
-                    db.session.commit()
+            _confirm_checkout_session(session_id)
         except ValueError as exc:
             flash(f"Unable to confirm Stripe payment: {exc}", "error")
     return render_template("stripe-confirmation.html")
 
 
+def _confirm_checkout_session(session_id: str) -> None:
+    application = webhook_service.find_application_by_session(session_id)
+    if application is not None and application.payment_status == "paid":
+        return
+
+    session_result = stripe_service.retrieve_checkout_session_cached(session_id)
+    session = session_result.get("session") or {}
+    if session.get("payment_status") != "paid":
+        return
+    if application is None:
+        application = webhook_service.find_application(session.get("metadata") or {})
+    if application is not None:
+        webhook_service.mark_application_paid(application, session)
+        db.session.commit()
+
+
 @main_bp.route("/liability-application", methods=["GET", "POST"])
 def liability_application():
     form = LiabilityApplicationForm()
@@ -280,10 +350,12 @@ def liability_application():
             signature_ip=request.remote_addr,
         )
         db.session.add(application)
-        db.session.commit()
-        send_placeholder_email(
-            "Liability release received", "liability@wishuponafoodtruck.com"
+        outbox_service.enqueue_submission_notifications(
+            "Liability release received",
+            "liability@wishuponafoodtruck.com",
+            {"applicant_full_name": form.applicant_full_name.data, "company_name": form.company_name.data},
         )
+        db.session.commit()
         flash("Your liability release has been submitted. Thank you!", "success")
         return redirect(url_for("main.liability_application"))
     return render_template("liability-application.html", form=form)
@@ -301,11 +373,15 @@ def admin_login():
             flash("Email and password are required.", "error")
             return render_template("admin-login.html")
 
-        user = authenticate_user(
-            current_app,
-            email,
-            password,
-        )
+        try:
+            user = authenticate_user(
+                current_app,
+                email,
+                password,
+            )
+        except HashingPoolSaturated as exc:
+            flash(str(exc), "error")
+            return render_template("admin-login.html"), 503, {"Retry-After": "1"}
         if not user:
             flash("Invalid login credentials.", "error")
             return render_template("admin-login.html")
@@ -325,12 +401,7 @@ def admin_logout():
     return redirect(url_for("main.admin_login"))
 
 
-@main_bp.get("/admin/dashboard")
-@login_required
-def admin_dashboard():
-    selected_type = request.args.get("type", "all")
-    selected_status = request.args.get("status", "all")
-
+def _filtered_applications(selected_type: str, selected_status: str):
     sponsor_query = SponsorshipApplication.query.order_by(SponsorshipApplication.created_at.desc())
     vendor_query = FoodVendorApplication.query.order_by(FoodVendorApplication.created_at.desc())
     liability_query = LiabilityApplication.query.order_by(LiabilityApplication.created_at.desc())
@@ -343,6 +414,15 @@ def admin_dashboard():
     sponsorships = sponsor_query.all() if selected_type in ("all", "sponsor") else []
     vendors = vendor_query.all() if selected_type in ("all", "vendor") else []
     liabilities = liability_query.all() if selected_type in ("all", "liability") else []
+    return sponsorships, vendors, liabilities
+
+
+@main_bp.get("/admin/dashboard")
+@login_required
+def admin_dashboard():
+    selected_type = request.args.get("type", "all")
+    selected_status = request.args.get("status", "all")
+    sponsorships, vendors, liabilities = _filtered_applications(selected_type, selected_status)
 
     return render_template(
         "admin-dashboard.html",
@@ -354,6 +434,43 @@ def admin_dashboard():
     )
 
 
+@main_bp.get("/admin/uploads/export.zip")
+@login_required
+def admin_upload_export():
+    selected_type = request.args.get("type", "all")
+    selected_status = request.args.get("status", "all")
+    sponsorships, vendors, _ = _filtered_applications(selected_type, selected_status)
+    entries = upload_archive_entries(
+        [("sponsorship", application) for application in sponsorships]
+        + [("food-vendor", application) for application in vendors]
+    )
+
+    download_name = secure_filename(f"uploads-{selected_type}-{selected_status}.zip")
+    response = current_app.response_class(stream_upload_archive(entries), mimetype="application/zip")
+    response.headers["Content-Disposition"] = f"attachment; filename={download_name}"
+    response.headers["X-Accel-Buffering"] = "no"
+    response.cache_control.private = True
+    response.cache_control.no_store = True
+    return response
+
+
+@main_bp.get("/admin/metrics")
+@login_required
+def admin_metrics():
+    teams_coalescer = teams_service.get_teams_coalescer(current_app._get_current_object())
+    rate_limiter = get_rate_limiter(current_app)
+    return jsonify(
+        {
+            "auth_user_cache": get_user_cache(current_app).stats(),
+            "stripe_price_catalog": stripe_service.get_price_catalog(current_app).stats(),
+            "stripe_webhook_dedupe": webhook_service.get_event_deduplicator(current_app).stats(),
+            "teams_coalescer": teams_coalescer.stats() if teams_coalescer else None,
+            "rate_limiter": rate_limiter.stats() if rate_limiter else None,
+            "upload_derivatives": get_derivative_worker(current_app._get_current_object()).stats(),
+        }
+    ), 200
+
+
 @main_bp.get("/admin/application/<string:application_type>/<int:application_id>")
 @login_required
 def admin_application_detail(application_type: str, application_id: int):
@@ -368,10 +485,18 @@ def admin_application_detail(application_type: str, application_id: int):
         return redirect(url_for("main.admin_dashboard"))
 
     application_record = application.query.get_or_404(application_id)
+    logo_filename = getattr(application_record, "logo_filename", None)
+    logo_category = "food-vendor" if application_type == "vendor" else "sponsorship"
+    logo_thumbnail = find_derivative(logo_category, logo_filename, "thumb") if logo_filename else None
     return render_template(
         "admin-application-detail.html",
         application_type=application_type,
         application=application_record,
+        logo_thumbnail_url=(
+            url_for("main.upload_derivative", category=logo_category, filename=logo_filename, name="thumb")
+            if logo_thumbnail
+            else None
+        ),
         return_url=url_for(
             "main.admin_dashboard",
             type=request.args.get("type", "all"),
@@ -387,9 +512,23 @@ def admin_upload_download(category: str, filename: str):
     if category not in allowed_categories:
         abort(404)
 
-    upload_root = current_app.config["UPLOAD_FOLDER"]
-    directory = os.path.join(upload_root, category)
-    return send_from_directory(directory, filename, as_attachment=True)
+    return upload_response(category, filename)
+
+
+@main_bp.get("/media/<string:category>/<string:filename>/<string:name>.webp")
+def upload_derivative(category: str, filename: str, name: str):
+    derivative = find_derivative(category, filename, name)
+    if derivative is None:
+        abort(404)
+    response = send_from_directory(
+        current_app.config["UPLOAD_FOLDER"],
+        derivative.path,
+        mimetype=derivative.content_type,
+        etag=f"{derivative.sha256}-{derivative.name}",
+        max_age=current_app.config.get("UPLOAD_DERIVATIVE_MAX_AGE", 86400),
+    )
+    response.cache_control.public = True
+    return response
 
 
 @main_bp.post("/admin/status/<string:application_type>/<int:application_id>")
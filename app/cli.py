@@ -0,0 +1,189 @@
+import time
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from .services import outbox_service, webhook_service
+from .services.auth_store import copy_sqlite_users
+from .services.password_hashing import calibrate_hash_method
+from .services.reconciliation import reconcile_checkout_sessions
+from .services.derivatives import generate_missing_derivatives
+from .services.uploads import fold_duplicate_uploads, shard_flat_uploads
+
+auth_cli = AppGroup("auth", help="Admin authentication maintenance commands.")
+webhooks_cli = AppGroup("webhooks", help="Stripe webhook inbox commands.")
+stripe_cli = AppGroup("stripe", help="Stripe payment maintenance commands.")
+outbox_cli = AppGroup("outbox", help="Post-submit side effect delivery commands.")
+uploads_cli = AppGroup("uploads", help="Uploaded file storage maintenance commands.")
+
+
+@auth_cli.command("calibrate-hash")
+@click.option("--target-ms", default=250.0, show_default=True, help="Target hash time per login.")
+@click.option(
+    "--algorithm",
+    type=click.Choice(["scrypt", "pbkdf2"]),
+    default="scrypt",
+    show_default=True,
+)
+@click.option("--samples", default=5, show_default=True)
+def calibrate_hash(target_ms: float, algorithm: str, samples: int) -> None:
+    result = calibrate_hash_method(algorithm, target_ms, samples)
+    click.echo(f"Median hash time: {result['median_ms']} ms (target {result['target_ms']} ms)")
+    click.echo(f"AUTH_PASSWORD_HASH_METHOD={result['method']}")
+
+
+@auth_cli.command("copy-users")
+@click.option(
+    "--source",
+    default=None,
+    help="Path to the legacy auth.db (defaults to AUTH_DB_PATH).",
+)
+def copy_users(source: str) -> None:
+    try:
+        result = copy_sqlite_users(current_app._get_current_object(), source)
+    except (ValueError, RuntimeError) as exc:
+        raise click.ClickException(str(exc)) from exc
+    click.echo(f"Copied {result['copied']} users ({result['skipped']} already present).")
+    if result["renumbered"]:
+        click.echo(
+            f"{result['renumbered']} users got new ids because theirs were taken; "
+            "rotate SECRET_KEY so existing sessions cannot resolve to the wrong account."
+        )
+    click.echo("Set AUTH_BACKEND=sqlalchemy to serve logins from DATABASE_URL.")
+
+
+@webhooks_cli.command("work")
+@click.option("--batch-size", type=int, default=None, help="Events applied per commit.")
+@click.option("--max-attempts", type=int, default=None, help="Attempts before dead-lettering.")
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=0,
+    show_default=True,
+    help="Seconds to sleep when idle; 0 exits once the inbox is drained.",
+)
+def work_webhooks(batch_size: int, max_attempts: int, poll_interval: float) -> None:
+    config = current_app.config
+    batch_size = batch_size or config["WEBHOOK_BATCH_SIZE"]
+    max_attempts = max_attempts or config["WEBHOOK_MAX_ATTEMPTS"]
+    deduplicator = webhook_service.get_event_deduplicator(current_app)
+    next_purge = 0.0
+
+    def run_batch():
+        nonlocal next_purge
+        # A continuous worker never restarts, so retention is enforced from inside the loop.
+        if time.monotonic() >= next_purge:
+            next_purge = time.monotonic() + config["WEBHOOK_PURGE_INTERVAL_SECONDS"]
+            purged = deduplicator.purge()
+            if purged:
+                click.echo(f"Purged {purged} processed events past retention.")
+        return webhook_service.process_inbox(
+            batch_size=batch_size,
+            max_attempts=max_attempts,
+            retry_base_seconds=config["WEBHOOK_RETRY_BASE_SECONDS"],
+        )
+
+    _drain(run_batch, batch_size, poll_interval)
+
+
+@stripe_cli.command("reconcile")
+@click.option("--since", type=int, default=None, help="Unix timestamp overriding the stored cursor.")
+@click.option("--dry-run", is_flag=True, help="Report matches without updating applications.")
+def reconcile(since: int, dry_run: bool) -> None:
+    try:
+        result = reconcile_checkout_sessions(since=since, dry_run=dry_run)
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from exc
+    updated = ", ".join(f"{table}={count}" for table, count in result["updated"].items()) or "none"
+    click.echo(f"Listed {result['listed']} completed sessions since {result['since']}; updated {updated}.")
+    if not dry_run:
+        click.echo(f"Cursor advanced to {result['cursor']}.")
+
+
+@outbox_cli.command("dispatch")
+@click.option("--batch-size", type=int, default=None, help="Messages delivered per commit.")
+@click.option("--max-attempts", type=int, default=None, help="Attempts before dead-lettering.")
+@click.option(
+    "--poll-interval",
+    type=float,
+    default=0,
+    show_default=True,
+    help="Seconds to sleep when idle; 0 exits once the outbox is drained.",
+)
+def dispatch_outbox(batch_size: int, max_attempts: int, poll_interval: float) -> None:
+    config = current_app.config
+    batch_size = batch_size or config["OUTBOX_BATCH_SIZE"]
+    max_attempts = max_attempts or config["OUTBOX_MAX_ATTEMPTS"]
+    _drain(
+        lambda: outbox_service.dispatch(
+            batch_size=batch_size,
+            max_attempts=max_attempts,
+            retry_base_seconds=config["OUTBOX_RETRY_BASE_SECONDS"],
+        ),
+        batch_size,
+        poll_interval,
+    )
+
+
+@uploads_cli.command("dedupe")
+@click.option("--dry-run", is_flag=True, help="Report duplicates without touching files or the database.")
+def dedupe_uploads(dry_run: bool) -> None:
+    result = fold_duplicate_uploads(dry_run=dry_run)
+    click.echo(
+        f"Scanned {result['scanned']} files ({result['recorded']} newly recorded); "
+        f"folded {result['folded']} duplicates saving {result['bytes_saved']} bytes."
+    )
+    if not dry_run:
+        click.echo(f"Removed {result['blobs_removed']} unreferenced blobs.")
+
+
+@uploads_cli.command("derivatives")
+def build_derivatives() -> None:
+    result = generate_missing_derivatives()
+    click.echo(
+        f"Generated derivatives for {result['generated']} uploads "
+        f"({result['skipped']} skipped, {result['failed']} failed)."
+    )
+
+
+@uploads_cli.command("shard")
+@click.option("--batch-size", default=500, show_default=True, help="Files moved per batch.")
+@click.option("--max-batches", type=int, default=None, help="Stop after this many batches; rerun to resume.")
+@click.option("--pause", default=0.0, show_default=True, help="Seconds to sleep between batches.")
+def shard_uploads(batch_size: int, max_batches: int | None, pause: float) -> None:
+    moved = conflicts = batches = 0
+    while max_batches is None or batches < max_batches:
+        try:
+            result = shard_flat_uploads(batch_size=batch_size)
+        except ValueError as exc:
+            raise click.ClickException(str(exc)) from exc
+        batches += 1
+        moved += result["moved"]
+        conflicts = result["conflicts"]
+        click.echo(f"Batch {batches}: moved {result['moved']} files.")
+        if result["moved"] < batch_size:
+            break
+        if pause > 0:
+            time.sleep(pause)
+    click.echo(f"Moved {moved} files into the sharded layout ({conflicts} conflicting names left in place).")
+
+
+def _drain(run_batch, batch_size: int, poll_interval: float) -> None:
+    while True:
+        counts = run_batch()
+        if any(counts.values()):
+            click.echo(" ".join(f"{key}={value}" for key, value in counts.items()))
+        if sum(counts.values()) >= batch_size:
+            continue
+        if poll_interval <= 0:
+            break
+        time.sleep(poll_interval)
+
+
+def register_cli(app) -> None:
+    app.cli.add_command(auth_cli)
+    app.cli.add_command(webhooks_cli)
+    app.cli.add_command(stripe_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(uploads_cli)
@@ -3,14 +3,43 @@ import os
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "dev-secret-key")
+    AUTH_BACKEND = os.getenv("AUTH_BACKEND", "sqlite")
     AUTH_DB_PATH = os.getenv("AUTH_DB_PATH", os.path.join(os.path.dirname(__file__), "auth.db"))
+    AUTH_DB_POOL_SIZE = int(os.getenv("AUTH_DB_POOL_SIZE", "8"))
+    AUTH_DB_BUSY_TIMEOUT_MS = int(os.getenv("AUTH_DB_BUSY_TIMEOUT_MS", "5000"))
+    AUTH_DB_STATEMENT_CACHE_SIZE = int(os.getenv("AUTH_DB_STATEMENT_CACHE_SIZE", "128"))
+    AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "256"))
+    AUTH_USER_CACHE_TTL = float(os.getenv("AUTH_USER_CACHE_TTL", "300"))
+    AUTH_HASH_POOL_SIZE = int(os.getenv("AUTH_HASH_POOL_SIZE", "2"))
+    AUTH_HASH_QUEUE_LIMIT = int(os.getenv("AUTH_HASH_QUEUE_LIMIT", "8"))
+    AUTH_HASH_TIMEOUT = float(os.getenv("AUTH_HASH_TIMEOUT", "10"))
+    AUTH_PASSWORD_HASH_METHOD = os.getenv("AUTH_PASSWORD_HASH_METHOD", "scrypt")
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL", "sqlite:///local.db")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.getenv(
         "UPLOAD_FOLDER", os.path.join(os.path.dirname(__file__), "uploads")
     )
+    UPLOAD_SHARDED_LAYOUT = os.getenv("UPLOAD_SHARDED_LAYOUT", "true").lower() == "true"
+    UPLOAD_STREAMING = os.getenv("UPLOAD_STREAMING", "true").lower() == "true"
+    UPLOAD_MAX_LOGO_BYTES = int(os.getenv("UPLOAD_MAX_LOGO_BYTES", str(5 * 1024 * 1024)))
+    UPLOAD_MAX_INSURANCE_BYTES = int(os.getenv("UPLOAD_MAX_INSURANCE_BYTES", str(20 * 1024 * 1024)))
+    UPLOAD_MAX_FILE_BYTES = int(os.getenv("UPLOAD_MAX_FILE_BYTES", str(20 * 1024 * 1024)))
+    UPLOAD_DERIVATIVE_WORKERS = int(os.getenv("UPLOAD_DERIVATIVE_WORKERS", "1"))
+    UPLOAD_THUMBNAIL_SIZE = int(os.getenv("UPLOAD_THUMBNAIL_SIZE", "160"))
+    UPLOAD_WEB_LOGO_SIZE = int(os.getenv("UPLOAD_WEB_LOGO_SIZE", "512"))
+    UPLOAD_DERIVATIVE_QUALITY = int(os.getenv("UPLOAD_DERIVATIVE_QUALITY", "80"))
+    UPLOAD_DERIVATIVE_MAX_PIXELS = int(os.getenv("UPLOAD_DERIVATIVE_MAX_PIXELS", str(24 * 1000 * 1000)))
+    UPLOAD_DERIVATIVE_MAX_AGE = int(os.getenv("UPLOAD_DERIVATIVE_MAX_AGE", "86400"))
+    UPLOAD_SENDFILE_MODE = os.getenv("UPLOAD_SENDFILE_MODE", "")
+    UPLOAD_ACCEL_PREFIX = os.getenv("UPLOAD_ACCEL_PREFIX", "/protected-uploads")
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(50 * 1024 * 1024)))
     ALLOW_PUBLIC_REGISTRATION = os.getenv("ALLOW_PUBLIC_REGISTRATION", "false").lower() == "true"
     STRIPE_API_KEY = os.getenv("STRIPE_API_KEY", "")
+    STRIPE_API_BASE = os.getenv("STRIPE_API_BASE", "")
+    STRIPE_HTTP_POOL_SIZE = int(os.getenv("STRIPE_HTTP_POOL_SIZE", "10"))
+    STRIPE_CONNECT_TIMEOUT = float(os.getenv("STRIPE_CONNECT_TIMEOUT", "3.05"))
+    STRIPE_READ_TIMEOUT = float(os.getenv("STRIPE_READ_TIMEOUT", "20"))
+    STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))
     STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "")
     STRIPE_PRICE_FOOD_VENDOR = os.getenv("STRIPE_PRICE_FOOD_VENDOR", "")
     STRIPE_PRICE_LIABILITY_FEE = os.getenv("STRIPE_PRICE_LIABILITY_FEE", "")
@@ -26,9 +55,63 @@ class Config:
     STRIPE_PRICE_SPONSOR_EVERY_DREAM_MATTERS = os.getenv(
         "STRIPE_PRICE_SPONSOR_EVERY_DREAM_MATTERS", ""
     )
+    STRIPE_PRICE_PREFETCH = os.getenv("STRIPE_PRICE_PREFETCH", "true").lower() == "true"
+    STRIPE_PRICE_REFRESH_SECONDS = float(os.getenv("STRIPE_PRICE_REFRESH_SECONDS", "900"))
+    # Stripe requires checkout sessions to live between 30 minutes and 24 hours.
+    STRIPE_CHECKOUT_SESSION_TTL = int(os.getenv("STRIPE_CHECKOUT_SESSION_TTL", "3600"))
+    STRIPE_CHECKOUT_SESSION_REGISTRY_SIZE = int(
+        os.getenv("STRIPE_CHECKOUT_SESSION_REGISTRY_SIZE", "2048")
+    )
+    STRIPE_SESSION_CACHE_TTL = float(os.getenv("STRIPE_SESSION_CACHE_TTL", "30"))
+    STRIPE_SESSION_CACHE_SIZE = int(os.getenv("STRIPE_SESSION_CACHE_SIZE", "1024"))
+    STRIPE_RECONCILE_LOOKBACK_SECONDS = int(os.getenv("STRIPE_RECONCILE_LOOKBACK_SECONDS", "86400"))
+    STRIPE_RECONCILE_ASYNC_WINDOW_SECONDS = int(
+        os.getenv("STRIPE_RECONCILE_ASYNC_WINDOW_SECONDS", str(14 * 86400))
+    )
+    WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+    WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "5"))
+    WEBHOOK_RETRY_BASE_SECONDS = int(os.getenv("WEBHOOK_RETRY_BASE_SECONDS", "30"))
+    WEBHOOK_DEDUPE_CACHE_SIZE = int(os.getenv("WEBHOOK_DEDUPE_CACHE_SIZE", "10000"))
+    WEBHOOK_DEDUPE_RETENTION_DAYS = int(os.getenv("WEBHOOK_DEDUPE_RETENTION_DAYS", "30"))
+    WEBHOOK_PURGE_INTERVAL_SECONDS = int(os.getenv("WEBHOOK_PURGE_INTERVAL_SECONDS", "3600"))
+    HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3"))
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_BREAKER_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+    DISPATCH_MAX_ACTIONS = int(os.getenv("DISPATCH_MAX_ACTIONS", "10"))
+    DISPATCH_CONCURRENCY = int(os.getenv("DISPATCH_CONCURRENCY", "4"))
+    # Number of trusted reverse proxies in front of the app; 0 trusts no X-Forwarded-* headers.
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", "0"))
+    PROXY_FIX_X_PROTO = int(os.getenv("PROXY_FIX_X_PROTO", "0"))
+    PROXY_FIX_X_HOST = int(os.getenv("PROXY_FIX_X_HOST", "0"))
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")
+    RATE_LIMIT_DB_PATH = os.getenv("RATE_LIMIT_DB_PATH", "")
+    RATE_LIMIT_IP_RATE = float(os.getenv("RATE_LIMIT_IP_RATE", "2"))
+    RATE_LIMIT_IP_BURST = float(os.getenv("RATE_LIMIT_IP_BURST", "30"))
+    RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "50000"))
+    RATE_LIMIT_ROUTES = os.getenv(
+        "RATE_LIMIT_ROUTES",
+        "main.donate=5/60,main.admin_login=10/60,auth.login=10/60,auth.register=5/60,api.dispatch=30/60",
+    )
     TEAMS_WEBHOOK_URL = os.getenv("TEAMS_WEBHOOK_URL", "")
+    TEAMS_COALESCE_WINDOW_SECONDS = float(os.getenv("TEAMS_COALESCE_WINDOW_SECONDS", "0"))
+    TEAMS_COALESCE_MAX_BATCH = int(os.getenv("TEAMS_COALESCE_MAX_BATCH", "20"))
+    TEAMS_COALESCE_MAX_PENDING = int(os.getenv("TEAMS_COALESCE_MAX_PENDING", "500"))
     DEFAULT_EMAIL_SENDER = os.getenv("DEFAULT_EMAIL_SENDER", "hello@wishuponafoodtruck.com")
     SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY", "")
     SENDGRID_SENDER = os.getenv("SENDGRID_SENDER", DEFAULT_EMAIL_SENDER)
+    SENDGRID_BATCH_SIZE = int(os.getenv("SENDGRID_BATCH_SIZE", "250"))
+    SENDGRID_BATCH_CONCURRENCY = int(os.getenv("SENDGRID_BATCH_CONCURRENCY", "4"))
+    SENDGRID_BATCH_MAX_RECIPIENTS = int(os.getenv("SENDGRID_BATCH_MAX_RECIPIENTS", "1000"))
     PIPELINE_API_URL = os.getenv("PIPELINE_API_URL", "")
     PIPELINE_API_TOKEN = os.getenv("PIPELINE_API_TOKEN", "")
+    PIPELINE_SUBMISSION_PIPELINE_ID = os.getenv("PIPELINE_SUBMISSION_PIPELINE_ID", "")
+    PIPELINE_STATUS_CACHE_TTL = float(os.getenv("PIPELINE_STATUS_CACHE_TTL", "2"))
+    PIPELINE_STATUS_TERMINAL_TTL = float(os.getenv("PIPELINE_STATUS_TERMINAL_TTL", "300"))
+    PIPELINE_STATUS_CACHE_SIZE = int(os.getenv("PIPELINE_STATUS_CACHE_SIZE", "512"))
+    PIPELINE_STATUS_MAX_WAIT = float(os.getenv("PIPELINE_STATUS_MAX_WAIT", "30"))
+    PIPELINE_STATUS_MAX_WAITERS = int(os.getenv("PIPELINE_STATUS_MAX_WAITERS", "8"))
+    OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "50"))
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+    OUTBOX_RETRY_BASE_SECONDS = int(os.getenv("OUTBOX_RETRY_BASE_SECONDS", "30"))
@@ -1,3 +1,5 @@
+import uuid
+
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileAllowed, FileField, FileRequired
 from wtforms import (
@@ -7,6 +9,7 @@ from wtforms import (
     StringField,
     SubmitField,
     DateField,
+    HiddenField,
     TextAreaField
 )
 from wtforms.validators import Email, Optional, DataRequired, NumberRange
@@ -41,6 +44,8 @@ class SponsorshipApplicationForm(BaseContactForm):
         ],
         validators=[DataRequired()],
     )
+    # Identifies one rendering of the form so a resubmitted POST reuses its application.
+    submission_id = HiddenField(default=lambda: uuid.uuid4().hex)
     submit = SubmitField("Complete Application")
 
 class FoodVendorApplicationForm(BaseContactForm):
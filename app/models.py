@@ -13,7 +13,11 @@ class ContactInfoMixin:
     instagram = db.Column(db.String(255))
     linkedin = db.Column(db.String(255))
 
-class SponsorshipApplication(ContactInfoMixin, db.Model):
+class StripePaymentMixin:
+    checkout_session_id = db.Column(db.String(255), index=True)
+    payment_intent_id = db.Column(db.String(255), index=True)
+
+class SponsorshipApplication(ContactInfoMixin, StripePaymentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # ContactInfoMixin columns are automatically added here
     
@@ -21,9 +25,10 @@ class SponsorshipApplication(ContactInfoMixin, db.Model):
     logo_filename = db.Column(db.String(255))
     status = db.Column(db.String(50), default="new", nullable=False)
     payment_status = db.Column(db.String(50), default="pending", nullable=False)
+    submission_id = db.Column(db.String(64), unique=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
 
-class FoodVendorApplication(ContactInfoMixin, db.Model):
+class FoodVendorApplication(ContactInfoMixin, StripePaymentMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
     # ContactInfoMixin columns are automatically added here
 
@@ -89,4 +94,73 @@ class LiabilityApplication(db.Model):
     signature_signed_at = db.Column(db.DateTime)
     signature_ip = db.Column(db.String(50))
     status = db.Column(db.String(50), default="new", nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
\ No newline at end of file
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class User(db.Model):
+    __tablename__ = "auth_user"
+
+    id = db.Column(db.Integer, primary_key=True)
+    email = db.Column(db.String(255), nullable=False, unique=True)
+    password_hash = db.Column(db.String(255), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class StripeWebhookEvent(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(255), nullable=False, unique=True)
+    event_type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default="pending", nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    processed_at = db.Column(db.DateTime, index=True)
+
+class SyncCursor(db.Model):
+    name = db.Column(db.String(100), primary_key=True)
+    value = db.Column(db.String(255), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+class OutboxMessage(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    channel = db.Column(db.String(20), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default="pending", nullable=False, index=True)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+
+class UploadedFile(db.Model):
+    __table_args__ = (db.UniqueConstraint("category", "filename"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    category = db.Column(db.String(50), nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    original_filename = db.Column(db.String(255))
+    kind = db.Column(db.String(50), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    content_type = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class StoredBlob(db.Model):
+    sha256 = db.Column(db.String(64), primary_key=True)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    refcount = db.Column(db.Integer, default=0, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+class UploadDerivative(db.Model):
+    __table_args__ = (db.UniqueConstraint("sha256", "name"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    name = db.Column(db.String(50), nullable=False)
+    path = db.Column(db.String(255), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
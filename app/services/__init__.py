@@ -1,11 +1,17 @@
 from . import email as email_service
+from . import fanout as fanout_service
+from . import outbox as outbox_service
 from . import pipeline as pipeline_service
 from . import stripe as stripe_service
 from . import teams as teams_service
+from . import webhooks as webhook_service
 
 __all__ = [
     "email_service",
+    "fanout_service",
+    "outbox_service",
     "pipeline_service",
     "stripe_service",
     "teams_service",
+    "webhook_service",
 ]
@@ -1,11 +1,22 @@
 import os
 import sqlite3
+import threading
+import weakref
+from contextlib import closing, contextmanager
 from dataclasses import dataclass
-from typing import Optional
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
 
-from flask import Flask
+from flask import Flask, current_app, has_app_context
 from flask_login import UserMixin
-from werkzeug.security import check_password_hash, generate_password_hash
+from sqlalchemy import insert, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import User
+
+from .cache import MISSING, TTLCache
+from .password_hashing import check_password, hash_password
 
 
 @dataclass
@@ -15,63 +26,366 @@ class AuthUser(UserMixin):
     password_hash: str
 
 
-def init_auth_db(app: Flask) -> None:
+class _ThreadConnection:
+    def __init__(self, conn: sqlite3.Connection) -> None:
+        self.conn = conn
+
+
+class SqliteConnectionPool:
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = 8,
+        busy_timeout_ms: int = 5000,
+        cached_statements: int = 128,
+    ) -> None:
+        self.db_path = db_path
+        self.max_size = max_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self.cached_statements = cached_statements
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._closed = False
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        if not self._slots.acquire(timeout=self.busy_timeout_ms / 1000):
+            raise sqlite3.OperationalError("Timed out waiting for an auth database connection")
+        try:
+            conn = self._thread_connection()
+            try:
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                if self._closed:
+                    self._discard(conn)
+        finally:
+            self._slots.release()
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._connections)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def abandon(self) -> None:
+        # After fork the connections belong to the parent; forget them without closing.
+        self._lock = threading.Lock()
+        self._closed = True
+        self._connections = []
+
+    def _thread_connection(self) -> sqlite3.Connection:
+        holder = getattr(self._local, "holder", None)
+        if holder is None or holder.conn not in self._connections:
+            holder = _ThreadConnection(self._connect())
+            # The holder lives in the thread's locals, so it is collected when the thread exits.
+            weakref.finalize(holder, self._discard, holder.conn)
+            self._local.holder = holder
+        return holder.conn
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout_ms / 1000,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
+        conn.execute(f"PRAGMA busy_timeout = {int(self.busy_timeout_ms)}")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn not in self._connections:
+                return
+            self._connections.remove(conn)
+        conn.close()
+
+
+_pools: Dict[str, SqliteConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection_pool(app: Flask) -> SqliteConnectionPool:
     db_path = _resolve_db_path(app)
-    os.makedirs(os.path.dirname(db_path), exist_ok=True)
-    with sqlite3.connect(db_path) as conn:
-        conn.execute(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT NOT NULL UNIQUE,
-                password_hash TEXT NOT NULL,
-                created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+    pool = _pools.get(db_path)
+    if pool is not None:
+        return pool
+    with _pools_lock:
+        pool = _pools.get(db_path)
+        if pool is None:
+            pool = SqliteConnectionPool(
+                db_path,
+                max_size=app.config.get("AUTH_DB_POOL_SIZE", 8),
+                busy_timeout_ms=app.config.get("AUTH_DB_BUSY_TIMEOUT_MS", 5000),
+                cached_statements=app.config.get("AUTH_DB_STATEMENT_CACHE_SIZE", 128),
+            )
+            _pools[db_path] = pool
+    return pool
+
+
+def close_connection_pools() -> None:
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def _reset_pools_after_fork() -> None:
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool.abandon()
+    _pools.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+
+class SqliteAuthBackend:
+    name = "sqlite"
+
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+
+    def init_db(self) -> None:
+        db_path = _resolve_db_path(self.app)
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        with get_connection_pool(self.app).connection() as conn:
+            # WAL is persistent in the database file, so it is set once here rather than per connection.
+            if conn.execute("PRAGMA journal_mode").fetchone()[0] != "wal":
+                conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    email TEXT NOT NULL UNIQUE,
+                    password_hash TEXT NOT NULL,
+                    created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+                )
+                """
             )
-            """
+
+    def insert_user(self, email: str, password_hash: str) -> int:
+        try:
+            with get_connection_pool(self.app).connection() as conn:
+                cursor = conn.execute(
+                    "INSERT INTO users (email, password_hash) VALUES (?, ?)",
+                    (email, password_hash),
+                )
+                return cursor.lastrowid
+        except sqlite3.IntegrityError as exc:
+            raise ValueError("User already exists.") from exc
+
+    def get_by_email(self, email: str) -> Optional[AuthUser]:
+        with get_connection_pool(self.app).connection() as conn:
+            row = conn.execute(
+                "SELECT id, email, password_hash FROM users WHERE email = ?",
+                (email,),
+            ).fetchone()
+        return _row_to_user(row)
+
+    def get_by_id(self, user_id: str) -> Optional[AuthUser]:
+        with get_connection_pool(self.app).connection() as conn:
+            row = conn.execute(
+                "SELECT id, email, password_hash FROM users WHERE id = ?",
+                (user_id,),
+            ).fetchone()
+        return _row_to_user(row)
+
+
+class SqlAlchemyAuthBackend:
+    name = "sqlalchemy"
+
+    def __init__(self, app: Flask) -> None:
+        self.app = app
+        self._table_checked = False
+
+    def init_db(self) -> None:
+        # auth_user is created by the Alembic migrations; it is checked on first use so that
+        # `flask db upgrade` can still build the app before the table exists.
+        self._table_checked = False
+
+    def insert_user(self, email: str, password_hash: str) -> int:
+        try:
+            with self._engine() as engine, engine.begin() as conn:
+                result = conn.execute(
+                    insert(User.__table__).values(email=email, password_hash=password_hash)
+                )
+                return result.inserted_primary_key[0]
+        except IntegrityError as exc:
+            raise ValueError("User already exists.") from exc
+
+    def get_by_email(self, email: str) -> Optional[AuthUser]:
+        return self._fetch_one(User.email == email)
+
+    def get_by_id(self, user_id: str) -> Optional[AuthUser]:
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return None
+        return self._fetch_one(User.id == user_id)
+
+    def _fetch_one(self, condition) -> Optional[AuthUser]:
+        query = select(User.id, User.email, User.password_hash).where(condition)
+        with self._engine() as engine, engine.connect() as conn:
+            row = conn.execute(query).first()
+        return _row_to_user(row)
+
+    @contextmanager
+    def _engine(self):
+        if has_app_context() and current_app._get_current_object() is self.app:
+            yield self._checked(db.engine)
+            return
+        with self.app.app_context():
+            yield self._checked(db.engine)
+
+    def _checked(self, engine):
+        if not self._table_checked:
+            require_users_table(engine)
+            self._table_checked = True
+        return engine
+
+
+def require_users_table(engine) -> None:
+    if not inspect(engine).has_table(User.__tablename__):
+        raise RuntimeError(
+            f"The {User.__tablename__} table does not exist; "
+            "run `flask db upgrade` before using AUTH_BACKEND=sqlalchemy."
         )
-        conn.commit()
+
+
+AUTH_BACKENDS = {
+    SqliteAuthBackend.name: SqliteAuthBackend,
+    SqlAlchemyAuthBackend.name: SqlAlchemyAuthBackend,
+}
+
+
+def get_auth_backend(app: Flask):
+    backend = app.extensions.get("auth_backend")
+    if backend is None:
+        backend_name = app.config.get("AUTH_BACKEND", "sqlite")
+        backend_class = AUTH_BACKENDS.get(backend_name)
+        if backend_class is None:
+            raise ValueError(f"Unknown AUTH_BACKEND '{backend_name}'")
+        backend = app.extensions.setdefault("auth_backend", backend_class(app))
+    return backend
+
+
+def init_auth_db(app: Flask) -> None:
+    get_auth_backend(app).init_db()
 
 
 def create_user(app: Flask, email: str, password: str) -> AuthUser:
-    db_path = _resolve_db_path(app)
-    password_hash = generate_password_hash(password)
-    try:
-        with sqlite3.connect(db_path) as conn:
-            cursor = conn.execute(
-                "INSERT INTO users (email, password_hash) VALUES (?, ?)",
-                (email.lower(), password_hash),
-            )
-            user_id = cursor.lastrowid
-    except sqlite3.IntegrityError as exc:
-        raise ValueError("User already exists.") from exc
+    password_hash = hash_password(app, password)
+    user_id = get_auth_backend(app).insert_user(email.lower(), password_hash)
+    invalidate_cached_user(app, user_id)
     return AuthUser(id=user_id, email=email.lower(), password_hash=password_hash)
 
 
 def get_user_by_email(app: Flask, email: str) -> Optional[AuthUser]:
-    db_path = _resolve_db_path(app)
-    with sqlite3.connect(db_path) as conn:
-        row = conn.execute(
-            "SELECT id, email, password_hash FROM users WHERE email = ?",
-            (email.lower(),),
-        ).fetchone()
-    return _row_to_user(row)
+    return get_auth_backend(app).get_by_email(email.lower())
 
 
 def get_user_by_id(app: Flask, user_id: str) -> Optional[AuthUser]:
-    db_path = _resolve_db_path(app)
-    with sqlite3.connect(db_path) as conn:
-        row = conn.execute(
-            "SELECT id, email, password_hash FROM users WHERE id = ?",
-            (user_id,),
-        ).fetchone()
-    return _row_to_user(row)
+    return get_auth_backend(app).get_by_id(user_id)
+
+
+def copy_sqlite_users(app: Flask, source_path: Optional[str] = None) -> Dict[str, int]:
+    source_path = os.path.abspath(source_path or _resolve_db_path(app))
+    if not os.path.exists(source_path):
+        raise ValueError(f"Auth database not found at {source_path}")
+    with closing(sqlite3.connect(source_path)) as conn:
+        rows = conn.execute(
+            "SELECT id, email, password_hash, created_at FROM users ORDER BY id"
+        ).fetchall()
+
+    skipped = 0
+    kept: List[User] = []
+    renumbered: List[User] = []
+    with app.app_context():
+        require_users_table(db.engine)
+        existing = dict(db.session.execute(select(User.email, User.id)).all())
+        taken_ids = set(existing.values())
+        for user_id, email, password_hash, created_at in rows:
+            if email in existing:
+                skipped += 1
+                continue
+            user = User(email=email, password_hash=password_hash, created_at=_parse_sqlite_timestamp(created_at))
+            existing[email] = user_id
+            # Keeping ids keeps login sessions valid; a clashing id gets a fresh one from the database.
+            if user_id in taken_ids:
+                renumbered.append(user)
+            else:
+                user.id = user_id
+                taken_ids.add(user_id)
+                kept.append(user)
+        db.session.add_all(kept)
+        db.session.flush()
+        _sync_user_id_sequence()
+        db.session.add_all(renumbered)
+        db.session.commit()
+    return {"copied": len(kept) + len(renumbered), "skipped": skipped, "renumbered": len(renumbered)}
+
+
+def _sync_user_id_sequence() -> None:
+    # Explicit ids do not advance a Postgres serial, so the next create_user would collide.
+    if db.engine.dialect.name == "postgresql":
+        db.session.execute(
+            text(
+                "SELECT setval(pg_get_serial_sequence('auth_user', 'id'), "
+                "COALESCE((SELECT MAX(id) FROM auth_user), 1))"
+            )
+        )
+
+
+def load_cached_user(app: Flask, user_id: str) -> Optional[AuthUser]:
+    cache = get_user_cache(app)
+    key = str(user_id)
+    user = cache.get(key)
+    if user is not MISSING:
+        return user
+    user = get_user_by_id(app, key)
+    cache.set(key, user)
+    return user
+
+
+def invalidate_cached_user(app: Flask, user_id) -> None:
+    get_user_cache(app).invalidate(str(user_id))
+
+
+def get_user_cache(app: Flask) -> TTLCache:
+    cache = app.extensions.get("auth_user_cache")
+    if cache is None:
+        cache = app.extensions.setdefault(
+            "auth_user_cache",
+            TTLCache(
+                max_size=app.config.get("AUTH_USER_CACHE_SIZE", 256),
+                ttl_seconds=app.config.get("AUTH_USER_CACHE_TTL", 300),
+            ),
+        )
+    return cache
 
 
 def authenticate_user(app: Flask, email: str, password: str) -> Optional[AuthUser]:
     user = get_user_by_email(app, email)
     if not user:
         return None
-    if not check_password_hash(user.password_hash, password):
+    if not check_password(app, user.password_hash, password):
         return None
     return user
 
@@ -82,6 +396,12 @@ def _row_to_user(row: Optional[tuple]) -> Optional[AuthUser]:
     return AuthUser(id=row[0], email=row[1], password_hash=row[2])
 
 
+def _parse_sqlite_timestamp(value: Optional[str]) -> datetime:
+    if not value:
+        return datetime.utcnow()
+    return datetime.fromisoformat(value)
+
+
 def _resolve_db_path(app: Flask) -> str:
     db_path = app.config["AUTH_DB_PATH"]
     if not os.path.isabs(db_path):
@@ -0,0 +1,226 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import Flask, after_this_request, current_app, has_request_context
+from PIL import Image, ImageOps
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import UploadDerivative, UploadedFile
+from .upload_layout import resolve_upload_path
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_DIRECTORY = ".derivatives"
+SOURCE_CONTENT_TYPES = {"image/png", "image/jpeg", "image/webp", "image/gif"}
+DERIVATIVE_KINDS = {"logo"}
+
+
+def derivative_specs(app: Flask) -> Dict[str, Tuple[int, int, bool]]:
+    thumbnail = app.config.get("UPLOAD_THUMBNAIL_SIZE", 160)
+    web = app.config.get("UPLOAD_WEB_LOGO_SIZE", 512)
+    # name -> (width, height, pad to exactly width x height)
+    return {"thumb": (thumbnail, thumbnail, True), "web": (web, web, False)}
+
+
+def derivative_path(upload_root: str, sha256: str, name: str) -> str:
+    return os.path.join(upload_root, DERIVATIVES_DIRECTORY, sha256[:2], f"{sha256}-{name}.webp")
+
+
+def render_derivatives(
+    source_path: str,
+    upload_root: str,
+    sha256: str,
+    specs: Dict[str, Tuple[int, int, bool]],
+    quality: int = 80,
+    max_pixels: int = 0,
+) -> List[Dict[str, Any]]:
+    results = []
+    with Image.open(source_path) as original:
+        # Opening only reads the header; refuse decompression bombs before decoding the pixels.
+        if max_pixels and original.width * original.height > max_pixels:
+            raise ValueError(f"Image is {original.width}x{original.height}, over the {max_pixels} pixel limit")
+        image = ImageOps.exif_transpose(original).convert("RGBA")
+    for name, (width, height, pad) in specs.items():
+        rendered = image.copy()
+        rendered.thumbnail((width, height), Image.LANCZOS)
+        if pad:
+            canvas = Image.new("RGBA", (width, height), (0, 0, 0, 0))
+            canvas.paste(rendered, ((width - rendered.width) // 2, (height - rendered.height) // 2))
+            rendered = canvas
+        path = derivative_path(upload_root, sha256, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial_path = f"{path}.{os.getpid()}.partial"
+        rendered.save(partial_path, "WEBP", quality=quality, method=4)
+        os.replace(partial_path, path)
+        results.append(
+            {
+                "name": name,
+                "width": rendered.width,
+                "height": rendered.height,
+                "size_bytes": os.path.getsize(path),
+            }
+        )
+    return results
+
+
+class DerivativeWorker:
+    def __init__(self, pool_size: int = 1) -> None:
+        self.pool_size = pool_size
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def submit(self, app: Flask, sha256: str, source_path: str) -> Future:
+        args = (
+            source_path,
+            app.config["UPLOAD_FOLDER"],
+            sha256,
+            derivative_specs(app),
+            app.config.get("UPLOAD_DERIVATIVE_QUALITY", 80),
+            app.config.get("UPLOAD_DERIVATIVE_MAX_PIXELS", 0),
+        )
+        with self._lock:
+            self.submitted += 1
+        if self.pool_size <= 0:
+            future: Future = Future()
+            try:
+                future.set_result(render_derivatives(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+        else:
+            future = self._get_executor().submit(render_derivatives, *args)
+        future.add_done_callback(lambda done: self._record(app, sha256, done))
+        return future
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pool_size": self.pool_size,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+            }
+
+    def _record(self, app: Flask, sha256: str, future: Future) -> None:
+        try:
+            results = future.result()
+        except Exception as exc:
+            with self._lock:
+                self.failed += 1
+            logger.warning("Derivative generation failed for %s", sha256, exc_info=exc)
+            return
+        with app.app_context():
+            record_derivatives(sha256, results)
+        with self._lock:
+            self.completed += 1
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+            return self._executor
+
+
+def get_derivative_worker(app: Flask) -> DerivativeWorker:
+    registered = app.extensions.get("upload_derivative_worker")
+    if registered is None or registered[0] != os.getpid():
+        registered = (os.getpid(), DerivativeWorker(app.config.get("UPLOAD_DERIVATIVE_WORKERS", 1)))
+        app.extensions["upload_derivative_worker"] = registered
+    return registered[1]
+
+
+def supports_derivatives(uploaded: UploadedFile) -> bool:
+    return uploaded.kind in DERIVATIVE_KINDS and uploaded.content_type in SOURCE_CONTENT_TYPES
+
+
+def schedule_derivatives(uploaded: UploadedFile, source_path: str) -> None:
+    if not supports_derivatives(uploaded):
+        return
+    app = current_app._get_current_object()
+    sha256 = uploaded.sha256
+
+    def submit() -> None:
+        if UploadDerivative.query.filter_by(sha256=sha256).first() is None:
+            get_derivative_worker(app).submit(app, sha256, source_path)
+
+    if not has_request_context():
+        submit()
+        return
+
+    # Wait for the view to commit so the worker never contends with the request's transaction.
+    @after_this_request
+    def submit_after_request(response):
+        if response.status_code < 400:
+            with app.app_context():
+                submit()
+        return response
+
+
+def record_derivatives(sha256: str, results: List[Dict[str, Any]]) -> None:
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    for result in results:
+        derivative = UploadDerivative.query.filter_by(sha256=sha256, name=result["name"]).first()
+        if derivative is None:
+            derivative = UploadDerivative(sha256=sha256, name=result["name"])
+            db.session.add(derivative)
+        derivative.path = os.path.relpath(derivative_path(upload_root, sha256, result["name"]), upload_root)
+        derivative.width = result["width"]
+        derivative.height = result["height"]
+        derivative.size_bytes = result["size_bytes"]
+        derivative.content_type = "image/webp"
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent worker recorded the same derivatives for this content.
+        db.session.rollback()
+
+
+def generate_missing_derivatives() -> Dict[str, int]:
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    done = {sha256 for (sha256,) in db.session.query(UploadDerivative.sha256).distinct()}
+    counts = {"generated": 0, "skipped": 0, "failed": 0}
+    for uploaded in UploadedFile.query.order_by(UploadedFile.id):
+        if not supports_derivatives(uploaded) or uploaded.sha256 in done:
+            counts["skipped"] += 1
+            continue
+        source_path = resolve_upload_path(upload_root, uploaded.category, uploaded.filename)
+        if source_path is None:
+            logger.warning("Upload %s/%s is missing on disk", uploaded.category, uploaded.filename)
+            counts["failed"] += 1
+            continue
+        try:
+            results = render_derivatives(
+                source_path,
+                upload_root,
+                uploaded.sha256,
+                derivative_specs(current_app),
+                current_app.config.get("UPLOAD_DERIVATIVE_QUALITY", 80),
+                current_app.config.get("UPLOAD_DERIVATIVE_MAX_PIXELS", 0),
+            )
+        except Exception as exc:
+            logger.warning("Derivative generation failed for %s", source_path, exc_info=exc)
+            counts["failed"] += 1
+            continue
+        record_derivatives(uploaded.sha256, results)
+        done.add(uploaded.sha256)
+        counts["generated"] += 1
+    return counts
+
+
+def find_derivative(category: str, filename: str, name: str) -> Optional[UploadDerivative]:
+    uploaded = UploadedFile.query.filter_by(category=category, filename=filename).first()
+    if uploaded is None or uploaded.kind not in DERIVATIVE_KINDS:
+        return None
+    return UploadDerivative.query.filter_by(sha256=uploaded.sha256, name=name).first()
@@ -1,12 +1,29 @@
 import logging
-from typing import Any, Dict
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List
 
-from flask import current_app
+from flask import Flask, current_app
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 
 logger = logging.getLogger(__name__)
 
+# SendGrid rejects a v3 mail/send request with more than 1000 personalizations.
+MAX_PERSONALIZATIONS = 1000
+
+
+def get_sendgrid_client(app: Flask) -> SendGridAPIClient:
+    api_key = app.config.get("SENDGRID_API_KEY")
+    if not api_key:
+        raise ValueError("SendGrid is not configured")
+    registered = app.extensions.get("sendgrid_client")
+    if registered is None or registered[0] != os.getpid() or registered[1] != api_key:
+        registered = (os.getpid(), api_key, SendGridAPIClient(api_key))
+        app.extensions["sendgrid_client"] = registered
+    return registered[2]
+
 
 def send_email(payload: Dict[str, Any]) -> Dict[str, Any]:
     api_key = current_app.config.get("SENDGRID_API_KEY")
@@ -21,7 +38,7 @@ def send_email(payload: Dict[str, Any]) -> Dict[str, Any]:
         raise ValueError("to, subject, and content are required")
 
     message = Mail(from_email=sender, to_emails=to_email, subject=subject, plain_text_content=content)
-    client = SendGridAPIClient(api_key)
+    client = get_sendgrid_client(current_app)
     response = client.send(message)
     logger.info("Email sent", extra={"status_code": response.status_code})
     return {
@@ -29,3 +46,84 @@ def send_email(payload: Dict[str, Any]) -> Dict[str, Any]:
         "provider": "sendgrid",
         "status_code": response.status_code,
     }
+
+
+def send_batch(payload: Dict[str, Any]) -> Dict[str, Any]:
+    config = current_app.config
+    sender = config.get("SENDGRID_SENDER")
+    if not config.get("SENDGRID_API_KEY") or not sender:
+        raise ValueError("SendGrid is not configured")
+
+    recipients = payload.get("to")
+    subject = payload.get("subject")
+    content = payload.get("content")
+    if not recipients or not subject or not content:
+        raise ValueError("to, subject, and content are required")
+    if isinstance(recipients, str) or not isinstance(recipients, list):
+        raise ValueError("to must be a list of email addresses")
+    recipients = _unique_recipients(recipients)
+    max_recipients = int(config.get("SENDGRID_BATCH_MAX_RECIPIENTS", 1000))
+    if len(recipients) > max_recipients:
+        raise ValueError(f"At most {max_recipients} recipients are allowed per batch")
+
+    chunk_size = min(max(int(config.get("SENDGRID_BATCH_SIZE", MAX_PERSONALIZATIONS)), 1), MAX_PERSONALIZATIONS)
+    chunks = [recipients[start:start + chunk_size] for start in range(0, len(recipients), chunk_size)]
+    client = get_sendgrid_client(current_app)
+    concurrency = max(int(config.get("SENDGRID_BATCH_CONCURRENCY", 4)), 1)
+
+    def send_chunk(index: int) -> Dict[str, Any]:
+        chunk = chunks[index]
+        # One personalization per recipient so addresses are not disclosed to each other.
+        message = Mail(
+            from_email=sender,
+            to_emails=chunk,
+            subject=subject,
+            plain_text_content=content,
+            is_multiple=True,
+        )
+        started = time.perf_counter()
+        result: Dict[str, Any] = {"chunk": index, "recipients": len(chunk)}
+        try:
+            response = client.send(message)
+        except Exception as exc:
+            logger.warning("Email batch chunk failed", exc_info=exc)
+            result.update(status="failed", error=str(exc), status_code=getattr(exc, "status_code", None))
+        else:
+            result.update(status="sent", status_code=response.status_code)
+        result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        return result
+
+    if len(chunks) == 1 or concurrency == 1:
+        results = [send_chunk(index) for index in range(len(chunks))]
+    else:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(chunks))) as executor:
+            results = list(executor.map(send_chunk, range(len(chunks))))
+
+    sent = sum(result["recipients"] for result in results if result["status"] == "sent")
+    if sent == len(recipients):
+        status = "sent"
+    elif sent:
+        status = "partial"
+    else:
+        status = "failed"
+    logger.info("Email batch sent", extra={"recipients": len(recipients), "chunks": len(chunks), "status": status})
+    return {
+        "status": status,
+        "provider": "sendgrid",
+        "recipients": len(recipients),
+        "sent": sent,
+        "chunks": results,
+    }
+
+
+def _unique_recipients(recipients: List[Any]) -> List[str]:
+    seen = set()
+    unique = []
+    for recipient in recipients:
+        if not isinstance(recipient, str) or "@" not in recipient:
+            raise ValueError(f"Invalid recipient: {recipient!r}")
+        address = recipient.strip()
+        if address.lower() not in seen:
+            seen.add(address.lower())
+            unique.append(address)
+    return unique
@@ -0,0 +1,77 @@
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from flask import Flask, current_app
+
+from . import email as email_service
+from . import pipeline as pipeline_service
+from . import teams as teams_service
+from .http import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+ACTIONS: Dict[str, Callable[[Dict[str, Any]], Dict[str, Any]]] = {
+    "teams": teams_service.send_notification,
+    "email": email_service.send_email,
+    "pipeline": pipeline_service.run_pipeline,
+}
+
+
+def run_actions(payload: Dict[str, Any]) -> Dict[str, Any]:
+    actions = payload.get("actions")
+    if not isinstance(actions, list) or not actions:
+        raise ValueError("actions must be a non-empty list")
+    max_actions = current_app.config.get("DISPATCH_MAX_ACTIONS", 10)
+    if len(actions) > max_actions:
+        raise ValueError(f"At most {max_actions} actions are allowed per request")
+    for index, action in enumerate(actions):
+        if not isinstance(action, dict) or action.get("type") not in ACTIONS:
+            raise ValueError(f"actions[{index}].type must be one of: {', '.join(sorted(ACTIONS))}")
+        if not isinstance(action.get("payload", {}), dict):
+            raise ValueError(f"actions[{index}].payload must be an object")
+
+    app = current_app._get_current_object()
+    started = time.perf_counter()
+    results = list(get_dispatch_executor(app).map(lambda item: _run_action(app, *item), enumerate(actions)))
+    failed = sum(1 for result in results if result["status"] != "ok")
+    return {
+        "status": "ok" if not failed else ("failed" if failed == len(results) else "partial"),
+        "elapsed_ms": _elapsed_ms(started),
+        "results": results,
+    }
+
+
+def get_dispatch_executor(app: Flask) -> ThreadPoolExecutor:
+    registered = app.extensions.get("dispatch_executor")
+    if registered is None or registered[0] != os.getpid():
+        executor = ThreadPoolExecutor(
+            max_workers=max(app.config.get("DISPATCH_CONCURRENCY", 4), 1),
+            thread_name_prefix="dispatch",
+        )
+        registered = (os.getpid(), executor)
+        app.extensions["dispatch_executor"] = registered
+    return registered[1]
+
+
+def _run_action(app: Flask, index: int, action: Dict[str, Any]) -> Dict[str, Any]:
+    started = time.perf_counter()
+    result: Dict[str, Any] = {"index": index, "type": action["type"]}
+    with app.app_context():
+        try:
+            result.update(status="ok", result=ACTIONS[action["type"]](action.get("payload") or {}))
+        except ValueError as exc:
+            result.update(status="invalid", error=str(exc))
+        except CircuitOpenError as exc:
+            result.update(status="unavailable", error=str(exc), retry_after=int(exc.retry_after))
+        except Exception as exc:
+            logger.warning("Dispatch action failed", exc_info=exc)
+            result.update(status="error", error=str(exc))
+    result["elapsed_ms"] = _elapsed_ms(started)
+    return result
+
+
+def _elapsed_ms(started: float) -> float:
+    return round((time.perf_counter() - started) * 1000, 1)
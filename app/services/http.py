@@ -0,0 +1,144 @@
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+from flask import Flask
+from requests.adapters import HTTPAdapter
+
+
+class CircuitOpenError(RuntimeError):
+    def __init__(self, provider: str, retry_after: float) -> None:
+        super().__init__(f"{provider} is temporarily unavailable")
+        self.provider = provider
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_seconds: float = 30) -> None:
+        self.name = name
+        self.failure_threshold = max(failure_threshold, 1)
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.rejected = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.state == "closed":
+                return
+            remaining = self.opened_at + self.reset_seconds - time.monotonic()
+            if self.state == "open" and remaining <= 0:
+                self.state = "half_open"
+            if self.state == "half_open" and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return
+            self.rejected += 1
+            raise CircuitOpenError(self.name, max(remaining, 1))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = "closed"
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self, error: Exception) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = describe_error(error)
+            self._trial_in_flight = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = None
+            if self.state == "open":
+                retry_in = round(max(self.opened_at + self.reset_seconds - time.monotonic(), 0), 1)
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "rejected": self.rejected,
+                "retry_in_seconds": retry_in,
+                "last_error": self.last_error,
+            }
+
+
+def describe_error(error: Exception) -> str:
+    # Exception text can carry request URLs, and webhook URLs embed their secret token.
+    response = getattr(error, "response", None)
+    if response is not None:
+        return f"{type(error).__name__} ({response.status_code})"
+    return type(error).__name__
+
+
+def build_http_session(pool_size: int) -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def get_http_session(app: Flask) -> requests.Session:
+    registered = app.extensions.get("http_session")
+    # Per-process resources in app.extensions are stored with the pid that built them and rebuilt
+    # when it changes, so pooled sockets, connections and threads are never shared with a forked worker.
+    if registered is None or registered[0] != os.getpid():
+        registered = (os.getpid(), build_http_session(app.config.get("HTTP_POOL_SIZE", 10)))
+        app.extensions["http_session"] = registered
+    return registered[1]
+
+
+def get_circuit_breaker(app: Flask, provider: str) -> CircuitBreaker:
+    breakers = app.extensions.setdefault("circuit_breakers", {})
+    breaker = breakers.get(provider)
+    if breaker is None:
+        breaker = breakers.setdefault(
+            provider,
+            CircuitBreaker(
+                provider,
+                failure_threshold=app.config.get("CIRCUIT_BREAKER_FAILURE_THRESHOLD", 5),
+                reset_seconds=app.config.get("CIRCUIT_BREAKER_RESET_SECONDS", 30),
+            ),
+        )
+    return breaker
+
+
+def provider_request(
+    app: Flask,
+    provider: str,
+    method: str,
+    url: str,
+    read_timeout: float = 10,
+    **kwargs: Any,
+) -> requests.Response:
+    breaker = get_circuit_breaker(app, provider)
+    breaker.before_call()
+    timeout = (app.config.get("HTTP_CONNECT_TIMEOUT", 3), read_timeout)
+    try:
+        response = get_http_session(app).request(method, url, timeout=timeout, **kwargs)
+    except requests.RequestException as exc:
+        breaker.record_failure(exc)
+        raise
+    if response.status_code >= 500 or response.status_code == 429:
+        error = requests.HTTPError(f"{response.status_code} from {provider}", response=response)
+        breaker.record_failure(error)
+        raise error
+    breaker.record_success()
+    response.raise_for_status()
+    return response
+
+
+def provider_status(app: Flask) -> Dict[str, Dict[str, Any]]:
+    return {
+        provider: breaker.stats()
+        for provider, breaker in sorted(app.extensions.get("circuit_breakers", {}).items())
+    }
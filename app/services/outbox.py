@@ -0,0 +1,107 @@
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from flask import current_app
+
+from ..extensions import db
+from ..models import OutboxMessage
+from . import email as email_service
+from . import pipeline as pipeline_service
+from . import teams as teams_service
+from .http import CircuitOpenError
+from .notifications import send_placeholder_email
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue(channel: str, payload: Dict[str, Any]) -> OutboxMessage:
+    if channel not in DELIVERERS:
+        raise ValueError(f"Unknown outbox channel '{channel}'")
+    message = OutboxMessage(channel=channel, payload=json.dumps(payload))
+    db.session.add(message)
+    return message
+
+
+def enqueue_submission_notifications(subject: str, recipient: str, details: Dict[str, Any]) -> None:
+    config = current_app.config
+    enqueue(
+        "email",
+        {
+            "to": recipient,
+            "subject": subject,
+            "content": f"{subject}. Thank you, we will be in touch soon.",
+        },
+    )
+    if config.get("TEAMS_WEBHOOK_URL"):
+        summary = ", ".join(f"{key}: {value}" for key, value in details.items() if value)
+        enqueue("teams", {"message": f"{subject} ({summary})" if summary else subject})
+    if config.get("PIPELINE_API_URL") and config.get("PIPELINE_SUBMISSION_PIPELINE_ID"):
+        enqueue(
+            "pipeline",
+            {
+                "pipeline_id": config["PIPELINE_SUBMISSION_PIPELINE_ID"],
+                "parameters": {"subject": subject, **details},
+            },
+        )
+
+
+def dispatch(batch_size: int = 50, max_attempts: int = 5, retry_base_seconds: int = 30) -> Dict[str, int]:
+    now = datetime.utcnow()
+    messages = (
+        OutboxMessage.query.filter(
+            OutboxMessage.status == "pending",
+            OutboxMessage.next_attempt_at <= now,
+        )
+        .order_by(OutboxMessage.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    counts = {"sent": 0, "retrying": 0, "dead": 0}
+    for message in messages:
+        try:
+            DELIVERERS[message.channel](json.loads(message.payload))
+        except CircuitOpenError as exc:
+            # The provider is known to be down; wait it out without spending an attempt.
+            message.last_error = str(exc)
+            message.next_attempt_at = now + timedelta(seconds=exc.retry_after)
+            counts["retrying"] += 1
+            continue
+        except Exception as exc:
+            message.attempts += 1
+            message.last_error = str(exc)
+            if message.attempts >= max_attempts:
+                message.status = "dead"
+                counts["dead"] += 1
+                logger.error("Outbox message %s moved to dead letter", message.id, exc_info=exc)
+            else:
+                message.next_attempt_at = now + timedelta(seconds=retry_base_seconds * 2 ** (message.attempts - 1))
+                counts["retrying"] += 1
+            continue
+        message.attempts += 1
+        message.status = "sent"
+        message.sent_at = datetime.utcnow()
+        counts["sent"] += 1
+    if messages:
+        db.session.commit()
+    return counts
+
+
+def _deliver_email(payload: Dict[str, Any]) -> None:
+    if not current_app.config.get("SENDGRID_API_KEY"):
+        send_placeholder_email(payload["subject"], payload["to"])
+        return
+    email_service.send_email(payload)
+
+
+def _deliver_teams(payload: Dict[str, Any]) -> None:
+    teams_service.send_notification(payload, coalesce=False)
+
+
+DELIVERERS: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+    "email": _deliver_email,
+    "teams": _deliver_teams,
+    "pipeline": pipeline_service.run_pipeline,
+}
@@ -0,0 +1,135 @@
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
+from typing import Any, Callable, Dict, Optional
+
+from flask import Flask
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+# werkzeug's default scrypt cost; calibration never recommends anything weaker.
+DEFAULT_SCRYPT_N = 2**15
+
+
+class HashingPoolSaturated(RuntimeError):
+    pass
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        pool_size: int = 2,
+        queue_limit: int = 8,
+        method: str = "scrypt",
+        timeout: float = 10,
+    ) -> None:
+        self.pool_size = pool_size
+        self.queue_limit = queue_limit
+        self.method = method
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max(pool_size, 1) + queue_limit)
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def generate(self, password: str) -> str:
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, password_hash: str, password: str) -> bool:
+        return self._run(check_password_hash, password_hash, password)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, func: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated("Too many login attempts in progress. Please retry shortly.")
+        if self.pool_size <= 0:
+            try:
+                return func(*args)
+            finally:
+                self._slots.release()
+        try:
+            future = self._get_executor().submit(func, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # A caller that times out leaves the hash running, so the slot is freed only when the worker finishes.
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FuturesTimeoutError as exc:
+            raise HashingPoolSaturated("Password hashing timed out. Please retry shortly.") from exc
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.pool_size)
+            return self._executor
+
+
+def get_password_hasher(app: Flask) -> PasswordHasher:
+    settings = (
+        app.config.get("AUTH_HASH_POOL_SIZE", 2),
+        app.config.get("AUTH_HASH_QUEUE_LIMIT", 8),
+        app.config.get("AUTH_PASSWORD_HASH_METHOD", "scrypt"),
+        app.config.get("AUTH_HASH_TIMEOUT", 10),
+    )
+    registered = app.extensions.get("password_hasher")
+    if registered is None or registered[0] != os.getpid() or registered[1] != settings:
+        if registered is not None and registered[0] == os.getpid():
+            registered[2].shutdown()
+        registered = (os.getpid(), settings, PasswordHasher(*settings))
+        app.extensions["password_hasher"] = registered
+    return registered[2]
+
+
+def hash_password(app: Flask, password: str) -> str:
+    return get_password_hasher(app).generate(password)
+
+
+def check_password(app: Flask, password_hash: str, password: str) -> bool:
+    return get_password_hasher(app).check(password_hash, password)
+
+
+def shutdown_password_hasher(app: Flask) -> None:
+    registered = app.extensions.pop("password_hasher", None)
+    if registered is not None and registered[0] == os.getpid():
+        registered[2].shutdown()
+
+
+def measure_hash_ms(method: str, samples: int = 5) -> float:
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        generate_password_hash("calibration-password", method)
+        timings.append((time.perf_counter() - started) * 1000)
+    return statistics.median(timings)
+
+
+def calibrate_hash_method(algorithm: str, target_ms: float, samples: int = 5) -> Dict[str, Any]:
+    if algorithm == "scrypt":
+        n = DEFAULT_SCRYPT_N
+        method = f"scrypt:{n}:8:1"
+        elapsed = measure_hash_ms(method, samples)
+        while n < 2**20:
+            candidate = f"scrypt:{n * 2}:8:1"
+            candidate_ms = measure_hash_ms(candidate, samples)
+            if candidate_ms > target_ms:
+                break
+            n *= 2
+            method, elapsed = candidate, candidate_ms
+    elif algorithm == "pbkdf2":
+        probe_iterations = 100_000
+        probe_ms = measure_hash_ms(f"pbkdf2:sha256:{probe_iterations}", samples)
+        iterations = max(int(probe_iterations * target_ms / probe_ms), DEFAULT_PBKDF2_ITERATIONS)
+        iterations -= iterations % 10_000
+        method = f"pbkdf2:sha256:{iterations}"
+        elapsed = measure_hash_ms(method, samples)
+    else:
+        raise ValueError("algorithm must be 'scrypt' or 'pbkdf2'")
+    return {"method": method, "median_ms": round(elapsed, 1), "target_ms": target_ms}
@@ -1,11 +1,22 @@
+import hashlib
+import json
 import logging
-from typing import Any, Dict
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Iterable
 
 import requests
-from flask import current_app
+from flask import Flask, current_app
+
+from .cache import SingleFlight, TTLCache
+from .http import provider_request
 
 logger = logging.getLogger(__name__)
 
+TERMINAL_RUN_STATES = {"succeeded", "success", "completed", "failed", "error", "cancelled", "canceled"}
+
 
 def run_pipeline(payload: Dict[str, Any]) -> Dict[str, Any]:
     api_url = current_app.config.get("PIPELINE_API_URL")
@@ -17,13 +28,15 @@ def run_pipeline(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not pipeline_id:
         raise ValueError("pipeline_id is required")
 
-    response = requests.post(
+    response = provider_request(
+        current_app._get_current_object(),
+        "pipeline",
+        "POST",
         f"{api_url.rstrip('/')}/pipelines/{pipeline_id}/runs",
+        read_timeout=15,
         json=payload.get("parameters") or {},
         headers={"Authorization": f"Bearer {api_token}"},
-        timeout=15,
     )
-    response.raise_for_status()
     body = response.json() if response.content else {}
     logger.info("Pipeline triggered", extra={"status_code": response.status_code, "pipeline_id": pipeline_id})
     return {
@@ -32,3 +45,101 @@ def run_pipeline(payload: Dict[str, Any]) -> Dict[str, Any]:
         "pipeline_id": pipeline_id,
         "run_id": body.get("id"),
     }
+
+
+def get_run_status(run_id: str, wait: float = 0, known_etags: Iterable[str] = ()) -> Dict[str, Any]:
+    if not run_id:
+        raise ValueError("run_id is required")
+    if not math.isfinite(wait):
+        raise ValueError("wait must be a finite number of seconds")
+    app = current_app._get_current_object()
+    known_etags = set(known_etags)
+    entry = _get_cached_run_status(app, run_id)
+    wait = max(min(wait, app.config.get("PIPELINE_STATUS_MAX_WAIT", 30)), 0)
+    if not wait or entry["etag"] not in known_etags or entry["terminal"]:
+        return entry
+    waiters = get_run_status_waiters(app)
+    # Each waiter holds a worker thread, so past the cap callers get the current state and poll again.
+    if not waiters.acquire(blocking=False):
+        return entry
+    try:
+        deadline = time.monotonic() + wait
+        # Long-poll: every waiter re-reads the shared cache, so N clients still cost one upstream poll per TTL.
+        while entry["etag"] in known_etags and not entry["terminal"]:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(app.config.get("PIPELINE_STATUS_CACHE_TTL", 2), remaining))
+            entry = _get_cached_run_status(app, run_id)
+    finally:
+        waiters.release()
+    return entry
+
+
+def get_run_status_waiters(app: Flask) -> threading.BoundedSemaphore:
+    registered = app.extensions.get("pipeline_run_waiters")
+    if registered is None or registered[0] != os.getpid():
+        registered = (os.getpid(), threading.BoundedSemaphore(app.config.get("PIPELINE_STATUS_MAX_WAITERS", 8)))
+        app.extensions["pipeline_run_waiters"] = registered
+    return registered[1]
+
+
+def get_run_status_cache(app: Flask) -> TTLCache:
+    cache = app.extensions.get("pipeline_run_status")
+    if cache is None:
+        cache = app.extensions.setdefault(
+            "pipeline_run_status",
+            TTLCache(
+                max_size=app.config.get("PIPELINE_STATUS_CACHE_SIZE", 512),
+                ttl_seconds=app.config.get("PIPELINE_STATUS_CACHE_TTL", 2),
+            ),
+        )
+    return cache
+
+
+def _get_cached_run_status(app: Flask, run_id: str) -> Dict[str, Any]:
+    cache = get_run_status_cache(app)
+    cached = cache.get(run_id, None)
+    if cached is not None:
+        return cached
+    single_flight = app.extensions.setdefault("pipeline_run_single_flight", SingleFlight())
+
+    def fetch() -> Dict[str, Any]:
+        entry = _fetch_run_status(app, run_id)
+        ttl = app.config.get("PIPELINE_STATUS_TERMINAL_TTL", 300) if entry["terminal"] else None
+        cache.set(run_id, entry, ttl_seconds=ttl)
+        return entry
+
+    return single_flight.do(run_id, fetch)
+
+
+def _fetch_run_status(app: Flask, run_id: str) -> Dict[str, Any]:
+    api_url = app.config.get("PIPELINE_API_URL")
+    api_token = app.config.get("PIPELINE_API_TOKEN")
+    if not api_url or not api_token:
+        raise ValueError("Pipeline API is not configured")
+    try:
+        response = provider_request(
+            app,
+            "pipeline",
+            "GET",
+            f"{api_url.rstrip('/')}/runs/{run_id}",
+            headers={"Authorization": f"Bearer {api_token}"},
+        )
+    except requests.HTTPError as exc:
+        if exc.response is not None and exc.response.status_code == 404:
+            raise LookupError(f"Pipeline run '{run_id}' was not found") from exc
+        raise
+    run = response.json() if response.content else {}
+    body = {
+        "provider": "pipeline",
+        "run_id": run_id,
+        "status": run.get("status"),
+        "run": run,
+    }
+    encoded = json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return {
+        "body": body,
+        "etag": hashlib.sha256(encoded).hexdigest()[:32],
+        "terminal": str(run.get("status") or "").lower() in TERMINAL_RUN_STATES,
+    }
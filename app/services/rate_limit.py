@@ -0,0 +1,238 @@
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from flask import Flask, jsonify, make_response, request
+
+from .auth_store import SqliteConnectionPool
+
+# Requests with these methods are only limited when their endpoint has an explicit route rule.
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+# Stripe retries webhooks on 429 and deliveries are already de-duplicated by event id.
+EXEMPT_ENDPOINTS = {"api.stripe_webhook", "static"}
+
+
+def parse_route_rules(raw: str) -> Dict[str, Tuple[float, float]]:
+    rules: Dict[str, Tuple[float, float]] = {}
+    for item in (raw or "").split(","):
+        if not item.strip():
+            continue
+        endpoint, _, limit = item.partition("=")
+        count, _, period = limit.partition("/")
+        try:
+            count_value, period_value = float(count), float(period or 1)
+        except ValueError as exc:
+            raise ValueError(f"Invalid rate limit rule '{item.strip()}'; expected endpoint=count/seconds") from exc
+        if count_value <= 0 or period_value <= 0:
+            raise ValueError(f"Invalid rate limit rule '{item.strip()}'; count and seconds must be positive")
+        rules[endpoint.strip()] = (count_value / period_value, count_value)
+    return rules
+
+
+class MemoryBucketStore:
+    def __init__(self, max_keys: int = 50000) -> None:
+        self.max_keys = max_keys
+        self._buckets: Dict[str, Tuple[float, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (burst, now, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (burst - tokens) / rate)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return wait
+
+    def size(self) -> int:
+        with self._lock:
+            return len(self._buckets)
+
+    def _prune(self, now: float) -> None:
+        # A bucket that has refilled completely is indistinguishable from a new one.
+        full = [key for key, (_, _, full_at) in self._buckets.items() if full_at <= now]
+        for key in full or list(self._buckets)[: len(self._buckets) // 2]:
+            del self._buckets[key]
+
+
+class SqliteBucketStore:
+    def __init__(
+        self,
+        db_path: str,
+        busy_timeout_ms: int = 1000,
+        max_keys: int = 50000,
+        prune_interval: float = 60,
+    ) -> None:
+        self.db_path = db_path
+        self.busy_timeout_ms = busy_timeout_ms
+        self.max_keys = max_keys
+        self.prune_interval = prune_interval
+        self._next_prune = 0.0
+        self._pool: Optional[Tuple[int, SqliteConnectionPool]] = None
+        self._lock = threading.Lock()
+        with self._get_pool().connection() as conn:
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rate_limit_bucket (
+                    key TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    full_at REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(rate_limit_bucket)")}
+            if "full_at" not in columns:
+                conn.execute("ALTER TABLE rate_limit_bucket ADD COLUMN full_at REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_rate_limit_bucket_full_at ON rate_limit_bucket (full_at)")
+
+    def take(self, key: str, rate: float, burst: float) -> float:
+        now = time.time()
+        with self._get_pool().connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT tokens, updated_at FROM rate_limit_bucket WHERE key = ?",
+                (key,),
+            ).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(now - updated, 0) * rate)
+            wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+            if not wait:
+                tokens -= 1
+            conn.execute(
+                "INSERT OR REPLACE INTO rate_limit_bucket (key, tokens, updated_at, full_at) VALUES (?, ?, ?, ?)",
+                (key, tokens, now, now + (burst - tokens) / rate),
+            )
+            if now >= self._next_prune:
+                self._next_prune = now + self.prune_interval
+                self._prune(conn, now)
+        return wait
+
+    def prune(self) -> int:
+        with self._get_pool().connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            return self._prune(conn, time.time())
+
+    def size(self) -> int:
+        with self._get_pool().connection() as conn:
+            return conn.execute("SELECT COUNT(*) FROM rate_limit_bucket").fetchone()[0]
+
+    def _prune(self, conn: Any, now: float) -> int:
+        removed = conn.execute("DELETE FROM rate_limit_bucket WHERE full_at <= ?", (now,)).rowcount
+        overflow = conn.execute("SELECT COUNT(*) FROM rate_limit_bucket").fetchone()[0] - self.max_keys
+        if overflow > 0:
+            removed += conn.execute(
+                "DELETE FROM rate_limit_bucket WHERE key IN "
+                "(SELECT key FROM rate_limit_bucket ORDER BY updated_at LIMIT ?)",
+                (overflow,),
+            ).rowcount
+        return removed
+
+    def _get_pool(self) -> SqliteConnectionPool:
+        with self._lock:
+            if self._pool is None or self._pool[0] != os.getpid():
+                if self._pool is not None:
+                    self._pool[1].abandon()
+                self._pool = (os.getpid(), SqliteConnectionPool(self.db_path, busy_timeout_ms=self.busy_timeout_ms))
+            return self._pool[1]
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        store: Any,
+        ip_rate: float = 2,
+        ip_burst: float = 30,
+        routes: Optional[Dict[str, Tuple[float, float]]] = None,
+    ) -> None:
+        self.store = store
+        self.ip_rate = ip_rate
+        self.ip_burst = ip_burst
+        self.routes = routes or {}
+        self.allowed = 0
+        self.limited = 0
+        self._lock = threading.Lock()
+
+    def applies_to(self, endpoint: Optional[str], method: str) -> bool:
+        if endpoint is None or endpoint in EXEMPT_ENDPOINTS:
+            return False
+        return endpoint in self.routes or endpoint.startswith("api.") or method not in SAFE_METHODS
+
+    def check(self, endpoint: str, client: str) -> float:
+        wait = self.store.take(f"ip:{client}", self.ip_rate, self.ip_burst)
+        rule = self.routes.get(endpoint)
+        if not wait and rule is not None:
+            wait = self.store.take(f"route:{endpoint}:{client}", *rule)
+        with self._lock:
+            if wait:
+                self.limited += 1
+            else:
+                self.allowed += 1
+        return wait
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.allowed + self.limited
+            return {
+                "store": type(self.store).__name__,
+                "allowed": self.allowed,
+                "limited": self.limited,
+                "limited_rate": round(self.limited / total, 4) if total else 0.0,
+                "buckets": self.store.size(),
+                "ip_rate": self.ip_rate,
+                "ip_burst": self.ip_burst,
+                "routes": sorted(self.routes),
+            }
+
+
+def build_rate_limiter(app: Flask) -> RateLimiter:
+    if app.config.get("RATE_LIMIT_STORE", "memory") == "sqlite":
+        db_path = app.config.get("RATE_LIMIT_DB_PATH") or os.path.join(app.instance_path, "rate_limit.db")
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        store: Any = SqliteBucketStore(db_path, max_keys=app.config.get("RATE_LIMIT_MAX_KEYS", 50000))
+    else:
+        store = MemoryBucketStore(app.config.get("RATE_LIMIT_MAX_KEYS", 50000))
+    return RateLimiter(
+        store,
+        ip_rate=app.config.get("RATE_LIMIT_IP_RATE", 2),
+        ip_burst=app.config.get("RATE_LIMIT_IP_BURST", 30),
+        routes=parse_route_rules(app.config.get("RATE_LIMIT_ROUTES", "")),
+    )
+
+
+def get_rate_limiter(app: Flask) -> Optional[RateLimiter]:
+    return app.extensions.get("rate_limiter")
+
+
+def init_rate_limiter(app: Flask) -> Optional[RateLimiter]:
+    if not app.config.get("RATE_LIMIT_ENABLED"):
+        return None
+    registered = "rate_limiter" in app.extensions
+    app.extensions["rate_limiter"] = build_rate_limiter(app)
+    if registered:
+        return app.extensions["rate_limiter"]
+
+    @app.before_request
+    def enforce_rate_limit():
+        limiter = get_rate_limiter(app)
+        if limiter is None or not app.config.get("RATE_LIMIT_ENABLED"):
+            return None
+        if not limiter.applies_to(request.endpoint, request.method):
+            return None
+        wait = limiter.check(request.endpoint, request.remote_addr or "unknown")
+        if not wait:
+            return None
+        if request.blueprint == "api":
+            response = make_response(jsonify({"error": "Too many requests"}), 429)
+        else:
+            response = make_response("Too many requests. Please retry shortly.", 429)
+        response.headers["Retry-After"] = str(max(math.ceil(wait), 1))
+        return response
+
+    return app.extensions["rate_limiter"]
@@ -0,0 +1,78 @@
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, Optional, Set
+
+from flask import current_app
+from sqlalchemy import update
+
+from ..extensions import db
+from ..models import SyncCursor
+from .stripe import get_stripe_client
+from .webhooks import APPLICATION_MODELS
+
+logger = logging.getLogger(__name__)
+
+CURSOR_NAME = "stripe_checkout_sessions"
+
+
+def reconcile_checkout_sessions(
+    since: Optional[int] = None, dry_run: bool = False, page_size: int = 100
+) -> Dict[str, Any]:
+    client = get_stripe_client(current_app)
+    cursor = db.session.get(SyncCursor, CURSOR_NAME)
+    if since is None:
+        since = int(cursor.value) if cursor else 0
+    started_at = int(time.time())
+    config = current_app.config
+    async_cutoff = started_at - config.get("STRIPE_RECONCILE_ASYNC_WINDOW_SECONDS", 14 * 86400)
+
+    paid_ids: Dict[Any, Set[int]] = defaultdict(set)
+    listed = 0
+    oldest_unsettled: Optional[int] = None
+    sessions = client.v1.checkout.sessions.list(
+        params={"status": "complete", "created": {"gt": since}, "limit": page_size}
+    )
+    for session in sessions.auto_paging_iter():
+        listed += 1
+        session = session.to_dict()
+        if session.get("payment_status") != "paid":
+            # Delayed methods such as bank debits complete unpaid and settle days later.
+            created = session.get("created") or 0
+            if created > async_cutoff and (oldest_unsettled is None or created < oldest_unsettled):
+                oldest_unsettled = created
+            continue
+        metadata = session.get("metadata") or {}
+        model = APPLICATION_MODELS.get((metadata.get("application_type") or "sponsorship").lower())
+        application_id = metadata.get("application_id")
+        if model is None or not application_id or not str(application_id).isdigit():
+            continue
+        paid_ids[model].add(int(application_id))
+
+    updated = {}
+    for model, ids in paid_ids.items():
+        if dry_run:
+            updated[model.__tablename__] = len(ids)
+            continue
+        result = db.session.execute(
+            update(model)
+            .where(model.id.in_(sorted(ids)), model.payment_status != "paid")
+            .values(payment_status="paid", status="paid")
+        )
+        updated[model.__tablename__] = result.rowcount or 0
+
+    # Sessions stay open for up to a day, so the cursor trails "now" by the
+    # lookback window, and it also holds before any session still awaiting an
+    # async payment so the next run lists it again.
+    next_cursor = started_at - config.get("STRIPE_RECONCILE_LOOKBACK_SECONDS", 86400)
+    if oldest_unsettled is not None:
+        next_cursor = min(next_cursor, oldest_unsettled - 1)
+    next_cursor = max(since, next_cursor)
+    if not dry_run:
+        if cursor is None:
+            db.session.add(SyncCursor(name=CURSOR_NAME, value=str(next_cursor)))
+        else:
+            cursor.value = str(next_cursor)
+        db.session.commit()
+    logger.info("Stripe reconciliation listed %s sessions, updated %s", listed, updated)
+    return {"listed": listed, "updated": updated, "since": since, "cursor": next_cursor}
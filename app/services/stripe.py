@@ -1,48 +1,239 @@
-from typing import Any, Dict, Union
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Union
 
+import requests
 import stripe
-from flask import current_app
+from flask import Flask, current_app
+from requests.adapters import HTTPAdapter
 from stripe import error as stripe_error
 
+from .cache import SingleFlight, TTLCache
 
-def _get_price_map() -> Dict[str, str]:
-    return {
-        "food_vendor": current_app.config.get("STRIPE_PRICE_FOOD_VENDOR", ""),
-        "liability_fee": current_app.config.get("STRIPE_PRICE_LIABILITY_FEE", ""),
-        "sponsor_wish_granter": current_app.config.get("STRIPE_PRICE_SPONSOR_WISH_GRANTER", ""),
-        "sponsor_wonders_wishes": current_app.config.get(
-            "STRIPE_PRICE_SPONSOR_WONDERS_WISHES", ""
-        ),
-        "sponsor_food_truck_champion": current_app.config.get(
-            "STRIPE_PRICE_SPONSOR_FOOD_TRUCK_CHAMPION", ""
+logger = logging.getLogger(__name__)
+
+# Stop handing out a registered session shortly before Stripe expires it.
+CHECKOUT_SESSION_REUSE_MARGIN = 120
+# Stripe accepts expires_at between 30 minutes and 24 hours after creation.
+CHECKOUT_SESSION_MIN_LIFETIME = 30 * 60
+CHECKOUT_SESSION_MAX_LIFETIME = 24 * 3600
+CHECKOUT_FINGERPRINT_KEYS = ("mode", "product", "quantity", "customer_email", "metadata", "success_url", "cancel_url")
+
+PRICE_CONFIG_KEYS = {
+    "food_vendor": "STRIPE_PRICE_FOOD_VENDOR",
+    "liability_fee": "STRIPE_PRICE_LIABILITY_FEE",
+    "sponsor_wish_granter": "STRIPE_PRICE_SPONSOR_WISH_GRANTER",
+    "sponsor_wonders_wishes": "STRIPE_PRICE_SPONSOR_WONDERS_WISHES",
+    "sponsor_food_truck_champion": "STRIPE_PRICE_SPONSOR_FOOD_TRUCK_CHAMPION",
+    "sponsor_dream_maker": "STRIPE_PRICE_SPONSOR_DREAM_MAKER",
+    "sponsor_wish_builder": "STRIPE_PRICE_SPONSOR_WISH_BUILDER",
+    "sponsor_hope_helper": "STRIPE_PRICE_SPONSOR_HOPE_HELPER",
+    "sponsor_joy_giver": "STRIPE_PRICE_SPONSOR_JOY_GIVER",
+    "sponsor_every_dream_matters": "STRIPE_PRICE_SPONSOR_EVERY_DREAM_MATTERS",
+}
+
+
+@dataclass(frozen=True)
+class CatalogPrice:
+    product: str
+    price_id: str
+    unit_amount: Optional[int] = None
+    currency: Optional[str] = None
+    active: bool = True
+
+
+class PriceCatalog:
+    def __init__(
+        self,
+        price_ids: Dict[str, str],
+        client: Optional[stripe.StripeClient] = None,
+        ttl_seconds: float = 0,
+    ) -> None:
+        self.price_ids = {product: price_id for product, price_id in price_ids.items() if price_id}
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.loaded_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._prices: Dict[str, CatalogPrice] = {
+            product: CatalogPrice(product=product, price_id=price_id)
+            for product, price_id in self.price_ids.items()
+        }
+        self._refresh_lock = threading.Lock()
+        self._refresh_pid: Optional[int] = None
+        self._prefetched = False
+
+    def get(self, product: str) -> Optional[CatalogPrice]:
+        if self.ttl_seconds > 0 and self.loaded_at is not None and self._refresh_pid != os.getpid():
+            self.start_refresh()
+        return self._prices.get(product)
+
+    def load(self) -> None:
+        prices = {}
+        for product, price_id in self.price_ids.items():
+            price = self.client.v1.prices.retrieve(price_id)
+            prices[product] = CatalogPrice(
+                product=product,
+                price_id=price_id,
+                unit_amount=getattr(price, "unit_amount", None),
+                currency=getattr(price, "currency", None),
+                active=bool(getattr(price, "active", True)),
+            )
+        self._prices = prices
+        self.loaded_at = time.time()
+        self.last_error = None
+
+    def prefetch(self, tiers: Dict[str, Dict[str, Any]]) -> None:
+        if self._prefetched:
+            return
+        with self._refresh_lock:
+            if self._prefetched:
+                return
+            self._prefetched = True
+        try:
+            self.load()
+        except Exception as exc:
+            self.last_error = str(exc)
+            logger.warning("Stripe price catalog prefetch failed", exc_info=exc)
+            return
+        for problem in self.validate_tiers(tiers):
+            logger.warning("Stripe price catalog mismatch: %s", problem)
+        self.start_refresh()
+
+    def start_refresh(self) -> None:
+        with self._refresh_lock:
+            if self._refresh_pid == os.getpid() or self.ttl_seconds <= 0:
+                return
+            self._refresh_pid = os.getpid()
+        thread = threading.Thread(target=self._refresh_loop, name="stripe-price-refresh", daemon=True)
+        thread.start()
+
+    def validate_tiers(self, tiers: Dict[str, Dict[str, Any]]) -> List[str]:
+        problems = []
+        for tier_key, tier in tiers.items():
+            price = self._prices.get(tier["product"])
+            if price is None:
+                problems.append(f"{tier_key}: no Stripe price configured for '{tier['product']}'")
+            elif not price.active:
+                problems.append(f"{tier_key}: Stripe price {price.price_id} is inactive")
+            elif price.unit_amount is not None and price.unit_amount != tier["amount"]:
+                problems.append(
+                    f"{tier_key}: Stripe price {price.price_id} is {price.unit_amount} "
+                    f"but the tier expects {tier['amount']}"
+                )
+        return problems
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "products": len(self._prices),
+            "loaded_at": self.loaded_at,
+            "ttl_seconds": self.ttl_seconds,
+            "last_error": self.last_error,
+        }
+
+    def _refresh_loop(self) -> None:
+        while True:
+            time.sleep(self.ttl_seconds)
+            try:
+                self.load()
+            except Exception as exc:  # pragma: no cover - keep serving the last good catalog
+                self.last_error = str(exc)
+                logger.warning("Stripe price catalog refresh failed", exc_info=exc)
+
+
+def _get_price_map(app: Flask) -> Dict[str, str]:
+    return {product: app.config.get(key, "") for product, key in PRICE_CONFIG_KEYS.items()}
+
+
+def build_stripe_client(app: Flask) -> stripe.StripeClient:
+    pool_size = app.config.get("STRIPE_HTTP_POOL_SIZE", 10)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    http_client = stripe.RequestsClient(
+        timeout=(
+            app.config.get("STRIPE_CONNECT_TIMEOUT", 3.05),
+            app.config.get("STRIPE_READ_TIMEOUT", 20),
         ),
-        "sponsor_dream_maker": current_app.config.get("STRIPE_PRICE_SPONSOR_DREAM_MAKER", ""),
-        "sponsor_wish_builder": current_app.config.get("STRIPE_PRICE_SPONSOR_WISH_BUILDER", ""),
-        "sponsor_hope_helper": current_app.config.get("STRIPE_PRICE_SPONSOR_HOPE_HELPER", ""),
-        "sponsor_joy_giver": current_app.config.get("STRIPE_PRICE_SPONSOR_JOY_GIVER", ""),
-        "sponsor_every_dream_matters": current_app.config.get("STRIPE_PRICE_SPONSOR_EVERY_DREAM_MATTERS", ""),
-    }
+        session=session,
+    )
+    api_base = app.config.get("STRIPE_API_BASE")
+    return stripe.StripeClient(
+        app.config["STRIPE_API_KEY"],
+        http_client=http_client,
+        # The SDK backs off exponentially with jitter between these retries and
+        # sends an idempotency key so retried POSTs are safe.
+        max_network_retries=app.config.get("STRIPE_MAX_NETWORK_RETRIES", 2),
+        base_addresses={"api": api_base} if api_base else None,
+    )
+
 
+def init_stripe_client(app: Flask) -> Optional[stripe.StripeClient]:
+    if not app.config.get("STRIPE_API_KEY"):
+        return None
+    client = build_stripe_client(app)
+    app.extensions["stripe_client"] = (os.getpid(), app.config["STRIPE_API_KEY"], client)
+    return client
 
-def create_checkout_session(payload: Dict[str, Any]) -> Dict[str, Any]:
-    stripe.api_key = current_app.config.get("STRIPE_API_KEY")
-    if not stripe.api_key:
+
+def get_stripe_client(app: Flask) -> stripe.StripeClient:
+    api_key = app.config.get("STRIPE_API_KEY")
+    if not api_key:
         raise ValueError("Stripe API key is not configured")
+    registered = app.extensions.get("stripe_client")
+    if registered is None or registered[0] != os.getpid() or registered[1] != api_key:
+        return init_stripe_client(app)
+    return registered[2]
+
+
+def init_price_catalog(app: Flask, tiers: Dict[str, Dict[str, Any]]) -> PriceCatalog:
+    catalog = PriceCatalog(
+        _get_price_map(app),
+        ttl_seconds=app.config.get("STRIPE_PRICE_REFRESH_SECONDS", 0),
+    )
+    app.extensions["stripe_price_catalog"] = catalog
+    if not app.config.get("STRIPE_PRICE_PREFETCH") or not app.config.get("STRIPE_API_KEY"):
+        return catalog
+    catalog.client = get_stripe_client(app)
+    # Prefetch on the first request rather than here, so CLI commands such as
+    # `flask db upgrade` never wait on (or fail with) the Stripe API.
+    app.before_request(lambda: catalog.prefetch(tiers))
+    return catalog
+
+
+def get_price_catalog(app: Flask) -> PriceCatalog:
+    catalog = app.extensions.get("stripe_price_catalog")
+    if catalog is None:
+        catalog = PriceCatalog(_get_price_map(app))
+        app.extensions["stripe_price_catalog"] = catalog
+    return catalog
+
+
+def create_checkout_session(
+    payload: Dict[str, Any], idempotency_key: Optional[str] = None
+) -> Dict[str, Any]:
+    client = get_stripe_client(current_app)
 
     product = payload.get("product")
     if not product or not isinstance(product, str):
         raise ValueError("product must be a non-empty string")
 
-    price_map = _get_price_map()
-    price_id = price_map.get(product)
-    if not price_id:
+    price = get_price_catalog(current_app).get(product)
+    if price is None:
         raise ValueError(f"Stripe price is not configured for product '{product}'")
+    if not price.active:
+        raise ValueError(f"Stripe price for product '{product}' is no longer active")
 
     quantity = payload.get("quantity", 1)
     if not isinstance(quantity, int) or quantity < 1:
         raise ValueError("quantity must be a positive integer")
 
-    line_items = [{"price": price_id, "quantity": quantity}]
+    line_items = [{"price": price.price_id, "quantity": quantity}]
 
     mode = payload.get("mode", "payment")
     success_url = payload.get("success_url")
@@ -50,22 +241,91 @@ def create_checkout_session(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not success_url or not cancel_url:
         raise ValueError("success_url and cancel_url are required")
 
-    session = stripe.checkout.Session.create(
-        line_items=line_items,
-        mode=mode,
-        success_url=success_url,
-        cancel_url=cancel_url,
-        customer_email=payload.get("customer_email"),
-        metadata=payload.get("metadata"),
-    )
+    session_params = {
+        "line_items": line_items,
+        "mode": mode,
+        "success_url": success_url,
+        "cancel_url": cancel_url,
+    }
+    for optional_key in ("customer_email", "metadata", "expires_at"):
+        if payload.get(optional_key):
+            session_params[optional_key] = payload[optional_key]
+    options = {"idempotency_key": idempotency_key} if idempotency_key else None
+    session = client.v1.checkout.sessions.create(params=session_params, options=options)
     return {
         "status": "created",
         "provider": "stripe",
         "session_id": session.id,
         "url": session.url,
+        "expires_at": getattr(session, "expires_at", None) or payload.get("expires_at"),
+        "session_status": getattr(session, "status", None),
     }
 
 
+def get_or_create_checkout_session(payload: Dict[str, Any], owner_key: str) -> Dict[str, Any]:
+    registry = get_checkout_session_registry(current_app)
+    fingerprint = _checkout_fingerprint(payload)
+    registry_key = (owner_key, fingerprint)
+    cached = registry.get(registry_key, None)
+    if cached is not None:
+        # Entries lapse before Stripe expires the session, and paid owners never reach this call,
+        # so the registry is trusted without another round trip.
+        return {**cached, "status": "reused"}
+
+    ttl_seconds = int(current_app.config.get("STRIPE_CHECKOUT_SESSION_TTL", 3600))
+    ttl_seconds = min(max(ttl_seconds, CHECKOUT_SESSION_MIN_LIFETIME), CHECKOUT_SESSION_MAX_LIFETIME // 2)
+    now = time.time()
+    window_start = int(now // ttl_seconds) * ttl_seconds
+    # Stripe only replays an idempotent request when every parameter matches, so the key covers
+    # the full parameter set and expires_at is pinned to the reuse window rather than to the current time.
+    expires_at = window_start + 2 * ttl_seconds
+    idempotency_key = hashlib.sha256(f"checkout:{owner_key}:{fingerprint}:{window_start}".encode()).hexdigest()
+
+    session_payload = {**payload, "expires_at": expires_at}
+    session = create_checkout_session(session_payload, idempotency_key)
+    if session.get("session_status") not in (None, "open"):
+        # The key replayed a session that has since been paid or expired.
+        session = create_checkout_session(session_payload)
+    remaining = (session.get("expires_at") or expires_at) - now - CHECKOUT_SESSION_REUSE_MARGIN
+    if remaining > 0:
+        registry.set(registry_key, session, ttl_seconds=remaining)
+        registry.set(("session", session["session_id"]), registry_key, ttl_seconds=remaining)
+    return session
+
+
+def forget_checkout_session(session_id: Optional[str]) -> None:
+    if not session_id:
+        return
+    app = current_app._get_current_object()
+    registry = get_checkout_session_registry(app)
+    registry_key = registry.get(("session", session_id), None)
+    if registry_key is not None:
+        registry.invalidate(registry_key)
+    registry.invalidate(("session", session_id))
+
+
+def _checkout_fingerprint(payload: Dict[str, Any]) -> str:
+    params = {key: payload.get(key) for key in CHECKOUT_FINGERPRINT_KEYS}
+    params["quantity"] = params["quantity"] or 1
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_checkout_session_registry(app: Flask) -> TTLCache:
+    return _get_extension_cache(
+        app,
+        "stripe_checkout_sessions",
+        app.config.get("STRIPE_CHECKOUT_SESSION_REGISTRY_SIZE", 2048),
+        app.config.get("STRIPE_CHECKOUT_SESSION_TTL", 3600),
+    )
+
+
+def _get_extension_cache(app: Flask, name: str, max_size: int, ttl_seconds: float) -> TTLCache:
+    cache = app.extensions.get(name)
+    if cache is None:
+        cache = app.extensions.setdefault(name, TTLCache(max_size=max_size, ttl_seconds=ttl_seconds))
+    return cache
+
+
 def handle_webhook(payload: Union[str, bytes], signature: str) -> Dict[str, Any]:
     webhook_secret = current_app.config.get("STRIPE_WEBHOOK_SECRET")
     if not webhook_secret:
@@ -89,16 +349,37 @@ def handle_webhook(payload: Union[str, bytes], signature: str) -> Dict[str, Any]
 
 
 def retrieve_checkout_session(session_id: str) -> Dict[str, Any]:
-    stripe.api_key = current_app.config.get("STRIPE_API_KEY")
-    if not stripe.api_key:
-        raise ValueError("Stripe API key is not configured")
+    client = get_stripe_client(current_app)
     if not session_id:
         raise ValueError("Stripe session id is required")
 
-    session = stripe.checkout.Session.retrieve(session_id)
+    session = client.v1.checkout.sessions.retrieve(session_id)
     session_payload = session.to_dict() if hasattr(session, "to_dict") else session
     return {
         "status": "retrieved",
         "provider": "stripe",
         "session": session_payload,
     }
+
+
+def retrieve_checkout_session_cached(session_id: str) -> Dict[str, Any]:
+    if not session_id:
+        raise ValueError("Stripe session id is required")
+    app = current_app._get_current_object()
+    cache = _get_extension_cache(
+        app,
+        "stripe_session_results",
+        app.config.get("STRIPE_SESSION_CACHE_SIZE", 1024),
+        app.config.get("STRIPE_SESSION_CACHE_TTL", 30),
+    )
+    cached = cache.get(session_id, None)
+    if cached is not None:
+        return cached
+    single_flight = app.extensions.setdefault("stripe_session_single_flight", SingleFlight())
+
+    def fetch() -> Dict[str, Any]:
+        result = retrieve_checkout_session(session_id)
+        cache.set(session_id, result)
+        return result
+
+    return single_flight.do(session_id, fetch)
@@ -1,13 +1,201 @@
+import atexit
 import logging
-from typing import Any, Dict
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
 
 import requests
-from flask import current_app
+from flask import Flask, current_app
+
+from .http import provider_request
 
 logger = logging.getLogger(__name__)
 
+PROVIDER = "microsoft_teams"
+
+
+def post_message(app: Flask, webhook_url: str, message: str) -> requests.Response:
+    return provider_request(app, PROVIDER, "POST", webhook_url, json={"text": message})
+
+
+def build_digest(messages: List[str]) -> str:
+    if len(messages) == 1:
+        return messages[0]
+    lines = "\n\n".join(f"- {message}" for message in messages)
+    return f"{len(messages)} notifications:\n\n{lines}"
+
+
+class TeamsCoalescer:
+    def __init__(
+        self,
+        webhook_url: str,
+        window_seconds: float = 5,
+        max_batch: int = 20,
+        max_pending: int = 500,
+        sender: Optional[Callable[[str, str], Any]] = None,
+        app: Optional[Flask] = None,
+    ) -> None:
+        self.webhook_url = webhook_url
+        self.window_seconds = window_seconds
+        self.max_batch = max(max_batch, 1)
+        self.max_pending = max(max_pending, self.max_batch)
+        self.sender = sender or (lambda url, message: post_message(app, url, message))
+        self.submitted = 0
+        self.delivered = 0
+        self.coalesced = 0
+        self.digests = 0
+        self.dropped = 0
+        self.failed = 0
+        self.last_error: Optional[str] = None
+        self._pending: deque = deque()
+        self._oldest_at: Optional[float] = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._send_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, message: str) -> int:
+        with self._condition:
+            if self._closed:
+                raise ValueError("Teams notifier is shut down")
+            self.submitted += 1
+            if len(self._pending) >= self.max_pending:
+                self._pending.popleft()
+                self.dropped += 1
+            self._pending.append(message)
+            if self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+            self._ensure_thread()
+            self._condition.notify()
+            return len(self._pending)
+
+    def flush(self) -> int:
+        sent = 0
+        while True:
+            with self._condition:
+                batch = self._take_batch()
+            if not batch:
+                return sent
+            if self._send(batch):
+                sent += len(batch)
+            else:
+                return sent
+
+    def close(self, timeout: float = 10) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "pending": len(self._pending),
+                "submitted": self.submitted,
+                "delivered": self.delivered,
+                "digests": self.digests,
+                "coalesced": self.coalesced,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "window_seconds": self.window_seconds,
+                "max_batch": self.max_batch,
+                "last_error": self.last_error,
+            }
 
-def send_notification(payload: Dict[str, Any]) -> Dict[str, Any]:
+    def _ensure_thread(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="teams-coalescer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while not self._closed:
+                    if self._pending and len(self._pending) >= self.max_batch:
+                        break
+                    if self._oldest_at is None:
+                        self._condition.wait()
+                        continue
+                    remaining = self._oldest_at + self.window_seconds - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._condition.wait(remaining)
+                if self._closed:
+                    return
+                batch = self._take_batch()
+            if batch and not self._send(batch):
+                # Back off for a window instead of hammering a throttled webhook.
+                time.sleep(self.window_seconds)
+
+    def _take_batch(self) -> List[str]:
+        batch = [self._pending.popleft() for _ in range(min(self.max_batch, len(self._pending)))]
+        self._oldest_at = time.monotonic() if self._pending else None
+        return batch
+
+    def _send(self, batch: List[str]) -> bool:
+        with self._send_lock:
+            try:
+                self.sender(self.webhook_url, build_digest(batch))
+            except Exception as exc:
+                logger.warning("Teams digest delivery failed", exc_info=exc)
+                self._requeue(batch, str(exc))
+                return False
+        with self._condition:
+            self.digests += 1
+            self.delivered += len(batch)
+            self.coalesced += len(batch) - 1
+        logger.info("Teams digest sent", extra={"messages": len(batch)})
+        return True
+
+    def _requeue(self, batch: List[str], error: str) -> None:
+        with self._condition:
+            self.failed += 1
+            self.last_error = error
+            room = self.max_pending - len(self._pending)
+            keep = batch[-room:] if room > 0 else []
+            self.dropped += len(batch) - len(keep)
+            self._pending.extendleft(reversed(keep))
+            if self._pending and self._oldest_at is None:
+                self._oldest_at = time.monotonic()
+
+
+def get_teams_coalescer(app: Flask) -> Optional[TeamsCoalescer]:
+    webhook_url = app.config.get("TEAMS_WEBHOOK_URL")
+    window = app.config.get("TEAMS_COALESCE_WINDOW_SECONDS", 0)
+    if not webhook_url or window <= 0:
+        return None
+    registered = app.extensions.get("teams_coalescer")
+    if registered is not None and registered[0] == os.getpid():
+        if registered[1] == webhook_url:
+            return registered[2]
+        registered[2].close()
+    coalescer = TeamsCoalescer(
+        webhook_url,
+        window_seconds=window,
+        max_batch=app.config.get("TEAMS_COALESCE_MAX_BATCH", 20),
+        max_pending=app.config.get("TEAMS_COALESCE_MAX_PENDING", 500),
+        app=app,
+    )
+    app.extensions["teams_coalescer"] = (os.getpid(), webhook_url, coalescer)
+    if "teams_coalescer_atexit" not in app.extensions:
+        # Forked workers inherit this hook and flush their own coalescer.
+        app.extensions["teams_coalescer_atexit"] = True
+        atexit.register(_close_teams_coalescer, app)
+    return coalescer
+
+
+def _close_teams_coalescer(app: Flask) -> None:
+    registered = app.extensions.get("teams_coalescer")
+    if registered is not None and registered[0] == os.getpid():
+        registered[2].close()
+
+
+def send_notification(payload: Dict[str, Any], coalesce: bool = True) -> Dict[str, Any]:
     webhook_url = current_app.config.get("TEAMS_WEBHOOK_URL")
     if not webhook_url:
         raise ValueError("Teams webhook URL is not configured")
@@ -16,11 +204,21 @@ def send_notification(payload: Dict[str, Any]) -> Dict[str, Any]:
     if not message:
         raise ValueError("message is required")
 
-    response = requests.post(webhook_url, json={"text": message}, timeout=10)
-    response.raise_for_status()
+    app = current_app._get_current_object()
+    # Durable callers such as the outbox need the webhook result, not an in-memory queue slot.
+    coalescer = get_teams_coalescer(app) if coalesce else None
+    if coalescer is not None:
+        pending = coalescer.submit(message)
+        return {
+            "status": "queued",
+            "provider": PROVIDER,
+            "pending": pending,
+        }
+
+    response = post_message(app, webhook_url, message)
     logger.info("Teams notification sent", extra={"status_code": response.status_code})
     return {
         "status": "sent",
-        "provider": "microsoft_teams",
+        "provider": PROVIDER,
         "status_code": response.status_code,
     }
@@ -0,0 +1,38 @@
+import hashlib
+import os
+import string
+from typing import Optional
+
+from werkzeug.security import safe_join
+
+SHARD_WIDTH = 2
+
+
+def shard_directory(upload_root: str, category: str, filename: str) -> str:
+    # Fan out on a hash of the stored name so the filename columns alone locate a file.
+    digest = hashlib.sha256(filename.encode("utf-8")).hexdigest()
+    return os.path.join(upload_root, category, digest[:SHARD_WIDTH], digest[SHARD_WIDTH : SHARD_WIDTH * 2])
+
+
+def is_shard_name(name: str) -> bool:
+    return len(name) == SHARD_WIDTH and all(character in string.hexdigits.lower() for character in name)
+
+
+def upload_target_path(upload_root: str, category: str, filename: str, sharded: bool = True) -> str:
+    if sharded:
+        return os.path.join(shard_directory(upload_root, category, filename), filename)
+    return os.path.join(upload_root, category, filename)
+
+
+def resolve_upload_path(upload_root: str, category: str, filename: str) -> Optional[str]:
+    flat = safe_join(upload_root, category, filename)
+    if flat is None:
+        return None
+    if os.path.basename(flat) != filename:
+        return flat if os.path.isfile(flat) else None
+    sharded = upload_target_path(upload_root, category, filename)
+    # Check the sharded path again last: a file moved by the migration is linked there before it leaves the flat path.
+    for candidate in (sharded, flat, sharded):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
@@ -1,11 +1,121 @@
+import hashlib
 import os
+import shutil
+import tempfile
+import time
 import uuid
+import zipfile
+from dataclasses import dataclass
+from typing import IO, Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote
 
-from flask import current_app
+from flask import Flask, Request, current_app, request, send_file
+from sqlalchemy.exc import IntegrityError
+from werkzeug.exceptions import NotFound, RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
+from ..extensions import db
+from ..models import FoodVendorApplication, SponsorshipApplication, StoredBlob, UploadDerivative, UploadedFile
+from .derivatives import schedule_derivatives
+from .upload_layout import is_shard_name, resolve_upload_path, upload_target_path
 
-def save_uploaded_file(file_storage, subdirectory: str) -> str | None:
+CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 16
+INCOMING_DIRECTORY = ".incoming"
+OBJECTS_DIRECTORY = ".objects"
+SENDFILE_MODES = {"", "x-sendfile", "x-accel"}
+
+MAGIC_NUMBERS = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+    (b"%!PS", "application/postscript"),
+    (b"\xc5\xd0\xd3\xc6", "application/postscript"),
+)
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+@dataclass
+class IngestResult:
+    size: int
+    sha256: str
+    content_type: str
+
+
+def init_uploads(app: Flask) -> None:
+    mode = app.config.get("UPLOAD_SENDFILE_MODE", "")
+    if mode not in SENDFILE_MODES:
+        raise ValueError(f"UPLOAD_SENDFILE_MODE must be one of: {', '.join(sorted(SENDFILE_MODES))}")
+    if mode:
+        app.config["USE_X_SENDFILE"] = True
+
+
+def sniff_content_type(head: bytes) -> str:
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    for magic, content_type in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return content_type
+    return "application/octet-stream"
+
+
+def upload_limit(kind: str) -> int:
+    config = current_app.config
+    return config.get(f"UPLOAD_MAX_{kind.upper()}_BYTES") or config.get("UPLOAD_MAX_FILE_BYTES", 0)
+
+
+class IngestStream:
+    def __init__(self, directory: str, max_bytes: int = 0) -> None:
+        os.makedirs(directory, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._digest = hashlib.sha256()
+        self._head = b""
+        # The part is written once, next to its final location, and later hard-linked into place.
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix="ingest-")
+
+    def write(self, data: bytes) -> int:
+        self.size += len(data)
+        if self.max_bytes and self.size > self.max_bytes:
+            raise RequestEntityTooLarge(f"Uploaded file exceeds {self.max_bytes} bytes")
+        if len(self._head) < SNIFF_BYTES:
+            self._head += data[: SNIFF_BYTES - len(self._head)]
+        self._digest.update(data)
+        return self._file.write(data)
+
+    def result(self) -> IngestResult:
+        return IngestResult(self.size, self._digest.hexdigest(), sniff_content_type(self._head))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._file, name)
+
+    def __iter__(self):
+        return iter(self._file)
+
+
+class UploadRequest(Request):
+    def _get_file_stream(
+        self,
+        total_content_length: Optional[int],
+        content_type: Optional[str],
+        filename: Optional[str] = None,
+        content_length: Optional[int] = None,
+    ) -> IO[bytes]:
+        config = current_app.config
+        if not filename or not config.get("UPLOAD_STREAMING", True):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return IngestStream(
+            os.path.join(config["UPLOAD_FOLDER"], INCOMING_DIRECTORY),
+            config.get("UPLOAD_MAX_FILE_BYTES", 0),
+        )
+
+
+def save_uploaded_file(file_storage, subdirectory: str, kind: str = "file") -> str | None:
     if not file_storage or not file_storage.filename:
         return None
 
@@ -14,9 +124,423 @@ def save_uploaded_file(file_storage, subdirectory: str) -> str | None:
         return None
 
     upload_root = current_app.config["UPLOAD_FOLDER"]
-    target_directory = os.path.join(upload_root, subdirectory)
-    os.makedirs(target_directory, exist_ok=True)
-
     unique_filename = f"{uuid.uuid4().hex}_{filename}"
-    file_storage.save(os.path.join(target_directory, unique_filename))
+    target_path = upload_target_path(
+        upload_root, subdirectory, unique_filename, current_app.config.get("UPLOAD_SHARDED_LAYOUT", True)
+    )
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+
+    max_bytes = upload_limit(kind)
+    stream = file_storage.stream
+    partial_path = None
+    if isinstance(stream, IngestStream):
+        result = stream.result()
+        if max_bytes and result.size > max_bytes:
+            raise UploadTooLarge(too_large_message(kind, max_bytes))
+        stream.flush()
+        source_path = stream.name
+    else:
+        result, partial_path = _stream_to_incoming(stream, upload_root, max_bytes, kind)
+        source_path = partial_path
+    try:
+        stored_path = _publish_blob(upload_root, source_path, result.sha256)
+        # The filename columns keep pointing at <category>/<filename>, which aliases the shared blob.
+        _link_or_copy(stored_path, target_path)
+    finally:
+        if partial_path:
+            os.unlink(partial_path)
+
+    uploaded = UploadedFile(
+        category=subdirectory,
+        filename=unique_filename,
+        original_filename=filename,
+        kind=kind,
+        size_bytes=result.size,
+        sha256=result.sha256,
+        content_type=result.content_type,
+    )
+    db.session.add(uploaded)
+    # Flush first so the blob savepoint nests inside the request's transaction and rolls back with it.
+    db.session.flush()
+    _retain_blob(result)
+    schedule_derivatives(uploaded, stored_path)
     return unique_filename
+
+
+def discard_uploaded_file(subdirectory: str, filename: Optional[str]) -> None:
+    if not filename:
+        return
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    path = resolve_upload_path(upload_root, subdirectory, filename)
+    record = UploadedFile.query.filter_by(category=subdirectory, filename=filename).first()
+    if record is not None:
+        sha256 = record.sha256
+    elif path is not None:
+        sha256 = _hash_file(path).sha256
+    else:
+        return
+    if path is not None:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    if record is not None:
+        db.session.delete(record)
+        release_blob(sha256)
+    elif db.session.get(StoredBlob, sha256) is None and not UploadedFile.query.filter_by(sha256=sha256).first():
+        # The upload was rolled back with its StoredBlob row, so nothing counted this reference.
+        _unlink_path(blob_path(upload_root, sha256))
+
+
+def release_blob(sha256: str) -> None:
+    blob = db.session.get(StoredBlob, sha256)
+    if blob is None:
+        return
+    blob.refcount = StoredBlob.refcount - 1
+    db.session.flush()
+    if blob.refcount > 0:
+        return
+    db.session.delete(blob)
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    for derivative in UploadDerivative.query.filter_by(sha256=sha256):
+        db.session.delete(derivative)
+        _unlink_path(os.path.join(upload_root, derivative.path))
+    _unlink_path(blob_path(upload_root, sha256))
+
+
+def upload_response(category: str, filename: str, as_attachment: bool = True):
+    config = current_app.config
+    upload_root = config["UPLOAD_FOLDER"]
+    path = resolve_upload_path(upload_root, category, filename)
+    if path is None:
+        raise NotFound()
+    record = UploadedFile.query.filter_by(category=category, filename=filename).first()
+    mode = config.get("UPLOAD_SENDFILE_MODE", "")
+    offloaded = bool(config.get("USE_X_SENDFILE"))
+    response = send_file(
+        path,
+        mimetype=record.content_type if record and record.content_type != "application/octet-stream" else None,
+        as_attachment=as_attachment,
+        download_name=filename,
+        # Stored content hashes make strong validators that survive copies and restores.
+        etag=record.sha256 if record else True,
+        conditional=not offloaded,
+    )
+    if offloaded and mode == "x-accel":
+        prefix = config.get("UPLOAD_ACCEL_PREFIX", "/protected-uploads").rstrip("/")
+        del response.headers["X-Sendfile"]
+        relative_path = os.path.relpath(path, upload_root).replace(os.sep, "/")
+        response.headers["X-Accel-Redirect"] = f"{prefix}/{quote(relative_path)}"
+    if offloaded:
+        # The front proxy serves ranges itself; Flask only answers revalidation.
+        response = response.make_conditional(request.environ)
+        if response.status_code == 304:
+            response.headers.pop("X-Sendfile", None)
+            response.headers.pop("X-Accel-Redirect", None)
+    response.cache_control.private = True
+    return response
+
+
+def upload_archive_entries(applications: Iterable[Tuple[str, Any]]) -> List[Tuple[str, str]]:
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    entries: List[Tuple[str, str]] = []
+    used = set()
+    for category, application in applications:
+        business = secure_filename(application.business_name or "") or f"application-{application.id}"
+        for kind in ("logo", "insurance"):
+            filename = getattr(application, f"{kind}_filename", None)
+            path = resolve_upload_path(upload_root, category, filename) if filename else None
+            if path is None:
+                continue
+            extension = os.path.splitext(filename)[1].lower()
+            name = f"{category}/{business}-{kind}{extension}"
+            suffix = 2
+            while name in used:
+                name = f"{category}/{business}-{kind}-{suffix}{extension}"
+                suffix += 1
+            used.add(name)
+            entries.append((name, path))
+    return entries
+
+
+class _ArchiveSink:
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_upload_archive(entries: Iterable[Tuple[str, str]]) -> Iterator[bytes]:
+    # The sink is not seekable, so zipfile writes data descriptors and nothing is buffered past one chunk.
+    sink = _ArchiveSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as archive:
+        for name, path in entries:
+            try:
+                source = open(path, "rb")
+            except FileNotFoundError:
+                continue
+            with source:
+                stat = os.fstat(source.fileno())
+                info = zipfile.ZipInfo(name, time.localtime(stat.st_mtime)[:6])
+                info.file_size = stat.st_size
+                with archive.open(info, "w") as target:
+                    for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                        target.write(chunk)
+                        yield sink.drain()
+            yield sink.drain()
+    yield sink.drain()
+
+
+def blob_path(upload_root: str, sha256: str) -> str:
+    return os.path.join(upload_root, OBJECTS_DIRECTORY, sha256[:2], sha256)
+
+
+def fold_duplicate_uploads(dry_run: bool = False) -> Dict[str, int]:
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    kinds = _filename_kinds()
+    records = {(record.category, record.filename): record for record in UploadedFile.query.all()}
+    counts = {"scanned": 0, "recorded": 0, "folded": 0, "bytes_saved": 0, "blobs_removed": 0}
+    planned = set()
+    for category, filename, path in _iter_upload_files(upload_root):
+        counts["scanned"] += 1
+        record = records.get((category, filename))
+        if record is None:
+            result = _hash_file(path)
+            record = UploadedFile(
+                category=category,
+                filename=filename,
+                original_filename=filename.partition("_")[2] or filename,
+                kind=kinds.get(filename, "file"),
+                size_bytes=result.size,
+                sha256=result.sha256,
+                content_type=result.content_type,
+            )
+            records[(category, filename)] = record
+            counts["recorded"] += 1
+            if not dry_run:
+                db.session.add(record)
+        target = blob_path(upload_root, record.sha256)
+        if not os.path.exists(target) and record.sha256 not in planned:
+            planned.add(record.sha256)
+            if not dry_run:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                _link_or_copy(path, target)
+            continue
+        if os.path.exists(target) and os.path.samefile(target, path):
+            continue
+        counts["folded"] += 1
+        counts["bytes_saved"] += record.size_bytes
+        if not dry_run:
+            _replace_with_link(target, path)
+    if dry_run:
+        return counts
+
+    db.session.flush()
+    references = dict(
+        db.session.query(UploadedFile.sha256, db.func.count(UploadedFile.id)).group_by(UploadedFile.sha256).all()
+    )
+    samples = {record.sha256: record for record in records.values()}
+    blobs = {blob.sha256: blob for blob in StoredBlob.query.all()}
+    for sha256, refcount in references.items():
+        blob = blobs.pop(sha256, None)
+        if blob is None:
+            db.session.add(
+                StoredBlob(
+                    sha256=sha256,
+                    size_bytes=samples[sha256].size_bytes,
+                    content_type=samples[sha256].content_type,
+                    refcount=refcount,
+                )
+            )
+        else:
+            blob.refcount = refcount
+    for blob in blobs.values():
+        db.session.delete(blob)
+    objects_root = os.path.join(upload_root, OBJECTS_DIRECTORY)
+    for shard in os.listdir(objects_root) if os.path.isdir(objects_root) else []:
+        for name in os.listdir(os.path.join(objects_root, shard)):
+            if name not in references:
+                os.unlink(os.path.join(objects_root, shard, name))
+                counts["blobs_removed"] += 1
+    db.session.commit()
+    return counts
+
+
+def shard_flat_uploads(batch_size: int = 500) -> Dict[str, int]:
+    if not current_app.config.get("UPLOAD_SHARDED_LAYOUT", True):
+        raise ValueError("UPLOAD_SHARDED_LAYOUT is disabled; enable it before migrating uploads")
+    upload_root = current_app.config["UPLOAD_FOLDER"]
+    counts = {"moved": 0, "conflicts": 0}
+    if not os.path.isdir(upload_root):
+        return counts
+    for category in sorted(os.listdir(upload_root)):
+        directory = os.path.join(upload_root, category)
+        if category.startswith(".") or not os.path.isdir(directory):
+            continue
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if counts["moved"] >= batch_size:
+                    return counts
+                if entry.name.startswith(".") or not entry.is_file(follow_symlinks=False):
+                    continue
+                if _move_to_shard(entry.path, upload_target_path(upload_root, category, entry.name)):
+                    counts["moved"] += 1
+                else:
+                    counts["conflicts"] += 1
+    return counts
+
+
+def _move_to_shard(path: str, target: str) -> bool:
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        # Link before unlinking so readers always find the file at one of its two paths.
+        os.link(path, target)
+    except FileExistsError:
+        # An interrupted run already linked it; anything else is a different file we must not clobber.
+        if not os.path.samefile(path, target):
+            return False
+    except OSError:
+        if os.path.exists(target):
+            return False
+        os.replace(path, target)
+        return True
+    os.unlink(path)
+    return True
+
+
+def _iter_upload_files(upload_root: str) -> Iterator[Tuple[str, str, str]]:
+    if not os.path.isdir(upload_root):
+        return
+    for category in sorted(os.listdir(upload_root)):
+        directory = os.path.join(upload_root, category)
+        if category.startswith(".") or not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            path = os.path.join(directory, filename)
+            if filename.startswith("."):
+                continue
+            if os.path.isfile(path):
+                yield category, filename, path
+            elif is_shard_name(filename) and os.path.isdir(path):
+                for shard in sorted(name for name in os.listdir(path) if is_shard_name(name)):
+                    shard_path = os.path.join(path, shard)
+                    for sharded_name in sorted(os.listdir(shard_path)):
+                        sharded_file = os.path.join(shard_path, sharded_name)
+                        if not sharded_name.startswith(".") and os.path.isfile(sharded_file):
+                            yield category, sharded_name, sharded_file
+
+
+def _filename_kinds() -> Dict[str, str]:
+    kinds: Dict[str, str] = {}
+    for column, kind in (
+        (SponsorshipApplication.logo_filename, "logo"),
+        (FoodVendorApplication.logo_filename, "logo"),
+        (FoodVendorApplication.insurance_filename, "insurance"),
+    ):
+        for (filename,) in db.session.query(column).filter(column.isnot(None)):
+            kinds[filename] = kind
+    return kinds
+
+
+def _retain_blob(result: IngestResult) -> None:
+    blob = db.session.get(StoredBlob, result.sha256)
+    if blob is not None:
+        blob.refcount = StoredBlob.refcount + 1
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.add(
+                StoredBlob(
+                    sha256=result.sha256,
+                    size_bytes=result.size,
+                    content_type=result.content_type,
+                    refcount=1,
+                )
+            )
+    except IntegrityError:
+        # Another request stored the same bytes first.
+        db.session.get(StoredBlob, result.sha256).refcount = StoredBlob.refcount + 1
+
+
+def _publish_blob(upload_root: str, source_path: str, sha256: str) -> str:
+    target = blob_path(upload_root, sha256)
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        os.link(source_path, target)
+    except FileExistsError:
+        pass
+    except OSError:
+        shutil.copyfile(source_path, target)
+    return target
+
+
+def _unlink_path(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _replace_with_link(source: str, path: str) -> None:
+    temporary = f"{path}.fold"
+    _link_or_copy(source, temporary)
+    os.replace(temporary, path)
+
+
+def _hash_file(path: str) -> IngestResult:
+    digest = hashlib.sha256()
+    size = 0
+    with open(path, "rb") as handle:
+        head = handle.read(SNIFF_BYTES)
+        handle.seek(0)
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            size += len(chunk)
+            digest.update(chunk)
+    return IngestResult(size, digest.hexdigest(), sniff_content_type(head))
+
+
+def too_large_message(kind: str, max_bytes: int) -> str:
+    return f"The {kind} file must be at most {max_bytes / (1024 * 1024):.3g} MB"
+
+
+def _link_or_copy(source: str, target: str) -> None:
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def _stream_to_incoming(stream: IO[bytes], upload_root: str, max_bytes: int, kind: str) -> Tuple[IngestResult, str]:
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+    incoming = os.path.join(upload_root, INCOMING_DIRECTORY)
+    os.makedirs(incoming, exist_ok=True)
+    fd, partial_path = tempfile.mkstemp(dir=incoming, prefix="partial-")
+    try:
+        with os.fdopen(fd, "wb") as target:
+            while True:
+                chunk = stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(too_large_message(kind, max_bytes))
+                if len(head) < SNIFF_BYTES:
+                    head += chunk[: SNIFF_BYTES - len(head)]
+                digest.update(chunk)
+                target.write(chunk)
+    except BaseException:
+        os.unlink(partial_path)
+        raise
+    return IngestResult(size, digest.hexdigest(), sniff_content_type(head)), partial_path
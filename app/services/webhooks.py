@@ -0,0 +1,191 @@
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Union
+
+from flask import Flask, current_app
+from sqlalchemy import delete
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import FoodVendorApplication, SponsorshipApplication, StripeWebhookEvent
+from .cache import MISSING, TTLCache
+
+logger = logging.getLogger(__name__)
+
+PAID_EVENT_TYPES = {
+    "checkout.session.completed",
+    "checkout.session.async_payment_succeeded",
+}
+
+APPLICATION_MODELS = {
+    "sponsorship": SponsorshipApplication,
+    "sponsor": SponsorshipApplication,
+    "food_vendor": FoodVendorApplication,
+    "vendor": FoodVendorApplication,
+}
+
+
+class EventDeduplicator:
+    def __init__(self, max_size: int = 10000, retention_seconds: float = 30 * 86400) -> None:
+        self.retention_seconds = retention_seconds
+        self.lookups = 0
+        self.duplicates = 0
+        self._recent = TTLCache(max_size=max_size, ttl_seconds=retention_seconds)
+        self._lock = threading.Lock()
+
+    def seen(self, event_id: str) -> bool:
+        found = self._recent.get(event_id) is not MISSING
+        if not found and db.session.query(StripeWebhookEvent.id).filter_by(event_id=event_id).first() is not None:
+            self._recent.set(event_id, True)
+            found = True
+        with self._lock:
+            self.lookups += 1
+            if found:
+                self.duplicates += 1
+        return found
+
+    def remember(self, event_id: str) -> None:
+        self._recent.set(event_id, True)
+
+    def purge(self) -> int:
+        # Only settled events leave the inbox; pending and dead rows still need a worker or an operator.
+        cutoff = datetime.utcnow() - timedelta(seconds=self.retention_seconds)
+        result = db.session.execute(
+            delete(StripeWebhookEvent).where(
+                StripeWebhookEvent.status == "processed",
+                StripeWebhookEvent.processed_at < cutoff,
+            )
+        )
+        db.session.commit()
+        return result.rowcount or 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "lookups": self.lookups,
+                "duplicates": self.duplicates,
+                "hit_rate": round(self.duplicates / self.lookups, 4) if self.lookups else 0.0,
+                "retention_seconds": self.retention_seconds,
+                "cached_ids": self._recent.stats()["size"],
+            }
+
+
+def get_event_deduplicator(app: Flask) -> EventDeduplicator:
+    deduplicator = app.extensions.get("stripe_event_deduplicator")
+    if deduplicator is None:
+        deduplicator = app.extensions.setdefault(
+            "stripe_event_deduplicator",
+            EventDeduplicator(
+                max_size=app.config.get("WEBHOOK_DEDUPE_CACHE_SIZE", 10000),
+                retention_seconds=app.config.get("WEBHOOK_DEDUPE_RETENTION_DAYS", 30) * 86400,
+            ),
+        )
+    return deduplicator
+
+
+def record_event(event_id: str, event_type: str, raw_payload: Union[str, bytes]) -> bool:
+    if not event_id:
+        raise ValueError("Stripe event id is required")
+    deduplicator = get_event_deduplicator(current_app)
+    if deduplicator.seen(event_id):
+        return False
+    if isinstance(raw_payload, bytes):
+        raw_payload = raw_payload.decode("utf-8")
+    db.session.add(
+        StripeWebhookEvent(
+            event_id=event_id,
+            event_type=event_type or "",
+            payload=raw_payload,
+        )
+    )
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        deduplicator.remember(event_id)
+        return False
+    deduplicator.remember(event_id)
+    return True
+
+
+def find_application(metadata: Dict[str, Any]):
+    model = APPLICATION_MODELS.get((metadata.get("application_type") or "sponsorship").lower())
+    application_id = str(metadata.get("application_id") or "")
+    if model is None or not application_id.isdigit():
+        return None
+    return db.session.get(model, int(application_id))
+
+
+def find_application_by_session(session_id: Optional[str]):
+    if not session_id:
+        return None
+    for model in (SponsorshipApplication, FoodVendorApplication):
+        application = model.query.filter_by(checkout_session_id=session_id).first()
+        if application is not None:
+            return application
+    return None
+
+
+def mark_application_paid(application, session_data: Optional[Dict[str, Any]] = None):
+    session_data = session_data or {}
+    if application.payment_status != "paid":
+        application.payment_status = "paid"
+        application.status = "paid"
+    if session_data.get("id") and not application.checkout_session_id:
+        application.checkout_session_id = session_data["id"]
+    if session_data.get("payment_intent") and not application.payment_intent_id:
+        application.payment_intent_id = session_data["payment_intent"]
+    return application
+
+
+def apply_event(event: Dict[str, Any]) -> Optional[Any]:
+    session_data = (event.get("data") or {}).get("object", {})
+    if event.get("type") not in PAID_EVENT_TYPES:
+        return None
+    if session_data.get("payment_status") != "paid":
+        return None
+    application = find_application_by_session(session_data.get("id")) or find_application(
+        session_data.get("metadata") or {}
+    )
+    if application is None:
+        return None
+    return mark_application_paid(application, session_data)
+
+
+def process_inbox(batch_size: int = 100, max_attempts: int = 5, retry_base_seconds: int = 30) -> Dict[str, int]:
+    now = datetime.utcnow()
+    events = (
+        StripeWebhookEvent.query.filter(
+            StripeWebhookEvent.status == "pending",
+            StripeWebhookEvent.next_attempt_at <= now,
+        )
+        .order_by(StripeWebhookEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+    counts = {"processed": 0, "retrying": 0, "dead": 0}
+    for event in events:
+        try:
+            with db.session.begin_nested():
+                apply_event(json.loads(event.payload))
+        except Exception as exc:
+            event.attempts += 1
+            event.last_error = str(exc)
+            if event.attempts >= max_attempts:
+                event.status = "dead"
+                counts["dead"] += 1
+                logger.error("Stripe webhook event %s moved to dead letter", event.event_id, exc_info=exc)
+            else:
+                event.next_attempt_at = now + timedelta(seconds=retry_base_seconds * 2 ** (event.attempts - 1))
+                counts["retrying"] += 1
+            continue
+        event.attempts += 1
+        event.status = "processed"
+        event.processed_at = now
+        counts["processed"] += 1
+    if events:
+        db.session.commit()
+    return counts
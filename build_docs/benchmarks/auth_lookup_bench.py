@@ -0,0 +1,55 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from flask import Flask
+
+from app.services.auth_store import (
+    close_connection_pools,
+    create_user,
+    get_user_by_id,
+    init_auth_db,
+)
+
+LOOKUPS = int(os.getenv("BENCH_LOOKUPS", "20000"))
+
+
+def _legacy_get_user_by_id(db_path: str, user_id: str):
+    with sqlite3.connect(db_path) as conn:
+        return conn.execute(
+            "SELECT id, email, password_hash FROM users WHERE id = ?",
+            (user_id,),
+        ).fetchone()
+
+
+def _measure(label: str, lookup) -> float:
+    lookup()
+    started = time.perf_counter()
+    for _ in range(LOOKUPS):
+        lookup()
+    elapsed = time.perf_counter() - started
+    rate = LOOKUPS / elapsed
+    print(f"{label:<28} {rate:>12,.0f} lookups/s  ({elapsed * 1e6 / LOOKUPS:.1f} us/lookup)")
+    return rate
+
+
+def main() -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        app = Flask(__name__)
+        app.config["AUTH_DB_PATH"] = os.path.join(tmp_dir, "auth.db")
+        init_auth_db(app)
+        user = create_user(app, "bench@example.com", "password123")
+        user_id = str(user.id)
+
+        before = _measure("connect per lookup", lambda: _legacy_get_user_by_id(app.config["AUTH_DB_PATH"], user_id))
+        after = _measure("pooled connection", lambda: get_user_by_id(app, user_id))
+        print(f"speedup: {after / before:.1f}x")
+        close_connection_pools()
+
+
+if __name__ == "__main__":
+    main()
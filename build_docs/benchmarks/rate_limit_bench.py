@@ -0,0 +1,56 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from app import create_app
+from app.services.rate_limit import (
+    MemoryBucketStore,
+    RateLimiter,
+    SqliteBucketStore,
+    init_rate_limiter,
+    parse_route_rules,
+)
+
+REQUESTS = int(os.getenv("BENCH_REQUESTS", "5000"))
+CHECKS = int(os.getenv("BENCH_CHECKS", "100000"))
+
+
+def _measure_requests(label: str, app, enabled: bool) -> float:
+    app.config["RATE_LIMIT_ENABLED"] = enabled
+    client = app.test_client()
+    client.get("/api/providers/status")
+    started = time.perf_counter()
+    for _ in range(REQUESTS):
+        client.get("/api/providers/status")
+    per_request = (time.perf_counter() - started) * 1e6 / REQUESTS
+    print(f"{label:<28} {per_request:>8.1f} us/request")
+    return per_request
+
+
+def _measure_checks(label: str, limiter: RateLimiter, checks: int) -> None:
+    started = time.perf_counter()
+    for index in range(checks):
+        limiter.check("main.donate", f"10.0.{index % 250}.{index % 7}")
+    print(f"{label:<28} {(time.perf_counter() - started) * 1e6 / checks:>8.2f} us/check")
+
+
+def main() -> None:
+    routes = parse_route_rules("main.donate=1000000/1")
+    _measure_checks("memory store check", RateLimiter(MemoryBucketStore(), 1e6, 1e6, routes), CHECKS)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SqliteBucketStore(os.path.join(tmp_dir, "rate_limit.db"))
+        _measure_checks("sqlite store check", RateLimiter(store, 1e6, 1e6, routes), CHECKS // 20)
+
+    app = create_app()
+    app.config.update(RATE_LIMIT_ENABLED=True, RATE_LIMIT_IP_RATE=1e6, RATE_LIMIT_IP_BURST=1e6)
+    init_rate_limiter(app)
+    without = _measure_requests("request without limiter", app, False)
+    with_limiter = _measure_requests("request with limiter", app, True)
+    print(f"overhead: {with_limiter - without:.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
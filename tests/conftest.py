@@ -1,4 +1,156 @@
+import json
 import os
 import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from app.services.auth_store import create_user, init_auth_db  # noqa: E402
+
+
+class FakeProviderHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.server.clients.add(self.client_address)
+        status = self.server.statuses.pop(0) if self.server.statuses else 200
+        _respond(self, status, {"id": "run_1"})
+
+    def do_GET(self):
+        self.server.gets.append(self.path)
+        run_id = self.path.rpartition("/")[2]
+        run = self.server.runs.get(run_id)
+        _respond(self, 200 if run else 404, run or {"error": "not found"})
+
+    def log_message(self, *args):
+        pass
+
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self._record()
+        path, _, query = self.path.partition("?")
+        if path == "/v1/checkout/sessions":
+            return self._list_sessions(parse_qs(query))
+        kind, _, object_id = path[len("/v1/"):].rpartition("/")
+        store = self.server.prices if kind == "prices" else self.server.sessions
+        if object_id not in store:
+            return _respond(self, 404, {"error": {"message": "No such object", "type": "invalid_request_error"}})
+        return _respond(self, 200, store[object_id])
+
+    def do_POST(self):
+        body = self._record()
+        if self.server.fail_next:
+            self.server.fail_next -= 1
+            return _respond(
+                self,
+                503,
+                {"error": {"message": "Try again", "type": "api_error"}},
+                {"Stripe-Should-Retry": "true"},
+            )
+        replayed = self.server.idempotent.get(self.headers.get("Idempotency-Key"))
+        if replayed is not None:
+            return _respond(self, 200, self.server.sessions[replayed])
+        params = parse_qs(body)
+        session_id = f"cs_test_{len(self.server.sessions) + 1}"
+        session = {
+            "id": session_id,
+            "object": "checkout.session",
+            "url": f"https://checkout.stripe.test/{session_id}",
+            "expires_at": int(params["expires_at"][0]) if "expires_at" in params else None,
+            "status": "open",
+            "payment_status": "unpaid",
+            "metadata": {
+                key[len("metadata["):-1]: values[0]
+                for key, values in params.items()
+                if key.startswith("metadata[")
+            },
+        }
+        self.server.sessions[session_id] = session
+        if self.headers.get("Idempotency-Key"):
+            self.server.idempotent[self.headers["Idempotency-Key"]] = session_id
+        return _respond(self, 200, session)
+
+    def _list_sessions(self, params):
+        limit = int(params["limit"][0])
+        created_after = int(params["created[gt]"][0])
+        sessions = [
+            session
+            for session in self.server.sessions.values()
+            if session.get("status") == "complete" and session.get("created", 0) > created_after
+        ]
+        if "starting_after" in params:
+            ids = [session["id"] for session in sessions]
+            sessions = sessions[ids.index(params["starting_after"][0]) + 1:]
+        page = sessions[:limit]
+        return _respond(
+            self,
+            200,
+            {"object": "list", "url": "/v1/checkout/sessions", "data": page, "has_more": len(sessions) > limit},
+        )
+
+    def log_message(self, *args):
+        pass
+
+    def _record(self) -> str:
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length).decode() if length else ""
+        self.server.requests.append(
+            {"method": self.command, "path": self.path, "headers": dict(self.headers), "body": body}
+        )
+        return body
+
+
+def _respond(handler, status, payload, headers=None):
+    body = json.dumps(payload).encode()
+    handler.send_response(status)
+    handler.send_header("Content-Type", "application/json")
+    handler.send_header("Content-Length", str(len(body)))
+    for name, value in (headers or {}).items():
+        handler.send_header(name, value)
+    handler.end_headers()
+    handler.wfile.write(body)
+
+
+def _serve(handler_class, **state):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler_class)
+    for name, value in state.items():
+        setattr(server, name, value)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture()
+def provider():
+    yield from _serve(FakeProviderHandler, clients=set(), statuses=[], gets=[], runs={})
+
+
+@pytest.fixture()
+def fake_stripe():
+    yield from _serve(FakeStripeHandler, requests=[], sessions={}, prices={}, idempotent={}, fail_next=0)
+
+
+@pytest.fixture()
+def login():
+    def log_in(app, client, email="admin@example.com"):
+        app.config.update(AUTH_HASH_POOL_SIZE=0, AUTH_PASSWORD_HASH_METHOD="pbkdf2:sha256:1000")
+        init_auth_db(app)
+        user = create_user(app, email, "password123")
+        with client.session_transaction() as session:
+            session["_user_id"] = str(user.id)
+            session["_fresh"] = True
+        return user
+
+    return log_in
@@ -11,12 +11,13 @@ from app.services.auth_store import init_auth_db
 def app():
     db_fd, db_path = tempfile.mkstemp()
     os.close(db_fd)
-    app = create_app()
-    app.config.update(
-        TESTING=True,
-        AUTH_DB_PATH=db_path,
-        SECRET_KEY="test-secret",
-        SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
+    app = create_app(
+        {
+            "TESTING": True,
+            "AUTH_DB_PATH": db_path,
+            "SECRET_KEY": "test-secret",
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        }
     )
     with app.app_context():
         init_auth_db(app)
@@ -48,3 +49,49 @@ def test_stripe_webhook_requires_configuration(client):
     response = client.post("/api/stripe/webhook", data=b"{}")
     assert response.status_code == 400
     assert response.get_json()["error"]
+
+
+class FakeSendGridClient:
+    def __init__(self, fail_chunks=()):
+        self.messages = []
+        self.fail_chunks = set(fail_chunks)
+
+    def send(self, message):
+        body = message.get()
+        self.messages.append(body)
+        if len(self.messages) in self.fail_chunks:
+            raise RuntimeError("HTTP Error 503")
+        return type("Response", (), {"status_code": 202})()
+
+
+def test_email_batch_packs_recipients_into_personalizations(app, client, login):
+    fake = FakeSendGridClient(fail_chunks={3})
+    app.config.update(SENDGRID_API_KEY="SG.test", SENDGRID_BATCH_SIZE=2, SENDGRID_BATCH_CONCURRENCY=1)
+    app.extensions["sendgrid_client"] = (os.getpid(), "SG.test", fake)
+    recipients = ["a@example.com", "b@example.com", "A@example.com", "c@example.com", "d@example.com", "e@example.com"]
+    payload = {"to": recipients, "subject": "Event day", "content": "See you there"}
+    assert client.post("/api/email/send-batch", json=payload).status_code == 302
+    login(app, client)
+
+    response = client.post(
+        "/api/email/send-batch",
+        json={"to": recipients, "subject": "Event day", "content": "See you there"},
+    )
+
+    assert response.status_code == 202
+    body = response.get_json()
+    assert body["status"] == "partial"
+    assert body["recipients"] == 5
+    assert body["sent"] == 4
+    assert [chunk["status"] for chunk in body["chunks"]] == ["sent", "sent", "failed"]
+    assert len(fake.messages) == 3
+    assert [len(message["personalizations"]) for message in fake.messages] == [2, 2, 1]
+    first = sorted(personalization["to"][0]["email"] for personalization in fake.messages[0]["personalizations"])
+    assert first == ["a@example.com", "b@example.com"]
+    too_many = [f"guest{index}@example.com" for index in range(6)]
+    app.config.update(SENDGRID_BATCH_MAX_RECIPIENTS=5)
+    rejected = client.post("/api/email/send-batch", json={**payload, "to": too_many})
+    assert rejected.status_code == 400
+    assert "At most 5 recipients" in rejected.get_json()["error"]
+    assert len(fake.messages) == 3
+
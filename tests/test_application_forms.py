@@ -1,37 +1,59 @@
+import hashlib
 import io
 import os
 import tempfile
 import unittest
+import zipfile
+
+import pytest
+from PIL import Image
 
 from app import create_app
 from app.extensions import db
 from app.models import (
     FoodVendorApplication,
     LiabilityApplication,
+    OutboxMessage,
     SponsorshipApplication,
+    StoredBlob,
+    UploadDerivative,
+    UploadedFile,
 )
+from app.services import outbox_service
+from app.services import derivatives
+from app.services.upload_layout import resolve_upload_path, upload_target_path
+from app.services.uploads import blob_path, discard_uploaded_file, fold_duplicate_uploads, shard_flat_uploads
 
 
 class ApplicationFormTests(unittest.TestCase):
     def setUp(self) -> None:
-        os.environ["DATABASE_URL"] = "sqlite:///:memory:"
-        self.app = create_app()
+        self.tmp_dir = tempfile.TemporaryDirectory()
         self.uploads_dir = tempfile.TemporaryDirectory()
-        self.app.config.update(
-            TESTING=True,
-            WTF_CSRF_ENABLED=False,
-            UPLOAD_FOLDER=self.uploads_dir.name,
+        self.app = create_app(
+            {
+                "TESTING": True,
+                "AUTH_DB_PATH": os.path.join(self.tmp_dir.name, "auth.db"),
+                "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(self.tmp_dir.name, 'app.db')}",
+                "WTF_CSRF_ENABLED": False,
+                "SENDGRID_API_KEY": "",
+                "TEAMS_WEBHOOK_URL": "",
+                "PIPELINE_API_URL": "",
+                "UPLOAD_FOLDER": self.uploads_dir.name,
+            }
         )
         with self.app.app_context():
-            db.drop_all()
             db.create_all()
         self.client = self.app.test_client()
 
+    @pytest.fixture(autouse=True)
+    def _use_login(self, login) -> None:
+        self.login = login
+
     def tearDown(self) -> None:
         with self.app.app_context():
-            db.drop_all()
+            db.engine.dispose()
         self.uploads_dir.cleanup()
-        os.environ.pop("DATABASE_URL", None)
+        self.tmp_dir.cleanup()
 
     def test_sponsorship_application_submission(self) -> None:
         response = self.client.post(
@@ -95,3 +117,309 @@ class ApplicationFormTests(unittest.TestCase):
         self.assertEqual(response.status_code, 302)
         with self.app.app_context():
             self.assertEqual(LiabilityApplication.query.count(), 1)
+
+    def test_submission_notifications_are_queued_and_dispatched(self) -> None:
+        response = self.client.post(
+            "/liability-application",
+            data={
+                "applicant_signature": "Jane Doe",
+                "applicant_full_name": "Jane Doe",
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        with self.app.app_context():
+            message = OutboxMessage.query.one()
+            self.assertEqual(message.channel, "email")
+            self.assertEqual(message.status, "pending")
+            self.assertEqual(outbox_service.dispatch(), {"sent": 1, "retrying": 0, "dead": 0})
+            self.assertEqual(db.session.get(OutboxMessage, message.id).status, "sent")
+            self.assertEqual(outbox_service.dispatch(), {"sent": 0, "retrying": 0, "dead": 0})
+
+    def _food_vendor_data(self, logo: bytes, insurance: bytes) -> dict:
+        return {
+            "business_name": "Truck Co",
+            "contact_name": "John Doe",
+            "cell_phone": "555-333-4444",
+            "email": "john@example.com",
+            "service_window_location": "driver",
+            "vehicle_make_model": "Big Truck",
+            "vehicle_year": "2020",
+            "insurance_policy_number": "POLICY-123",
+            "drivers_license": "D1234567",
+            "payment_cash": "y",
+            "menu_item_1": "Tacos",
+            "menu_item_2": "Burritos",
+            "menu_item_3": "Nachos",
+            "menu_item_4": "Quesadilla",
+            "menu_item_5": "Churros",
+            "menu_item_6": "Soda",
+            "applicant_signature": "John Doe",
+            "applicant_full_name": "John Doe",
+            "company_name": "Truck Co",
+            "application_date": "2026-03-01",
+            "initials": "JD",
+            "logo_file": (io.BytesIO(logo), "logo.png"),
+            "insurance_file": (io.BytesIO(insurance), "insurance.jpg"),
+        }
+
+    def test_uploads_are_streamed_hashed_and_sniffed(self) -> None:
+        logo = b"\x89PNG\r\n\x1a\n" + b"\x00" * 200_000
+        response = self.client.post(
+            "/food-vendor-application",
+            data=self._food_vendor_data(logo, b"\xff\xd8\xff\xe0insurance"),
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(response.status_code, 302)
+        with self.app.app_context():
+            application = FoodVendorApplication.query.one()
+            record = UploadedFile.query.filter_by(filename=application.logo_filename).one()
+            self.assertEqual(record.kind, "logo")
+            self.assertEqual(record.size_bytes, len(logo))
+            self.assertEqual(record.sha256, hashlib.sha256(logo).hexdigest())
+            self.assertEqual(record.content_type, "image/png")
+            insurance = UploadedFile.query.filter_by(filename=application.insurance_filename).one()
+            self.assertEqual(insurance.content_type, "image/jpeg")
+        logo_path = upload_target_path(self.uploads_dir.name, "food-vendor", application.logo_filename)
+        with open(logo_path, "rb") as handle:
+            self.assertEqual(handle.read(), logo)
+        self.assertEqual(os.listdir(os.path.join(self.uploads_dir.name, ".incoming")), [])
+
+    def test_oversized_uploads_are_rejected_per_kind(self) -> None:
+        self.app.config.update(
+            UPLOAD_MAX_LOGO_BYTES=1024,
+            UPLOAD_MAX_INSURANCE_BYTES=2048,
+            UPLOAD_MAX_FILE_BYTES=4096,
+        )
+        for logo, insurance in ((b"x" * 2048, b"insurance"), (b"logo", b"x" * 3000)):
+            response = self.client.post(
+                "/food-vendor-application",
+                data=self._food_vendor_data(logo, insurance),
+                content_type="multipart/form-data",
+            )
+            self.assertEqual(response.status_code, 413)
+        response = self.client.post(
+            "/food-vendor-application",
+            data=self._food_vendor_data(b"logo", b"x" * 8192),
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(response.status_code, 413)
+        self.assertIn(b"must be at most", response.data)
+        self.assertIn(b"<form", response.data)
+        with self.app.app_context():
+            self.assertEqual(FoodVendorApplication.query.count(), 0)
+            self.assertEqual(UploadedFile.query.count(), 0)
+        for directory in ("food-vendor", ".objects"):
+            stored = [files for _, _, files in os.walk(os.path.join(self.uploads_dir.name, directory)) if files]
+            self.assertEqual(stored, [])
+
+    def test_identical_uploads_share_one_blob(self) -> None:
+        logo = b"\x89PNG\r\n\x1a\nsame-logo"
+        response = self.client.post(
+            "/food-vendor-application",
+            data=self._food_vendor_data(logo, logo),
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(response.status_code, 302)
+        digest = hashlib.sha256(logo).hexdigest()
+        with self.app.app_context():
+            application = FoodVendorApplication.query.one()
+            self.assertEqual(db.session.get(StoredBlob, digest).refcount, 2)
+        blob = blob_path(self.uploads_dir.name, digest)
+        for filename in (application.logo_filename, application.insurance_filename):
+            self.assertTrue(os.path.samefile(blob, resolve_upload_path(self.uploads_dir.name, "food-vendor", filename)))
+
+    def test_discarding_uploads_releases_the_shared_blob(self) -> None:
+        logo = b"\x89PNG\r\n\x1a\nsame-logo"
+        self.client.post(
+            "/food-vendor-application",
+            data=self._food_vendor_data(logo, logo),
+            content_type="multipart/form-data",
+        )
+        digest = hashlib.sha256(logo).hexdigest()
+        blob = blob_path(self.uploads_dir.name, digest)
+        with self.app.test_request_context():
+            application = FoodVendorApplication.query.one()
+            discard_uploaded_file("food-vendor", application.logo_filename)
+            db.session.commit()
+            self.assertEqual(db.session.get(StoredBlob, digest).refcount, 1)
+            self.assertTrue(os.path.exists(blob))
+            discard_uploaded_file("food-vendor", application.insurance_filename)
+            db.session.commit()
+            self.assertIsNone(db.session.get(StoredBlob, digest))
+            self.assertEqual(UploadedFile.query.count(), 0)
+        self.assertFalse(os.path.exists(blob))
+
+    def test_fold_duplicate_uploads_links_existing_copies(self) -> None:
+        directory = os.path.join(self.uploads_dir.name, "sponsorship")
+        os.makedirs(directory)
+        for name, content in (("a_logo.png", b"same"), ("b_logo.png", b"same"), ("c_other.png", b"other")):
+            with open(os.path.join(directory, name), "wb") as handle:
+                handle.write(content)
+        stale = blob_path(self.uploads_dir.name, "ff" * 32)
+        os.makedirs(os.path.dirname(stale))
+        open(stale, "wb").close()
+
+        with self.app.app_context():
+            self.assertEqual(fold_duplicate_uploads(dry_run=True)["folded"], 1)
+            self.assertEqual(UploadedFile.query.count(), 0)
+            result = fold_duplicate_uploads()
+            self.assertEqual(result, {"scanned": 3, "recorded": 3, "folded": 1, "bytes_saved": 4, "blobs_removed": 1})
+            self.assertEqual(db.session.get(StoredBlob, hashlib.sha256(b"same").hexdigest()).refcount, 2)
+            self.assertEqual(fold_duplicate_uploads()["folded"], 0)
+        self.assertTrue(
+            os.path.samefile(os.path.join(directory, "a_logo.png"), os.path.join(directory, "b_logo.png"))
+        )
+        self.assertFalse(os.path.exists(stale))
+
+    def test_logo_derivatives_are_generated_and_served(self) -> None:
+        self.app.config.update(UPLOAD_DERIVATIVE_WORKERS=0)
+        image = Image.new("RGB", (800, 400), (200, 30, 30))
+        buffer = io.BytesIO()
+        image.save(buffer, "PNG")
+        response = self.client.post(
+            "/food-vendor-application",
+            data=self._food_vendor_data(buffer.getvalue(), b"%PDF-1.4 insurance"),
+            content_type="multipart/form-data",
+        )
+        self.assertEqual(response.status_code, 302)
+        with self.app.app_context():
+            application = FoodVendorApplication.query.one()
+            sizes = {row.name: (row.width, row.height) for row in UploadDerivative.query.all()}
+        self.assertEqual(sizes, {"thumb": (160, 160), "web": (512, 256)})
+
+        url = f"/media/food-vendor/{application.logo_filename}/thumb.webp"
+        served = self.client.get(url)
+        self.assertEqual(served.status_code, 200)
+        self.assertEqual(served.mimetype, "image/webp")
+        self.assertIn("public", served.headers["Cache-Control"])
+        cached = self.client.get(url, headers={"If-None-Match": served.headers["ETag"]})
+        self.assertEqual(cached.status_code, 304)
+        missing = f"/media/food-vendor/{application.insurance_filename}/thumb.webp"
+        self.assertEqual(self.client.get(missing).status_code, 404)
+
+    def test_oversized_images_are_not_decoded(self) -> None:
+        source = os.path.join(self.uploads_dir.name, "wide.png")
+        Image.new("RGB", (400, 300)).save(source, "PNG")
+        specs = derivatives.derivative_specs(self.app)
+        with self.assertRaises(ValueError):
+            derivatives.render_derivatives(source, self.uploads_dir.name, "0" * 64, specs, max_pixels=400 * 299)
+        self.assertEqual(len(derivatives.render_derivatives(source, self.uploads_dir.name, "0" * 64, specs)), 2)
+
+    def test_admin_download_uses_content_hash_etag_and_ranges(self) -> None:
+        insurance = b"%PDF-1.4 " + bytes(range(256)) * 40
+        self.client.post(
+            "/food-vendor-application",
+            data=self._food_vendor_data(b"logo", insurance),
+            content_type="multipart/form-data",
+        )
+        self.login(self.app, self.client)
+        with self.app.app_context():
+            application = FoodVendorApplication.query.one()
+        url = f"/admin/uploads/food-vendor/{application.insurance_filename}"
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, insurance)
+        self.assertEqual(response.headers["ETag"], f'"{hashlib.sha256(insurance).hexdigest()}"')
+        self.assertEqual(response.mimetype, "application/pdf")
+        self.assertIn("attachment", response.headers["Content-Disposition"])
+        self.assertIn("private", response.headers["Cache-Control"])
+        self.assertEqual(response.headers["Accept-Ranges"], "bytes")
+
+        revalidated = self.client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+        partial = self.client.get(url, headers={"Range": "bytes=9-18"})
+        self.assertEqual(partial.status_code, 206)
+        self.assertEqual(partial.data, insurance[9:19])
+
+        self.app.config.update(UPLOAD_SENDFILE_MODE="x-accel", USE_X_SENDFILE=True)
+        offloaded = self.client.get(url)
+        self.assertEqual(offloaded.status_code, 200)
+        self.assertEqual(offloaded.data, b"")
+        stored_path = upload_target_path(self.uploads_dir.name, "food-vendor", application.insurance_filename)
+        self.assertEqual(
+            offloaded.headers["X-Accel-Redirect"],
+            "/protected-uploads/" + os.path.relpath(stored_path, self.uploads_dir.name),
+        )
+        revalidated = self.client.get(url, headers={"If-None-Match": response.headers["ETag"]})
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertNotIn("X-Accel-Redirect", revalidated.headers)
+        self.assertEqual(self.client.get("/admin/uploads/food-vendor/missing.pdf").status_code, 404)
+
+    def test_invalid_sendfile_mode_fails_at_startup(self) -> None:
+        with self.assertRaises(ValueError):
+            create_app(
+                {
+                    "AUTH_DB_PATH": os.path.join(self.tmp_dir.name, "auth.db"),
+                    "UPLOAD_SENDFILE_MODE": "nginx",
+                }
+            )
+        offloading = create_app(
+            {"AUTH_DB_PATH": os.path.join(self.tmp_dir.name, "auth.db"), "UPLOAD_SENDFILE_MODE": "x-accel"}
+        )
+        self.assertTrue(offloading.config["USE_X_SENDFILE"])
+
+    def test_admin_export_streams_filtered_uploads_as_zip(self) -> None:
+        for logo in (b"\x89PNG\r\n\x1a\nfirst", b"\x89PNG\r\n\x1a\nsecond", b"\x89PNG\r\n\x1a\nthird"):
+            self.client.post(
+                "/food-vendor-application",
+                data=self._food_vendor_data(logo, b"%PDF-1.4 " + logo),
+                content_type="multipart/form-data",
+            )
+        self.login(self.app, self.client)
+        with self.app.app_context():
+            first, second, third = FoodVendorApplication.query.order_by(FoodVendorApplication.id).all()
+            first.status = second.status = "approved"
+            db.session.commit()
+
+        response = self.client.get("/admin/uploads/export.zip?type=vendor&status=approved")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_streamed)
+        self.assertEqual(response.mimetype, "application/zip")
+        self.assertIn("uploads-vendor-approved.zip", response.headers["Content-Disposition"])
+        with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+            self.assertIsNone(archive.testzip())
+            self.assertEqual(
+                sorted(archive.namelist()),
+                [
+                    "food-vendor/Truck_Co-insurance-2.jpg",
+                    "food-vendor/Truck_Co-insurance.jpg",
+                    "food-vendor/Truck_Co-logo-2.png",
+                    "food-vendor/Truck_Co-logo.png",
+                ],
+            )
+            logos = {archive.read(name) for name in archive.namelist() if "-logo" in name}
+        self.assertEqual(logos, {b"\x89PNG\r\n\x1a\nfirst", b"\x89PNG\r\n\x1a\nsecond"})
+
+        empty = self.client.get("/admin/uploads/export.zip?type=liability")
+        with zipfile.ZipFile(io.BytesIO(empty.data)) as archive:
+            self.assertEqual(archive.namelist(), [])
+
+    def test_flat_uploads_are_migrated_to_shards_in_batches(self) -> None:
+        self.app.config.update(UPLOAD_SHARDED_LAYOUT=False)
+        for logo in (b"\x89PNG\r\n\x1a\none", b"\x89PNG\r\n\x1a\ntwo"):
+            self.client.post(
+                "/food-vendor-application",
+                data=self._food_vendor_data(logo, b"%PDF-1.4 " + logo),
+                content_type="multipart/form-data",
+            )
+        directory = os.path.join(self.uploads_dir.name, "food-vendor")
+        self.assertEqual(len(os.listdir(directory)), 4)
+        self.login(self.app, self.client)
+        with self.app.app_context():
+            application = FoodVendorApplication.query.first()
+        url = f"/admin/uploads/food-vendor/{application.logo_filename}"
+        self.assertEqual(self.client.get(url).data, b"\x89PNG\r\n\x1a\none")
+
+        self.app.config.update(UPLOAD_SHARDED_LAYOUT=True)
+        with self.app.app_context():
+            self.assertEqual(shard_flat_uploads(batch_size=3), {"moved": 3, "conflicts": 0})
+            self.assertEqual(self.client.get(url).data, b"\x89PNG\r\n\x1a\none")
+            self.assertEqual(shard_flat_uploads(batch_size=3), {"moved": 1, "conflicts": 0})
+            self.assertEqual(shard_flat_uploads(batch_size=3), {"moved": 0, "conflicts": 0})
+        self.assertFalse(any(os.path.isfile(os.path.join(directory, name)) for name in os.listdir(directory)))
+        sharded = upload_target_path(self.uploads_dir.name, "food-vendor", application.logo_filename)
+        self.assertTrue(os.path.isfile(sharded))
+        self.assertEqual(self.client.get(url).data, b"\x89PNG\r\n\x1a\none")
+        with self.app.app_context():
+            self.assertEqual(fold_duplicate_uploads()["scanned"], 4)
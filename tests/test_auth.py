@@ -6,17 +6,21 @@ import pytest
 from app import create_app
 from app.services.auth_store import init_auth_db
 
+# Slow enough to outlast a request, fast enough to finish in the background.
+SLOW_HASH_METHOD = "pbkdf2:sha256:1000000"
+
 
 @pytest.fixture()
 def app():
     db_fd, db_path = tempfile.mkstemp()
     os.close(db_fd)
-    app = create_app()
-    app.config.update(
-        TESTING=True,
-        AUTH_DB_PATH=db_path,
-        SECRET_KEY="test-secret",
-        ALLOW_PUBLIC_REGISTRATION=True,
+    app = create_app(
+        {
+            "TESTING": True,
+            "AUTH_DB_PATH": db_path,
+            "SECRET_KEY": "test-secret",
+            "ALLOW_PUBLIC_REGISTRATION": True,
+        }
     )
     with app.app_context():
         init_auth_db(app)
@@ -88,3 +92,166 @@ def test_login_unknown_user(client):
         json={"email": "missing@example.com", "password": "password123"},
     )
     assert response.status_code == 401
+
+
+def test_auth_store_pool_is_shared_across_threads(app):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from app.services.auth_store import create_user, get_connection_pool, get_user_by_id
+
+    user = create_user(app, "pool@example.com", "password123")
+    pool = get_connection_pool(app)
+    opened = pool.size()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: get_user_by_id(app, str(user.id)), range(50)))
+        assert opened < pool.size() <= opened + 8
+
+    assert all(result.email == "pool@example.com" for result in results)
+    # Connections owned by the executor's exited threads are closed with them.
+    assert pool.size() == opened
+    with pool.connection() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_abandoned_pool_forgets_connections_without_closing(tmp_path):
+    from app.services.auth_store import SqliteConnectionPool
+
+    pool = SqliteConnectionPool(str(tmp_path / "auth.db"))
+    with pool.connection() as conn:
+        conn.execute("CREATE TABLE t (x)")
+    pool.abandon()
+    assert pool.size() == 0
+    assert conn.execute("SELECT COUNT(*) FROM t").fetchone() == (0,)
+    conn.close()
+
+
+def test_user_loader_is_served_from_cache(app, client):
+    from app.services.auth_store import create_user, get_user_cache, load_cached_user
+
+    cache = get_user_cache(app)
+    assert load_cached_user(app, "1") is None
+    user = create_user(app, "cached@example.com", "password123")
+    assert load_cached_user(app, str(user.id)).email == "cached@example.com"
+
+    client.post("/auth/login", json={"email": "cached@example.com", "password": "password123"})
+    misses = cache.misses
+    for _ in range(3):
+        response = client.get("/admin/metrics")
+        assert response.status_code == 200
+    assert cache.misses == misses
+    stats = response.get_json()["auth_user_cache"]
+    assert stats["hits"] >= 3
+
+
+def test_login_returns_503_when_hashing_pool_is_saturated(app, client):
+    from app.services.password_hashing import HashingPoolSaturated, hash_password, shutdown_password_hasher
+
+    client.post(
+        "/auth/register",
+        json={"email": "busy@example.com", "password": "password123"},
+    )
+    app.config.update(
+        AUTH_HASH_POOL_SIZE=1,
+        AUTH_HASH_QUEUE_LIMIT=0,
+        AUTH_HASH_TIMEOUT=0.05,
+        AUTH_PASSWORD_HASH_METHOD=SLOW_HASH_METHOD,
+    )
+    try:
+        # The timed-out hash keeps running and holds the only slot.
+        with pytest.raises(HashingPoolSaturated, match="timed out"):
+            hash_password(app, "password123")
+        response = client.post(
+            "/auth/login",
+            json={"email": "busy@example.com", "password": "password123"},
+        )
+    finally:
+        shutdown_password_hasher(app)
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+
+def test_sqlalchemy_backend_and_sqlite_copy(app):
+    from app.extensions import db
+    from app.models import User
+    from app.services.auth_store import (
+        SqlAlchemyAuthBackend,
+        authenticate_user,
+        copy_sqlite_users,
+        create_user,
+        get_user_by_email,
+    )
+
+    app.config.update(AUTH_HASH_POOL_SIZE=0, AUTH_PASSWORD_HASH_METHOD="pbkdf2:sha256:1000")
+    legacy = create_user(app, "legacy@example.com", "password123")
+    clashing = create_user(app, "clash@example.com", "password123")
+    sql_app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "AUTH_DB_PATH": app.config["AUTH_DB_PATH"],
+            "AUTH_HASH_POOL_SIZE": 0,
+            "AUTH_PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+        }
+    )
+    sql_app.config["AUTH_BACKEND"] = "sqlalchemy"
+    sql_app.extensions.pop("auth_backend", None)
+    with sql_app.app_context():
+        User.__table__.create(db.engine)
+        db.session.add(User(id=clashing.id, email="sql-only@example.com", password_hash="x"))
+        db.session.commit()
+
+    assert copy_sqlite_users(sql_app, app.config["AUTH_DB_PATH"]) == {"copied": 2, "skipped": 0, "renumbered": 1}
+    assert copy_sqlite_users(sql_app, app.config["AUTH_DB_PATH"]) == {"copied": 0, "skipped": 2, "renumbered": 0}
+    assert authenticate_user(sql_app, "legacy@example.com", "password123").id == legacy.id
+    assert authenticate_user(sql_app, "clash@example.com", "password123").id not in (legacy.id, clashing.id)
+
+    create_user(sql_app, "new@example.com", "password123")
+    assert isinstance(sql_app.extensions["auth_backend"], SqlAlchemyAuthBackend)
+    assert get_user_by_email(app, "new@example.com") is None
+
+
+def test_sqlalchemy_backend_requires_the_migrated_table(app):
+    from app.services.auth_store import copy_sqlite_users, create_user, get_user_by_email
+
+    sql_app = create_app(
+        {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+            "AUTH_DB_PATH": app.config["AUTH_DB_PATH"],
+            "AUTH_BACKEND": "sqlalchemy",
+            "AUTH_HASH_POOL_SIZE": 0,
+            "AUTH_PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+        }
+    )
+    with pytest.raises(RuntimeError, match="flask db upgrade"):
+        get_user_by_email(sql_app, "missing@example.com")
+    with pytest.raises(RuntimeError, match="flask db upgrade"):
+        create_user(sql_app, "new@example.com", "password123")
+    with pytest.raises(RuntimeError, match="flask db upgrade"):
+        copy_sqlite_users(sql_app, app.config["AUTH_DB_PATH"])
+
+
+def test_hash_timeout_maps_to_saturation_and_keeps_slot_until_done():
+    import time
+
+    from werkzeug.security import generate_password_hash
+
+    from app.services.password_hashing import HashingPoolSaturated, PasswordHasher
+
+    fast_hash = generate_password_hash("password123", "pbkdf2:sha256:1000")
+    hasher = PasswordHasher(pool_size=1, queue_limit=0, method=SLOW_HASH_METHOD, timeout=0.05)
+    try:
+        with pytest.raises(HashingPoolSaturated, match="timed out"):
+            hasher.generate("password123")
+        with pytest.raises(HashingPoolSaturated, match="Too many"):
+            hasher.check(fast_hash, "password123")
+        hasher.timeout = 10
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                assert hasher.check(fast_hash, "password123")
+                break
+            except HashingPoolSaturated:
+                time.sleep(0.05)
+        else:
+            pytest.fail("hashing slot was never released")
+    finally:
+        hasher.shutdown()
@@ -0,0 +1,151 @@
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+from app import create_app
+from app.services import teams
+from app.services.auth_store import init_auth_db
+from app.services.http import get_circuit_breaker
+
+
+@pytest.fixture()
+def app(provider):
+    db_fd, db_path = tempfile.mkstemp()
+    os.close(db_fd)
+    app = create_app(
+        {
+            "TESTING": True,
+            "AUTH_DB_PATH": db_path,
+            "SECRET_KEY": "test-secret",
+            "PIPELINE_API_URL": f"http://127.0.0.1:{provider.server_port}",
+            "PIPELINE_API_TOKEN": "token",
+            "CIRCUIT_BREAKER_FAILURE_THRESHOLD": 2,
+            "CIRCUIT_BREAKER_RESET_SECONDS": 0.2,
+            "PIPELINE_STATUS_CACHE_TTL": 0.2,
+        }
+    )
+    with app.app_context():
+        init_auth_db(app)
+    yield app
+    os.remove(db_path)
+
+
+def test_pipeline_calls_reuse_pooled_connection(app, provider):
+    client = app.test_client()
+    for _ in range(3):
+        response = client.post("/api/pipeline/run", json={"pipeline_id": "p1"})
+        assert response.status_code == 202
+        assert response.get_json()["run_id"] == "run_1"
+    assert len(provider.clients) == 1
+
+
+def test_circuit_breaker_opens_fails_fast_and_recovers(app, provider, login):
+    client = app.test_client()
+    provider.statuses = [503, 503]
+    assert client.post("/api/pipeline/run", json={"pipeline_id": "p1"}).status_code == 502
+    assert client.post("/api/pipeline/run", json={"pipeline_id": "p1"}).status_code == 502
+
+    rejected = client.post("/api/pipeline/run", json={"pipeline_id": "p1"})
+    assert rejected.status_code == 503
+    assert rejected.headers["Retry-After"]
+    assert client.get("/api/providers/status").status_code == 302
+    login(app, client)
+    status = client.get("/api/providers/status").get_json()["providers"]
+    assert status["pipeline"]["state"] == "open"
+    assert status["pipeline"]["rejected"] == 1
+    assert status["pipeline"]["last_error"] == "HTTPError (503)"
+    assert status["microsoft_teams"]["state"] == "closed"
+
+    time.sleep(0.25)
+    assert client.post("/api/pipeline/run", json={"pipeline_id": "p1"}).status_code == 202
+    assert client.get("/api/providers/status").get_json()["providers"]["pipeline"]["state"] == "closed"
+
+
+def test_breaker_errors_do_not_expose_request_urls(app):
+    with app.app_context():
+        app.config.update(TEAMS_WEBHOOK_URL="http://127.0.0.1:9/webhookb2/secret-token", TEAMS_COALESCE_WINDOW_SECONDS=0)
+        with pytest.raises(Exception):
+            teams.post_message(app, app.config["TEAMS_WEBHOOK_URL"], "hello")
+    last_error = get_circuit_breaker(app, teams.PROVIDER).stats()["last_error"]
+    assert last_error == "ConnectionError"
+
+
+def test_dispatch_runs_actions_concurrently(app, provider, login, monkeypatch):
+    from app.services import fanout
+
+    def slow_teams(payload):
+        time.sleep(0.3)
+        return {"status": "sent", "provider": "microsoft_teams"}
+
+    monkeypatch.setitem(fanout.ACTIONS, "teams", slow_teams)
+    client = app.test_client()
+    assert client.post("/api/dispatch", json={"actions": [{"type": "teams"}]}).status_code == 302
+    login(app, client)
+    started = time.perf_counter()
+    response = client.post(
+        "/api/dispatch",
+        json={
+            "actions": [
+                {"type": "teams", "payload": {"message": "hi"}},
+                {"type": "teams", "payload": {"message": "again"}},
+                {"type": "pipeline", "payload": {"pipeline_id": "p1"}},
+                {"type": "email", "payload": {}},
+            ]
+        },
+    )
+    elapsed = time.perf_counter() - started
+
+    assert response.status_code == 207
+    body = response.get_json()
+    assert body["status"] == "partial"
+    assert [result["status"] for result in body["results"]] == ["ok", "ok", "ok", "invalid"]
+    assert body["results"][2]["result"]["run_id"] == "run_1"
+    assert all(result["elapsed_ms"] >= 0 for result in body["results"])
+    assert elapsed < 0.55
+
+    assert client.post("/api/dispatch", json={"actions": [{"type": "fax"}]}).status_code == 400
+
+
+def test_run_status_is_cached_conditional_and_long_polled(app, provider):
+    from concurrent.futures import ThreadPoolExecutor
+
+    provider.runs["run_1"] = {"id": "run_1", "status": "running"}
+    client = app.test_client()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        responses = list(executor.map(lambda _: app.test_client().get("/api/pipeline/runs/run_1"), range(8)))
+    assert {response.status_code for response in responses} == {200}
+    assert len(provider.gets) == 1
+    etag = responses[0].headers["ETag"]
+
+    assert client.get("/api/pipeline/runs/run_1", headers={"If-None-Match": etag}).status_code == 304
+
+    threading.Timer(0.3, lambda: provider.runs.update(run_1={"id": "run_1", "status": "succeeded"})).start()
+    changed = client.get("/api/pipeline/runs/run_1?wait=5", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.get_json()["status"] == "succeeded"
+    assert changed.headers["ETag"] != etag
+
+    assert client.get("/api/pipeline/runs/missing").status_code == 404
+
+
+@pytest.mark.parametrize("wait", ["nan", "inf", "-inf"])
+def test_run_status_rejects_non_finite_waits(app, provider, wait):
+    provider.runs["run_1"] = {"id": "run_1", "status": "running"}
+    client = app.test_client()
+    etag = client.get("/api/pipeline/runs/run_1").headers["ETag"]
+    response = client.get(f"/api/pipeline/runs/run_1?wait={wait}", headers={"If-None-Match": etag})
+    assert response.status_code == 400
+
+
+def test_run_status_waiters_beyond_the_cap_answer_immediately(app, provider):
+    app.config["PIPELINE_STATUS_MAX_WAITERS"] = 0
+    provider.runs["run_1"] = {"id": "run_1", "status": "running"}
+    client = app.test_client()
+    etag = client.get("/api/pipeline/runs/run_1").headers["ETag"]
+    started = time.monotonic()
+    response = client.get("/api/pipeline/runs/run_1?wait=5", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert time.monotonic() - started < 1
@@ -11,12 +11,13 @@ from app.services.auth_store import init_auth_db
 def app():
     db_fd, db_path = tempfile.mkstemp()
     os.close(db_fd)
-    app = create_app()
-    app.config.update(
-        TESTING=True,
-        AUTH_DB_PATH=db_path,
-        SECRET_KEY="test-secret",
-        SQLALCHEMY_DATABASE_URI="sqlite:///:memory:",
+    app = create_app(
+        {
+            "TESTING": True,
+            "AUTH_DB_PATH": db_path,
+            "SECRET_KEY": "test-secret",
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///:memory:",
+        }
     )
     with app.app_context():
         init_auth_db(app)
@@ -0,0 +1,100 @@
+import os
+import tempfile
+import time
+
+import pytest
+
+from app import create_app
+from app.config import Config
+from app.services.auth_store import init_auth_db
+from app.services.rate_limit import RateLimiter, SqliteBucketStore, init_rate_limiter, parse_route_rules
+
+
+@pytest.fixture()
+def app():
+    db_fd, db_path = tempfile.mkstemp()
+    os.close(db_fd)
+    app = create_app(
+        {
+            "TESTING": True,
+            "AUTH_DB_PATH": db_path,
+            "SECRET_KEY": "test-secret",
+            "RATE_LIMIT_IP_RATE": 0.01,
+            "RATE_LIMIT_IP_BURST": 3,
+            "RATE_LIMIT_ROUTES": "main.donate=1/60",
+        }
+    )
+    init_rate_limiter(app)
+    with app.app_context():
+        init_auth_db(app)
+    yield app
+    os.remove(db_path)
+
+
+def test_api_requests_get_429_with_retry_after(app):
+    client = app.test_client()
+    statuses = [client.post("/api/teams/notify", json={}).status_code for _ in range(4)]
+    assert statuses == [400, 400, 400, 429]
+    limited = client.post("/api/teams/notify", json={})
+    assert limited.get_json() == {"error": "Too many requests"}
+    assert int(limited.headers["Retry-After"]) >= 1
+
+    assert client.post("/api/stripe/webhook", data=b"{}").status_code == 400
+    other = client.post("/api/teams/notify", json={}, environ_base={"REMOTE_ADDR": "10.0.0.2"})
+    assert other.status_code == 400
+
+
+def test_route_rule_limits_donate_and_pages_are_not_limited(app):
+    client = app.test_client()
+    assert client.get("/donate").status_code == 302
+    limited = client.get("/donate")
+    assert limited.status_code == 429
+    assert int(limited.headers["Retry-After"]) >= 50
+    assert all(client.get("/").status_code == 200 for _ in range(5))
+
+
+def test_sqlite_store_is_shared_between_limiters():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_path = os.path.join(tmp_dir, "rate_limit.db")
+        routes = parse_route_rules("main.donate=2/60")
+        first = RateLimiter(SqliteBucketStore(db_path), ip_rate=1, ip_burst=10, routes=routes)
+        second = RateLimiter(SqliteBucketStore(db_path), ip_rate=1, ip_burst=10, routes=routes)
+
+        assert first.check("main.donate", "1.2.3.4") == 0
+        assert second.check("main.donate", "1.2.3.4") == 0
+        assert second.check("main.donate", "1.2.3.4") > 0
+        assert first.check("main.donate", "5.6.7.8") == 0
+        assert second.stats()["limited"] == 1
+
+    with pytest.raises(ValueError):
+        parse_route_rules("main.donate=fast")
+
+
+def test_sqlite_store_prunes_refilled_and_excess_buckets():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SqliteBucketStore(os.path.join(tmp_dir, "rate_limit.db"), max_keys=3, prune_interval=3600)
+        for index in range(5):
+            store.take(f"ip:10.0.0.{index}", 1000, 1)
+        store.take("ip:10.0.0.9", 0.001, 5)
+        assert store.size() == 6
+        time.sleep(0.01)
+        assert store.prune() == 5
+        assert store.size() == 1
+
+        for index in range(5):
+            store.take(f"ip:10.0.1.{index}", 0.001, 5)
+        assert store.prune() == 3
+        assert store.size() == 3
+
+
+def test_trusted_proxy_hops_key_limits_on_forwarded_client(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "PROXY_FIX_X_FOR", 1)
+    app = create_app({"AUTH_DB_PATH": str(tmp_path / "auth.db")})
+    app.config.update(TESTING=True, RATE_LIMIT_IP_RATE=0.01, RATE_LIMIT_IP_BURST=1)
+    init_rate_limiter(app)
+    client = app.test_client()
+    proxy = {"REMOTE_ADDR": "10.0.0.1"}
+    first = client.post("/api/teams/notify", json={}, environ_base=proxy, headers={"X-Forwarded-For": "203.0.113.5"})
+    second = client.post("/api/teams/notify", json={}, environ_base=proxy, headers={"X-Forwarded-For": "203.0.113.6"})
+    repeat = client.post("/api/teams/notify", json={}, environ_base=proxy, headers={"X-Forwarded-For": "203.0.113.5"})
+    assert [first.status_code, second.status_code, repeat.status_code] == [400, 400, 429]
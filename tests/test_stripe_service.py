@@ -0,0 +1,325 @@
+import os
+import tempfile
+import time
+from urllib.parse import parse_qs
+
+import pytest
+
+from app import create_app
+from app.extensions import db
+from app.models import FoodVendorApplication, SponsorshipApplication, SyncCursor
+from app.services import stripe_service, webhook_service
+from app.services.reconciliation import reconcile_checkout_sessions
+
+
+@pytest.fixture()
+def app(fake_stripe):
+    tmp_dir = tempfile.TemporaryDirectory()
+    app = create_app(
+        {
+            "TESTING": True,
+            "AUTH_DB_PATH": os.path.join(tmp_dir.name, "auth.db"),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp_dir.name, 'app.db')}",
+            "SECRET_KEY": "test-secret",
+            "STRIPE_API_KEY": "sk_test_123",
+            "STRIPE_API_BASE": f"http://127.0.0.1:{fake_stripe.server_port}",
+            "STRIPE_MAX_NETWORK_RETRIES": 1,
+            "STRIPE_PRICE_SPONSOR_WISH_GRANTER": "price_granter",
+            "STRIPE_PRICE_SPONSOR_JOY_GIVER": "price_joy",
+            "STRIPE_PRICE_PREFETCH": False,
+        }
+    )
+    stripe_service.init_stripe_client(app)
+    stripe_service.init_price_catalog(app, {})
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+    tmp_dir.cleanup()
+
+
+CHECKOUT_PAYLOAD = {
+    "product": "sponsor_wish_granter",
+    "success_url": "https://example.com/ok",
+    "cancel_url": "https://example.com/cancel",
+    "metadata": {"application_id": "7"},
+}
+
+
+def test_price_catalog_prefetch_validates_tiers(app, fake_stripe):
+    fake_stripe.prices.update(
+        {
+            "price_granter": {"id": "price_granter", "object": "price", "unit_amount": 1000000, "currency": "usd", "active": True},
+            "price_joy": {"id": "price_joy", "object": "price", "unit_amount": 20000, "currency": "usd", "active": False},
+        }
+    )
+    tiers = {
+        "wish_granter": {"amount": 1000000, "product": "sponsor_wish_granter"},
+        "joy_giver": {"amount": 25000, "product": "sponsor_joy_giver"},
+        "hope_helper": {"amount": 50000, "product": "sponsor_hope_helper"},
+    }
+    app.config.update(STRIPE_PRICE_PREFETCH=True, STRIPE_PRICE_REFRESH_SECONDS=0)
+    catalog = stripe_service.init_price_catalog(app, tiers)
+    assert fake_stripe.requests == []
+    assert app.test_client().get("/health").status_code == 200
+    app.test_client().get("/health")
+    assert len(fake_stripe.requests) == 2
+
+    assert catalog.get("sponsor_wish_granter").unit_amount == 1000000
+    problems = catalog.validate_tiers(tiers)
+    assert any(problem.startswith("joy_giver") and "inactive" in problem for problem in problems)
+    assert any(problem.startswith("hope_helper") for problem in problems)
+
+    with app.app_context():
+        with pytest.raises(ValueError, match="no longer active"):
+            stripe_service.create_checkout_session({**CHECKOUT_PAYLOAD, "product": "sponsor_joy_giver"})
+
+
+def test_checkout_sessions_are_reused_per_owner_and_product(app, fake_stripe):
+    with app.app_context():
+        first = stripe_service.get_or_create_checkout_session(CHECKOUT_PAYLOAD, "sponsorship:7")
+        second = stripe_service.get_or_create_checkout_session(CHECKOUT_PAYLOAD, "sponsorship:7")
+        other = stripe_service.get_or_create_checkout_session(CHECKOUT_PAYLOAD, "sponsorship:8")
+
+    assert first["status"] == "created"
+    assert second["status"] == "reused"
+    assert second["session_id"] == first["session_id"]
+    assert other["session_id"] != first["session_id"]
+    creates = [request for request in fake_stripe.requests if request["method"] == "POST"]
+    assert len(creates) == 2
+    assert creates[0]["headers"]["Idempotency-Key"] != creates[1]["headers"]["Idempotency-Key"]
+
+
+def test_checkout_reuse_trusts_the_registry_until_forgotten(app, fake_stripe):
+    app.config.update(STRIPE_CHECKOUT_SESSION_TTL=7 * 86400)
+    with app.app_context():
+        first = stripe_service.get_or_create_checkout_session(CHECKOUT_PAYLOAD, "donor:abc")
+        fake_stripe.sessions[first["session_id"]].update(status="complete", payment_status="paid")
+        assert stripe_service.get_or_create_checkout_session(CHECKOUT_PAYLOAD, "donor:abc")["status"] == "reused"
+        assert [request for request in fake_stripe.requests if request["method"] == "GET"] == []
+
+        stripe_service.forget_checkout_session(first["session_id"])
+        # The idempotency key replays the paid session, so a fresh one is created without it.
+        second = stripe_service.get_or_create_checkout_session(CHECKOUT_PAYLOAD, "donor:abc")
+        assert second["status"] == "created"
+        assert second["session_id"] != first["session_id"]
+
+    now = time.time()
+    expirations = [int(parse_qs(request["body"])["expires_at"][0]) for request in fake_stripe.requests if request["method"] == "POST"]
+    assert all(now + 30 * 60 <= expires_at <= now + 24 * 3600 for expires_at in expirations)
+
+
+def test_donations_reuse_sessions_per_browser_not_per_ip(app, fake_stripe):
+    app.config.update(STRIPE_PRICE_SPONSOR_EVERY_DREAM_MATTERS="price_dream")
+    stripe_service.init_price_catalog(app, {})
+    first_browser, second_browser = app.test_client(), app.test_client()
+    first = first_browser.get("/donate").headers["Location"]
+    assert first_browser.get("/donate").headers["Location"] == first
+    assert second_browser.get("/donate").headers["Location"] != first
+
+    with first_browser.session_transaction() as session:
+        assert session["donation_nonce"]
+    first_browser.get("/stripe-confirmation?session_id=cs_test_1")
+    with first_browser.session_transaction() as session:
+        assert "donation_nonce" not in session
+    assert first_browser.get("/donate").headers["Location"] != first
+
+
+def test_resubmitted_sponsorship_form_reuses_application_and_session(app, fake_stripe):
+    app.config.update(WTF_CSRF_ENABLED=False, TEAMS_WEBHOOK_URL="", SENDGRID_API_KEY="")
+    client = app.test_client()
+    form = {
+        "business_name": "Star LLC",
+        "contact_name": "Jane Doe",
+        "cell_phone": "555-111-2222",
+        "email": "jane@example.com",
+        "support_level": "wish_granter",
+        "submission_id": "form-123",
+    }
+    with app.app_context():
+        first = client.post("/sponsorship-application", data=form)
+        second = client.post("/sponsorship-application", data=form)
+        assert first.headers["Location"] == second.headers["Location"]
+        assert SponsorshipApplication.query.count() == 1
+        other = client.post("/sponsorship-application", data={**form, "submission_id": "form-456"})
+        assert other.headers["Location"] != first.headers["Location"]
+        assert SponsorshipApplication.query.count() == 2
+
+
+def test_edited_sponsorship_resubmission_updates_application_and_checkout(app, fake_stripe):
+    app.config.update(WTF_CSRF_ENABLED=False, TEAMS_WEBHOOK_URL="", SENDGRID_API_KEY="")
+    client = app.test_client()
+    form = {
+        "business_name": "Star LLC",
+        "contact_name": "Jane Doe",
+        "cell_phone": "555-111-2222",
+        "email": "jane@example.com",
+        "support_level": "wish_granter",
+        "submission_id": "form-123",
+    }
+    with app.app_context():
+        first = client.post("/sponsorship-application", data=form)
+        edited = client.post(
+            "/sponsorship-application",
+            data={**form, "email": "owner@example.com", "support_level": "joy_giver"},
+        )
+        assert edited.headers["Location"] != first.headers["Location"]
+        application = SponsorshipApplication.query.one()
+        assert (application.email, application.support_level) == ("owner@example.com", "joy_giver")
+
+    creates = [parse_qs(request["body"]) for request in fake_stripe.requests if request["method"] == "POST"]
+    assert creates[-1]["customer_email"] == ["owner@example.com"]
+    assert creates[-1]["metadata[support_level]"] == ["joy_giver"]
+    assert creates[-1]["line_items[0][price]"] == ["price_joy"]
+
+
+def test_stripe_client_is_shared_and_retries_transient_errors(app, fake_stripe):
+    fake_stripe.fail_next = 1
+    with app.app_context():
+        client = stripe_service.get_stripe_client(app)
+        created = stripe_service.create_checkout_session(CHECKOUT_PAYLOAD, "idem-123")
+        retrieved = stripe_service.retrieve_checkout_session(created["session_id"])
+        assert stripe_service.get_stripe_client(app) is client
+
+    posts = [request for request in fake_stripe.requests if request["method"] == "POST"]
+    assert len(posts) == 2
+    assert {request["headers"]["Idempotency-Key"] for request in posts} == {"idem-123"}
+    assert posts[0]["headers"]["Authorization"] == "Bearer sk_test_123"
+    assert retrieved["session"]["metadata"] == {"application_id": "7"}
+
+
+def test_reconcile_marks_paid_applications_in_bulk(app, fake_stripe):
+    contact = {
+        "business_name": "Star LLC",
+        "contact_name": "Jane Doe",
+        "cell_phone": "555-111-2222",
+        "email": "jane@example.com",
+    }
+    with app.app_context():
+        sponsors = [SponsorshipApplication(**contact) for _ in range(3)]
+        vendor = FoodVendorApplication(**contact)
+        db.session.add_all([*sponsors, vendor])
+        db.session.commit()
+        targets = [
+            ("sponsorship", sponsors[0].id, "paid"),
+            ("sponsorship", sponsors[1].id, "paid"),
+            ("sponsorship", sponsors[2].id, "unpaid"),
+            ("food_vendor", vendor.id, "paid"),
+            ("donation", None, "paid"),
+        ]
+        for index, (application_type, application_id, payment_status) in enumerate(targets):
+            metadata = {"application_type": application_type}
+            if application_id:
+                metadata["application_id"] = str(application_id)
+            fake_stripe.sessions[f"cs_{index}"] = {
+                "id": f"cs_{index}",
+                "object": "checkout.session",
+                "status": "complete",
+                "created": 1_700_000_000 + index,
+                "payment_status": payment_status,
+                "metadata": metadata,
+            }
+
+        result = reconcile_checkout_sessions(page_size=2)
+
+        assert result["listed"] == 5
+        assert result["updated"] == {"sponsorship_application": 2, "food_vendor_application": 1}
+        statuses = [db.session.get(SponsorshipApplication, sponsor.id).payment_status for sponsor in sponsors]
+        assert statuses == ["paid", "paid", "pending"]
+        assert db.session.get(FoodVendorApplication, vendor.id).payment_status == "paid"
+        assert int(db.session.get(SyncCursor, "stripe_checkout_sessions").value) > 0
+
+        assert reconcile_checkout_sessions(page_size=2)["listed"] == 0
+    pages = [request for request in fake_stripe.requests if request["path"].startswith("/v1/checkout/sessions?")]
+    assert len(pages) == 4
+
+
+def test_reconcile_keeps_listing_sessions_awaiting_async_payment(app, fake_stripe):
+    with app.app_context():
+        sponsor = SponsorshipApplication(
+            business_name="Star LLC",
+            contact_name="Jane Doe",
+            cell_phone="555-111-2222",
+            email="jane@example.com",
+        )
+        db.session.add(sponsor)
+        db.session.commit()
+        created = int(time.time()) - 3 * 86400
+        fake_stripe.sessions["cs_ach"] = {
+            "id": "cs_ach",
+            "object": "checkout.session",
+            "status": "complete",
+            "created": created,
+            "payment_status": "unpaid",
+            "metadata": {"application_type": "sponsorship", "application_id": str(sponsor.id)},
+        }
+
+        first = reconcile_checkout_sessions(since=created - 10)
+        assert first["cursor"] == created - 1
+        assert db.session.get(SponsorshipApplication, sponsor.id).payment_status == "pending"
+
+        fake_stripe.sessions["cs_ach"]["payment_status"] = "paid"
+        second = reconcile_checkout_sessions()
+        assert second["updated"] == {"sponsorship_application": 1}
+        assert second["cursor"] > created
+        assert db.session.get(SponsorshipApplication, sponsor.id).payment_status == "paid"
+
+
+def test_stripe_confirmation_is_db_first_and_coalesces_retrieves(app, fake_stripe):
+    from concurrent.futures import ThreadPoolExecutor
+
+    client = app.test_client()
+    with app.app_context():
+        sponsor = SponsorshipApplication(
+            business_name="Star LLC",
+            contact_name="Jane Doe",
+            cell_phone="555-111-2222",
+            email="jane@example.com",
+        )
+        db.session.add(sponsor)
+        db.session.commit()
+        session = stripe_service.get_or_create_checkout_session(
+            {**CHECKOUT_PAYLOAD, "metadata": {"application_type": "sponsorship", "application_id": str(sponsor.id)}},
+            f"sponsorship:{sponsor.id}",
+        )
+        session_id = session["session_id"]
+        fake_stripe.sessions[session_id]["payment_status"] = "paid"
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            results = list(executor.map(lambda _: _retrieve_in_context(app, session_id), range(8)))
+        assert {result["session"]["id"] for result in results} == {session_id}
+
+        def retrieves():
+            return [request for request in fake_stripe.requests if request["path"].startswith(f"/v1/checkout/sessions/{session_id}")]
+
+        assert len(retrieves()) == 1
+
+        assert client.get(f"/stripe-confirmation?session_id={session_id}").status_code == 200
+        assert db.session.get(SponsorshipApplication, sponsor.id).payment_status == "paid"
+        app.extensions["stripe_session_results"].clear()
+        assert client.get(f"/stripe-confirmation?session_id={session_id}").status_code == 200
+        assert len(retrieves()) == 1
+
+
+def _retrieve_in_context(app, session_id):
+    with app.app_context():
+        return stripe_service.retrieve_checkout_session_cached(session_id)
+
+
+def test_stripe_errors_during_checkout_redirect_back_to_the_form(app, fake_stripe):
+    app.config.update(WTF_CSRF_ENABLED=False, TEAMS_WEBHOOK_URL="", SENDGRID_API_KEY="")
+    fake_stripe.fail_next = 5
+    response = app.test_client().post(
+        "/sponsorship-application",
+        data={
+            "business_name": "Star LLC",
+            "contact_name": "Jane Doe",
+            "cell_phone": "555-111-2222",
+            "email": "jane@example.com",
+            "support_level": "wish_granter",
+            "submission_id": "form-789",
+        },
+    )
+    assert response.status_code == 302
+    assert response.headers["Location"].endswith("/sponsorship-application")
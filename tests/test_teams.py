@@ -0,0 +1,81 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.teams import TeamsCoalescer
+
+
+class RecordingSender:
+    def __init__(self, fail=0):
+        self.messages = []
+        self.fail = fail
+        self.sent = threading.Event()
+
+    def __call__(self, webhook_url, message):
+        if self.fail:
+            self.fail -= 1
+            raise RuntimeError("429 Too Many Requests")
+        self.messages.append(message)
+        self.sent.set()
+
+
+def test_coalescer_flushes_one_digest_per_window():
+    sender = RecordingSender()
+    coalescer = TeamsCoalescer("https://teams.test/hook", window_seconds=0.2, max_batch=10, sender=sender)
+    for index in range(3):
+        coalescer.submit(f"Application {index} received")
+
+    assert sender.sent.wait(2)
+    coalescer.close()
+    assert len(sender.messages) == 1
+    assert sender.messages[0].startswith("3 notifications:")
+    stats = coalescer.stats()
+    assert stats["digests"] == 1
+    assert stats["coalesced"] == 2
+    assert stats["pending"] == 0
+
+
+def test_coalescer_caps_batches_drops_overflow_and_flushes_on_close():
+    sender = RecordingSender(fail=1)
+    coalescer = TeamsCoalescer(
+        "https://teams.test/hook",
+        window_seconds=60,
+        max_batch=2,
+        max_pending=4,
+        sender=sender,
+    )
+    coalescer._ensure_thread = lambda: None
+    for index in range(6):
+        coalescer.submit(f"message {index}")
+
+    assert coalescer.flush() == 0
+    coalescer.close()
+
+    assert sender.messages == ["2 notifications:\n\n- message 2\n\n- message 3", "2 notifications:\n\n- message 4\n\n- message 5"]
+    stats = coalescer.stats()
+    assert stats["dropped"] == 2
+    assert stats["failed"] == 1
+    assert stats["delivered"] == 4
+
+
+def test_outbox_teams_delivery_bypasses_the_coalescer(monkeypatch, tmp_path):
+    from app import create_app
+    from app.services import outbox, teams
+
+    app = create_app({"AUTH_DB_PATH": str(tmp_path / "auth.db")})
+    app.config.update(TEAMS_WEBHOOK_URL="https://teams.test/hook", TEAMS_COALESCE_WINDOW_SECONDS=5)
+    sender = RecordingSender(fail=1)
+
+    def post_message(app, url, message):
+        sender(url, message)
+        return SimpleNamespace(status_code=200)
+
+    monkeypatch.setattr(teams, "post_message", post_message)
+
+    with app.app_context():
+        with pytest.raises(RuntimeError):
+            outbox.DELIVERERS["teams"]({"message": "Application received"})
+        outbox.DELIVERERS["teams"]({"message": "Application received"})
+    assert sender.messages == ["Application received"]
+    assert "teams_coalescer" not in app.extensions
@@ -0,0 +1,192 @@
+import json
+import os
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+from app import create_app
+from app.extensions import db
+from app.models import SponsorshipApplication, StripeWebhookEvent
+from app.services import stripe_service, webhook_service
+
+
+@pytest.fixture()
+def app(monkeypatch):
+    tmp_dir = tempfile.TemporaryDirectory()
+    app = create_app(
+        {
+            "TESTING": True,
+            "AUTH_DB_PATH": os.path.join(tmp_dir.name, "auth.db"),
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(tmp_dir.name, 'app.db')}",
+            "SECRET_KEY": "test-secret",
+            "STRIPE_WEBHOOK_SECRET": "whsec_test",
+        }
+    )
+    monkeypatch.setattr(
+        stripe_service.stripe.Webhook,
+        "construct_event",
+        lambda payload, signature, secret: json.loads(payload),
+    )
+    with app.app_context():
+        db.create_all()
+    yield app
+    with app.app_context():
+        db.engine.dispose()
+    tmp_dir.cleanup()
+
+
+@pytest.fixture()
+def client(app):
+    return app.test_client()
+
+
+def _paid_event(event_id: str, application_id) -> bytes:
+    return json.dumps(
+        {
+            "id": event_id,
+            "type": "checkout.session.completed",
+            "data": {
+                "object": {
+                    "payment_status": "paid",
+                    "metadata": {"application_type": "sponsorship", "application_id": str(application_id)},
+                }
+            },
+        }
+    ).encode()
+
+
+def _create_sponsorship() -> int:
+    application = SponsorshipApplication(
+        business_name="Star LLC",
+        contact_name="Jane Doe",
+        cell_phone="555-111-2222",
+        email="jane@example.com",
+        support_level="joy_giver",
+    )
+    db.session.add(application)
+    db.session.commit()
+    return application.id
+
+
+def test_webhook_is_acknowledged_then_applied_by_worker(app, client):
+    with app.app_context():
+        application_id = _create_sponsorship()
+
+    response = client.post(
+        "/api/stripe/webhook",
+        data=_paid_event("evt_1", application_id),
+        headers={"Stripe-Signature": "sig"},
+    )
+    assert response.status_code == 200
+    assert response.get_json()["status"] == "received"
+
+    with app.app_context():
+        assert db.session.get(SponsorshipApplication, application_id).payment_status == "pending"
+        assert webhook_service.process_inbox() == {"processed": 1, "retrying": 0, "dead": 0}
+        assert db.session.get(SponsorshipApplication, application_id).payment_status == "paid"
+        assert StripeWebhookEvent.query.one().status == "processed"
+
+
+def test_failing_webhook_event_is_dead_lettered(app, client, monkeypatch):
+    def failing_apply(event):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(webhook_service, "apply_event", failing_apply)
+    client.post(
+        "/api/stripe/webhook",
+        data=_paid_event("evt_bad", 1),
+        headers={"Stripe-Signature": "sig"},
+    )
+    with app.app_context():
+        assert webhook_service.process_inbox(max_attempts=2, retry_base_seconds=0)["retrying"] == 1
+        assert webhook_service.process_inbox(max_attempts=2, retry_base_seconds=0)["dead"] == 1
+        event = StripeWebhookEvent.query.one()
+        assert event.status == "dead"
+        assert event.attempts == 2
+
+
+def test_replayed_webhook_is_deduplicated(app, client):
+    with app.app_context():
+        application_id = _create_sponsorship()
+
+    for _ in range(3):
+        response = client.post(
+            "/api/stripe/webhook",
+            data=_paid_event("evt_replay", application_id),
+            headers={"Stripe-Signature": "sig"},
+        )
+        assert response.status_code == 200
+    assert response.get_json()["status"] == "duplicate"
+
+    with app.app_context():
+        assert StripeWebhookEvent.query.count() == 1
+        stats = webhook_service.get_event_deduplicator(app).stats()
+        assert stats["lookups"] == 3
+        assert stats["duplicates"] == 2
+
+    app.extensions.pop("stripe_event_deduplicator")
+    response = client.post(
+        "/api/stripe/webhook",
+        data=_paid_event("evt_replay", application_id),
+        headers={"Stripe-Signature": "sig"},
+    )
+    assert response.get_json()["status"] == "duplicate"
+
+
+def test_webhook_resolves_application_by_checkout_session_id(app, client):
+    with app.app_context():
+        application_id = _create_sponsorship()
+        application = db.session.get(SponsorshipApplication, application_id)
+        application.checkout_session_id = "cs_test_indexed"
+        db.session.commit()
+
+    event = {
+        "id": "evt_indexed",
+        "type": "checkout.session.completed",
+        "data": {"object": {"id": "cs_test_indexed", "payment_status": "paid", "payment_intent": "pi_123"}},
+    }
+    client.post("/api/stripe/webhook", data=json.dumps(event), headers={"Stripe-Signature": "sig"})
+
+    with app.app_context():
+        webhook_service.process_inbox()
+        application = db.session.get(SponsorshipApplication, application_id)
+        assert application.payment_status == "paid"
+        assert application.payment_intent_id == "pi_123"
+
+
+def test_purge_drops_only_settled_events_past_retention(app, client):
+    with app.app_context():
+        application_id = _create_sponsorship()
+    for event_id in ("evt_old", "evt_pending"):
+        client.post(
+            "/api/stripe/webhook",
+            data=_paid_event(event_id, application_id),
+            headers={"Stripe-Signature": "sig"},
+        )
+
+    with app.app_context():
+        webhook_service.process_inbox()
+        stale = datetime.utcnow() - timedelta(days=31)
+        StripeWebhookEvent.query.filter_by(event_id="evt_old").update({"processed_at": stale})
+        StripeWebhookEvent.query.filter_by(event_id="evt_pending").update(
+            {"status": "pending", "received_at": stale}
+        )
+        db.session.commit()
+        assert webhook_service.get_event_deduplicator(app).purge() == 1
+        assert [event.event_id for event in StripeWebhookEvent.query.all()] == ["evt_pending"]
+
+
+def test_webhook_worker_purges_expired_events(app, client):
+    with app.app_context():
+        application_id = _create_sponsorship()
+    client.post("/api/stripe/webhook", data=_paid_event("evt_expired", application_id), headers={"Stripe-Signature": "sig"})
+    with app.app_context():
+        webhook_service.process_inbox()
+        StripeWebhookEvent.query.update({"processed_at": datetime.utcnow() - timedelta(days=31)})
+        db.session.commit()
+
+    result = app.test_cli_runner().invoke(args=["webhooks", "work"])
+    assert "Purged 1 processed events" in result.output
+    with app.app_context():
+        assert StripeWebhookEvent.query.count() == 0